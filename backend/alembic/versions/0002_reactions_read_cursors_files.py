@@ -0,0 +1,104 @@
+"""reaction and read-cursor tables, stored files, hot-path indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 09:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('stored_files',
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('url', sa.String(), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('content_type', sa.String(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('content_hash')
+    )
+    op.create_index(op.f('ix_stored_files_url'), 'stored_files', ['url'], unique=True)
+    op.create_table('channel_read_cursors',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('channel_id', sa.UUID(), nullable=False),
+    sa.Column('last_read_message_id', sa.UUID(), nullable=True),
+    sa.Column('last_read_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['channel_id'], ['channels.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['last_read_message_id'], ['messages.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'channel_id')
+    )
+    op.create_table('message_reaction_counts',
+    sa.Column('message_id', sa.UUID(), nullable=False),
+    sa.Column('emoji', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['message_id'], ['messages.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('message_id', 'emoji')
+    )
+    op.create_table('message_reactions',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('message_id', sa.UUID(), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('emoji', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['message_id'], ['messages.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('message_id', 'user_id', 'emoji', name='uq_message_reactions_message_user_emoji')
+    )
+
+    op.create_index('ix_users_status_last_seen', 'users', ['status', 'last_seen'], unique=False)
+    op.create_index('ix_channels_created_at_id', 'channels', ['created_at', 'id'], unique=False)
+    op.create_index('ix_messages_channel_id_created_at', 'messages', ['channel_id', 'created_at'], unique=False)
+    op.create_index('ix_channel_members_user_id', 'channel_members', ['user_id'], unique=False)
+
+    # Keep the earliest membership row before the (channel, user) pair becomes unique
+    op.execute("""
+        DELETE FROM channel_members a
+        USING channel_members b
+        WHERE a.channel_id = b.channel_id
+          AND a.user_id = b.user_id
+          AND (coalesce(a.joined_at, 'infinity'), a.id::text) > (coalesce(b.joined_at, 'infinity'), b.id::text)
+    """)
+    op.create_unique_constraint('uq_channel_members_channel_user', 'channel_members', ['channel_id', 'user_id'])
+
+    # Reactions used to live in messages.reactions as {emoji: [user_id, ...]}
+    op.execute("""
+        INSERT INTO message_reactions (id, message_id, user_id, emoji, created_at)
+        SELECT gen_random_uuid(), m.id, r.user_id::uuid, e.key, m.created_at
+        FROM messages m
+        CROSS JOIN LATERAL jsonb_each(m.reactions) AS e
+        CROSS JOIN LATERAL jsonb_array_elements_text(e.value) AS r(user_id)
+        JOIN users u ON u.id = r.user_id::uuid
+        WHERE jsonb_typeof(m.reactions) = 'object'
+          AND jsonb_typeof(e.value) = 'array'
+        ON CONFLICT ON CONSTRAINT uq_message_reactions_message_user_emoji DO NOTHING
+    """)
+    op.execute("""
+        INSERT INTO message_reaction_counts (message_id, emoji, count)
+        SELECT message_id, emoji, count(*)
+        FROM message_reactions
+        GROUP BY message_id, emoji
+    """)
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_channel_members_channel_user', 'channel_members', type_='unique')
+    op.drop_index('ix_channel_members_user_id', table_name='channel_members')
+    op.drop_index('ix_messages_channel_id_created_at', table_name='messages')
+    op.drop_index('ix_channels_created_at_id', table_name='channels')
+    op.drop_index('ix_users_status_last_seen', table_name='users')
+    op.drop_table('message_reactions')
+    op.drop_table('message_reaction_counts')
+    op.drop_table('channel_read_cursors')
+    op.drop_index(op.f('ix_stored_files_url'), table_name='stored_files')
+    op.drop_table('stored_files')
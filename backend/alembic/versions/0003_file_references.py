@@ -0,0 +1,44 @@
+"""per-user references to stored files
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 14:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('file_references',
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['content_hash'], ['stored_files.content_hash'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('content_hash', 'user_id')
+    )
+
+    # Uploads were not tracked per user before; attribute them to whoever attached them
+    op.execute("""
+        INSERT INTO file_references (content_hash, user_id, created_at)
+        SELECT DISTINCT f.content_hash, m.user_id, f.created_at
+        FROM messages m
+        CROSS JOIN LATERAL jsonb_array_elements(m.attachments) AS a(attachment)
+        JOIN stored_files f ON f.url = a.attachment->>'url'
+        WHERE jsonb_typeof(m.attachments) = 'array'
+    """)
+    op.execute("""
+        UPDATE stored_files f
+        SET ref_count = (SELECT count(*) FROM file_references r WHERE r.content_hash = f.content_hash)
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('file_references')
@@ -0,0 +1,25 @@
+"""uploader filename and content type on file references
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 18:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('file_references', sa.Column('filename', sa.String(), nullable=True))
+    op.add_column('file_references', sa.Column('content_type', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('file_references', 'content_type')
+    op.drop_column('file_references', 'filename')
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+from app.core.loop_monitor import loop_monitor
+from app.core.profiler import profiler
+from app.core.security import require_admin
+
+router = APIRouter()
+
+class LoopMonitorUpdate(BaseModel):
+    enabled: bool | None = None
+    threshold_ms: float | None = Field(None, gt=0)
+
+class ProfileRequest(BaseModel):
+    duration_s: float = Field(10, gt=0, le=120)
+    rate_hz: int = Field(100, ge=1, le=1000)
+    # Set to profile only this fraction of HTTP requests and WebSocket messages
+    fraction: float | None = Field(None, gt=0, le=1)
+
+@router.get("/loop-monitor")
+async def get_loop_monitor(current_user: dict = Depends(require_admin)):
+    """Loop monitor state and the most recent stalls on the worker serving this request"""
+    return loop_monitor.status()
+
+@router.put("/loop-monitor")
+async def update_loop_monitor(update: LoopMonitorUpdate, current_user: dict = Depends(require_admin)):
+    await loop_monitor.configure(
+        enabled=update.enabled,
+        threshold=update.threshold_ms / 1000 if update.threshold_ms else None
+    )
+    return loop_monitor.status()
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile_worker(request: ProfileRequest, current_user: dict = Depends(require_admin)):
+    """Sample the event loop of the worker serving this call; returns collapsed stacks.
+
+    Render with `flamegraph.pl`, `inferno-flamegraph` or drop into speedscope.
+    """
+    if profiler.running:
+        raise HTTPException(status_code=409, detail="A profile is already running on this worker")
+    collapsed = await profiler.profile(request.duration_s, request.rate_hz, request.fraction)
+    return PlainTextResponse(collapsed, headers={"X-Profile-Samples": str(sum(profiler.samples.values()))})
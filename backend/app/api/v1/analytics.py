@@ -6,6 +6,7 @@ from app.core.security import get_current_user
 from app.models.user import User, UserStatus
 from app.models.message import Message
 from app.models.channel import Channel
+from app.services.rabbitmq import rabbitmq_service
 from pydantic import BaseModel
 from datetime import datetime, timedelta
 
@@ -79,3 +80,8 @@ async def get_analytics_dashboard(
         online_users=online_users,
         ai_moderation_flags=ai_moderation_flags
     )
+
+@router.get("/publisher")
+async def get_publisher_metrics(current_user: dict = Depends(get_current_user)):
+    """Event publisher backlog, failure counters and confirm latency"""
+    return rabbitmq_service.metrics()
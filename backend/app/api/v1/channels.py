@@ -1,14 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, insert, delete
-from pydantic import BaseModel
+from sqlalchemy import select, insert, delete, func, and_, or_, tuple_, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from pydantic import BaseModel, Field
+from app.core.config import settings
 from app.core.database import get_db
 from app.core.security import get_current_user
 from app.models.channel import Channel, ChannelType, MemberRole, channel_members
+from app.models.message import Message, ReadCursor
+from app.models.user import User
+from app.services.redis_service import RedisService
+from app.websocket.manager import manager
 from datetime import datetime
-from typing import List
+from typing import Dict, List
+import base64
+import orjson
+import uuid
 
 router = APIRouter()
+redis_service = RedisService()
 
 class ChannelCreate(BaseModel):
     name: str
@@ -23,10 +33,64 @@ class ChannelResponse(BaseModel):
     owner_id: str
     created_at: datetime
 
+CHANNEL_RESPONSE_COLUMNS = (
+    Channel.id,
+    Channel.name,
+    Channel.description,
+    Channel.type,
+    Channel.owner_id,
+    Channel.created_at
+)
+
+class ChannelListItem(ChannelResponse):
+    is_member: bool
+    role: MemberRole | None
+
+class ChannelPage(BaseModel):
+    channels: List[ChannelListItem]
+    next_cursor: str | None
+
+def encode_cursor(created_at: datetime, channel_id) -> str:
+    raw = f"{created_at.isoformat()}|{channel_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, channel_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(channel_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 class ChannelMemberAdd(BaseModel):
-    user_id: str
+    user_id: uuid.UUID
+    role: MemberRole = MemberRole.MEMBER
+
+class ChannelMembersBulkAdd(BaseModel):
+    user_ids: List[uuid.UUID] = Field(..., max_length=5000)
     role: MemberRole = MemberRole.MEMBER
 
+class ChannelMembersBulkRemove(BaseModel):
+    user_ids: List[uuid.UUID] = Field(..., max_length=5000)
+
+MANAGER_ROLES = (MemberRole.OWNER, MemberRole.ADMIN)
+
+async def require_channel_manager(channel_id: str, current_user: dict, db: AsyncSession) -> MemberRole:
+    """Membership changes are limited to the channel's owners and admins"""
+    role = await manager.membership.get_role(channel_id, current_user["id"], db)
+    if role not in MANAGER_ROLES:
+        raise HTTPException(status_code=403, detail="Only channel owners and admins can manage members")
+    return role
+
+def removable_roles(caller_role: MemberRole) -> List[MemberRole]:
+    """The owner is never removed; admins only by the owner"""
+    if caller_role == MemberRole.OWNER:
+        return [MemberRole.ADMIN, MemberRole.MODERATOR, MemberRole.MEMBER]
+    return [MemberRole.MODERATOR, MemberRole.MEMBER]
+
+def reject_owner_role(role: MemberRole):
+    if role == MemberRole.OWNER:
+        raise HTTPException(status_code=400, detail="The owner role cannot be granted")
+
 @router.post("/", response_model=ChannelResponse, status_code=201)
 async def create_channel(
     channel_data: ChannelCreate,
@@ -52,6 +116,11 @@ async def create_channel(
         )
     )
     await db.commit()
+    await redis_service.add_channel_members(str(channel.id), [current_user["id"]], MemberRole.OWNER.value)
+    if channel.type == ChannelType.PUBLIC:
+        # Every user's discovery pages may now be missing this channel
+        await redis_service.invalidate_channel_directory()
+    manager.membership.evict(channel.id, [current_user["id"]])
     
     return ChannelResponse(
         id=str(channel.id),
@@ -62,58 +131,213 @@ async def create_channel(
         created_at=channel.created_at
     )
 
-@router.get("/", response_model=List[ChannelResponse])
+@router.get("/", response_model=ChannelPage)
 async def list_channels(
+    limit: int = Query(50, ge=1, le=100),
+    cursor: str | None = None,
+    include_public: bool = True,
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    result = await db.execute(
-        select(Channel).where(Channel.is_active == True)
+    page_key = f"{int(include_public)}:{limit}:{cursor or ''}"
+    version = "0"
+    try:
+        cached, version = await redis_service.get_cached_channel_list(current_user["id"], page_key)
+        if cached:
+            return Response(content=cached, media_type="application/json")
+    except Exception as e:
+        print(f"Channel list cache error: {e}")
+    
+    # Channels the caller belongs to, plus public channels for discovery,
+    # newest first with keyset pagination on (created_at, id)
+    membership = and_(
+        channel_members.c.channel_id == Channel.id,
+        channel_members.c.user_id == current_user["id"]
+    )
+    is_member = channel_members.c.user_id.isnot(None)
+    query = (
+        select(*CHANNEL_RESPONSE_COLUMNS, is_member.label("is_member"), channel_members.c.role)
+        .outerjoin(channel_members, membership)
+        .where(Channel.is_active == True)
     )
-    channels = result.scalars().all()
+    if include_public:
+        query = query.where(or_(is_member, Channel.type == ChannelType.PUBLIC))
+    else:
+        query = query.where(is_member)
+    if cursor:
+        query = query.where(tuple_(Channel.created_at, Channel.id) < decode_cursor(cursor))
+    query = query.order_by(Channel.created_at.desc(), Channel.id.desc()).limit(limit + 1)
+    
+    rows = (await db.execute(query)).all()
+    next_cursor = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+    payload = orjson.dumps({
+        "channels": [dict(row._mapping) for row in rows[:limit]],
+        "next_cursor": next_cursor
+    })
     
-    return [
-        ChannelResponse(
-            id=str(ch.id),
-            name=ch.name,
-            description=ch.description,
-            type=ch.type,
-            owner_id=str(ch.owner_id),
-            created_at=ch.created_at
+    try:
+        await redis_service.cache_channel_list(
+            current_user["id"], page_key, payload.decode(), settings.CHANNEL_LIST_CACHE_TTL, version
+        )
+    except Exception as e:
+        print(f"Channel list cache error: {e}")
+    
+    return Response(content=payload, media_type="application/json")
+
+@router.get("/unread", response_model=Dict[str, int])
+async def get_unread_counts(
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Messages newer than the read cursor (or the join time if never read),
+    # counted for every channel the user belongs to in one query
+    read_since = func.coalesce(ReadCursor.last_read_at, channel_members.c.joined_at)
+    result = await db.execute(
+        select(channel_members.c.channel_id, func.count(Message.id))
+        .select_from(channel_members)
+        .outerjoin(
+            ReadCursor,
+            and_(
+                ReadCursor.user_id == channel_members.c.user_id,
+                ReadCursor.channel_id == channel_members.c.channel_id
+            )
+        )
+        .outerjoin(
+            Message,
+            and_(
+                Message.channel_id == channel_members.c.channel_id,
+                Message.created_at > read_since,
+                Message.is_deleted == False,
+                Message.user_id != channel_members.c.user_id
+            )
         )
-        for ch in channels
-    ]
+        .where(channel_members.c.user_id == current_user["id"])
+        .group_by(channel_members.c.channel_id)
+    )
+    return {str(channel_id): count for channel_id, count in result.all()}
 
 @router.post("/{channel_id}/members")
 async def add_channel_member(
-    channel_id: str,
+    channel_id: uuid.UUID,
     member_data: ChannelMemberAdd,
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    # Check if user has permission (owner/admin)
-    await db.execute(
-        insert(channel_members).values(
+    # Canonical ids, so the Redis keys and evictions match every other writer's
+    channel_id = str(channel_id)
+    reject_owner_role(member_data.role)
+    await require_channel_manager(channel_id, current_user, db)
+    result = await db.execute(
+        pg_insert(channel_members).values(
             channel_id=channel_id,
             user_id=member_data.user_id,
             role=member_data.role
         )
+        .on_conflict_do_nothing(constraint="uq_channel_members_channel_user")
+        .returning(channel_members.c.user_id)
     )
+    # An existing member keeps their role, so only a new row is written through
+    added = [str(user_id) for user_id in result.scalars().all()]
     await db.commit()
+    await redis_service.add_channel_members(channel_id, added, member_data.role.value)
+    manager.membership.evict(channel_id, added)
     return {"message": "Member added successfully"}
 
+@router.post("/{channel_id}/members/bulk")
+async def add_channel_members_bulk(
+    channel_id: uuid.UUID,
+    members: ChannelMembersBulkAdd,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    channel_id = str(channel_id)
+    reject_owner_role(members.role)
+    await require_channel_manager(channel_id, current_user, db)
+    if not members.user_ids:
+        return {"added": 0, "skipped": 0}
+    
+    # One INSERT ... SELECT: unknown user IDs are dropped by the join with
+    # users, existing members by ON CONFLICT DO NOTHING
+    source = select(
+        func.gen_random_uuid(),
+        literal(channel_id, type_=channel_members.c.channel_id.type),
+        User.id,
+        literal(members.role, type_=channel_members.c.role.type),
+        literal(datetime.utcnow(), type_=channel_members.c.joined_at.type)
+    ).where(User.id.in_(set(members.user_ids)))
+    result = await db.execute(
+        pg_insert(channel_members)
+        .from_select(["id", "channel_id", "user_id", "role", "joined_at"], source)
+        .on_conflict_do_nothing(constraint="uq_channel_members_channel_user")
+        .returning(channel_members.c.user_id)
+    )
+    added = [str(user_id) for user_id in result.scalars().all()]
+    await db.commit()
+    
+    await redis_service.add_channel_members(channel_id, added, members.role.value)
+    manager.membership.evict(channel_id, added)
+    return {"added": len(added), "skipped": len(set(members.user_ids)) - len(added)}
+
+@router.post("/{channel_id}/members/bulk-remove")
+async def remove_channel_members_bulk(
+    channel_id: uuid.UUID,
+    members: ChannelMembersBulkRemove,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    channel_id = str(channel_id)
+    caller_role = await require_channel_manager(channel_id, current_user, db)
+    if not members.user_ids:
+        return {"removed": 0}
+    
+    # Members the caller may not remove (the owner, or admins for an admin) are skipped
+    result = await db.execute(
+        delete(channel_members)
+        .where(
+            channel_members.c.channel_id == channel_id,
+            channel_members.c.user_id.in_(set(members.user_ids)),
+            channel_members.c.role.in_(removable_roles(caller_role))
+        )
+        .returning(channel_members.c.user_id)
+    )
+    removed = [str(member_id) for member_id in result.scalars().all()]
+    await db.commit()
+    
+    await redis_service.remove_channel_members(channel_id, removed)
+    manager.membership.evict(channel_id, removed)
+    return {"removed": len(removed)}
+
 @router.delete("/{channel_id}/members/{user_id}")
 async def remove_channel_member(
-    channel_id: str,
-    user_id: str,
+    channel_id: uuid.UUID,
+    user_id: uuid.UUID,
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    await db.execute(
-        delete(channel_members).where(
+    # Canonical ids, so the Redis keys, evictions and the self check match
+    channel_id, user_id = str(channel_id), str(user_id)
+    # Members may leave on their own, except the owner; removing anyone else needs
+    # owner/admin, and removing an admin needs the owner
+    if user_id == str(uuid.UUID(current_user["id"])):
+        if await manager.membership.get_role(channel_id, user_id, db) == MemberRole.OWNER:
+            raise HTTPException(status_code=400, detail="Transfer ownership before leaving the channel")
+        allowed_roles = [role for role in MemberRole if role != MemberRole.OWNER]
+    else:
+        allowed_roles = removable_roles(await require_channel_manager(channel_id, current_user, db))
+        target_role = await manager.membership.get_role(channel_id, user_id, db)
+        if target_role is not None and target_role not in allowed_roles:
+            raise HTTPException(status_code=403, detail="Not allowed to remove this member")
+    result = await db.execute(
+        delete(channel_members)
+        .where(
             channel_members.c.channel_id == channel_id,
-            channel_members.c.user_id == user_id
+            channel_members.c.user_id == user_id,
+            channel_members.c.role.in_(allowed_roles)
         )
+        .returning(channel_members.c.user_id)
     )
+    removed = [str(member_id) for member_id in result.scalars().all()]
     await db.commit()
+    await redis_service.remove_channel_members(channel_id, removed)
+    manager.membership.evict(channel_id, removed)
     return {"message": "Member removed successfully"}
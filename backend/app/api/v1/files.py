@@ -1,53 +1,254 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import get_db
 from app.core.security import get_current_user
-from app.services.s3_service import S3Service
-from pydantic import BaseModel
+from app.models.file import StoredFile
+from app.services.file_store import FileStore
+from app.services.s3_service import S3Service, FileTooLargeError
+from pydantic import BaseModel, Field
+from pathlib import Path
+from typing import AsyncIterator, Optional, Tuple
+from urllib.parse import quote
+import asyncio
+import mimetypes
+import os
+import re
+from stat import S_ISREG
 
-router = APIRouter()
+# Room for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+ALLOWED_CONTENT_TYPES = {
+    "image/jpeg", "image/png", "image/gif", "image/webp",
+    "video/mp4", "video/webm",
+    "audio/mpeg", "audio/wav", "audio/ogg",
+    "application/pdf", "application/msword",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+}
+
+def file_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File too large (max {settings.MAX_UPLOAD_SIZE // (1024 * 1024)}MB)"
+    )
+
+class UploadSizeLimitRoute(APIRoute):
+    """Rejects oversize request bodies while they are received, before the form is parsed"""
+    
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        
+        async def limited_handler(request: Request):
+            if request.method != "POST":
+                return await handler(request)
+            
+            limit = settings.MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD
+            content_length = request.headers.get("content-length")
+            if content_length and content_length.isdigit() and int(content_length) > limit:
+                raise file_too_large()
+            
+            received = 0
+            receive = request.receive
+            
+            async def limited_receive():
+                nonlocal received
+                message = await receive()
+                if message["type"] == "http.request":
+                    received += len(message.get("body", b""))
+                    if received > limit:
+                        raise file_too_large()
+                return message
+            
+            return await handler(Request(request.scope, limited_receive))
+        
+        return limited_handler
+
+router = APIRouter(route_class=UploadSizeLimitRoute)
+uploads_router = APIRouter()
 s3_service = S3Service()
+file_store = FileStore(s3_service)
 
 class FileUploadResponse(BaseModel):
     url: str
+    # `url` names only the content; this one also carries the uploader's filename
+    download_url: str
     filename: str
     content_type: str
     size: int
+    sha256: str
+
+class FileReuseRequest(BaseModel):
+    sha256: str = Field(..., pattern=r"^[0-9a-fA-F]{64}$")
+    filename: str
+
+def download_url(url: str, filename: str) -> str:
+    # Locally served uploads get the caller's name back through Content-Disposition;
+    # public S3 objects are served as stored
+    if not s3_service.use_local:
+        return url
+    return f"{url}?filename={quote(filename)}"
+
+async def iter_upload(file: UploadFile) -> AsyncIterator[bytes]:
+    while chunk := await file.read(settings.UPLOAD_CHUNK_SIZE):
+        yield chunk
 
 @router.post("/upload", response_model=FileUploadResponse)
 async def upload_file(
     file: UploadFile = File(...),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    # Validate file size (max 50MB)
-    contents = await file.read()
-    if len(contents) > 50 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File too large (max 50MB)")
-    
     # Validate file type
-    allowed_types = [
-        "image/jpeg", "image/png", "image/gif", "image/webp",
-        "video/mp4", "video/webm",
-        "audio/mpeg", "audio/wav", "audio/ogg",
-        "application/pdf", "application/msword",
-        "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-    ]
-    
-    if file.content_type not in allowed_types:
+    if file.content_type not in ALLOWED_CONTENT_TYPES:
         raise HTTPException(status_code=400, detail="File type not allowed")
     
-    # Upload to S3
-    url = await s3_service.upload_file(contents, file.filename, file.content_type)
+    # Stream to storage in chunks; the size limit is enforced as bytes arrive
+    try:
+        stored = await file_store.store(
+            db, iter_upload(file), file.filename, file.content_type, current_user["id"], settings.MAX_UPLOAD_SIZE
+        )
+    except FileTooLargeError:
+        raise file_too_large()
     
     return FileUploadResponse(
-        url=url,
+        url=stored.url,
+        download_url=download_url(stored.url, file.filename),
         filename=file.filename,
         content_type=file.content_type,
-        size=len(contents)
+        size=stored.size,
+        sha256=stored.content_hash
+    )
+
+@router.post("/reuse", response_model=FileUploadResponse)
+async def reuse_file(
+    request: FileReuseRequest,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Clients that hash locally can skip re-uploading content they already stored
+    found = await file_store.reuse(db, request.sha256, current_user["id"])
+    if not found:
+        raise HTTPException(status_code=404, detail="File not found")
+    stored, reference = found
+    
+    return FileUploadResponse(
+        url=stored.url,
+        download_url=download_url(stored.url, request.filename),
+        filename=request.filename,
+        content_type=reference.content_type or stored.content_type,
+        size=stored.size,
+        sha256=stored.content_hash
     )
 
 @router.delete("/{file_url:path}")
 async def delete_file(
     file_url: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    await s3_service.delete_file(file_url)
+    if not file_url.startswith(("/", "http://", "https://")):
+        file_url = f"/{file_url}"
+    if not await file_store.release(db, file_url, current_user["id"]):
+        raise HTTPException(status_code=404, detail="File not found")
     return {"message": "File deleted successfully"}
+
+# Upload names are content hashes (or embed a UUID, for older uploads), so a given
+# path never changes content and can be cached forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+RANGE_CHUNK_SIZE = 256 * 1024
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+CONTENT_KEY_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+async def stored_media_type(db: AsyncSession, filename: str) -> Optional[str]:
+    # Content keys carry no extension; their type is the one checked at upload
+    if not CONTENT_KEY_PATTERN.match(filename):
+        return mimetypes.guess_type(filename)[0]
+    result = await db.execute(select(StoredFile.content_type).where(StoredFile.content_hash == filename))
+    return result.scalar_one_or_none()
+
+def content_disposition(filename: str) -> str:
+    return f"inline; filename*=UTF-8''{quote(filename)}"
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Single byte range as an inclusive (start, end); None if unsatisfiable"""
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0:
+            return None
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return None
+    return start, end
+
+async def read_range(path: Path, start: int, end: int) -> AsyncIterator[bytes]:
+    fd = await asyncio.to_thread(os.open, path, os.O_RDONLY)
+    try:
+        position = start
+        while position <= end:
+            chunk = await asyncio.to_thread(os.pread, fd, min(RANGE_CHUNK_SIZE, end - position + 1), position)
+            if not chunk:
+                break
+            position += len(chunk)
+            yield chunk
+    finally:
+        os.close(fd)
+
+@uploads_router.api_route("/uploads/{filename}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_upload(
+    filename: str,
+    request: Request,
+    download_name: Optional[str] = Query(None, alias="filename"),
+    db: AsyncSession = Depends(get_db)
+):
+    path = Path(settings.LOCAL_UPLOAD_DIR) / filename
+    try:
+        stat = await asyncio.to_thread(os.stat, path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise HTTPException(status_code=404, detail="File not found")
+    if not S_ISREG(stat.st_mode):
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+        "X-Content-Type-Options": "nosniff"
+    }
+    if download_name:
+        headers["Content-Disposition"] = content_disposition(download_name)
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    
+    media_type = await stored_media_type(db, filename) or "application/octet-stream"
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if not range_header or (if_range and if_range.strip() != etag):
+        return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat)
+    
+    byte_range = parse_range(range_header, size)
+    if byte_range is None:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    
+    start, end = byte_range
+    headers.update({
+        "Content-Range": f"bytes {start}-{end}/{size}",
+        "Content-Length": str(end - start + 1)
+    })
+    if request.method == "HEAD":
+        return Response(status_code=206, headers=headers, media_type=media_type)
+    return StreamingResponse(read_range(path, start, end), status_code=206, headers=headers, media_type=media_type)
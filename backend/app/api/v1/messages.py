@@ -1,13 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
-from pydantic import BaseModel
+from sqlalchemy import select, update, delete, and_, true, values, column
+from sqlalchemy.dialects.postgresql import insert as pg_insert, UUID
+from pydantic import BaseModel, Field
 from app.core.database import get_db
 from app.core.security import get_current_user
-from app.models.message import Message, Bookmark
+from app.models.channel import channel_members
+from app.models.file import StoredFile
+from app.models.message import Message, Bookmark, Reaction, ReactionCount
 from app.services.ai_moderation import AIModerationService
+from app.services.media import needs_preview
+from app.services.notifications import message_notification_job
+from app.services.rabbitmq import rabbitmq_service
+from app.websocket.manager import manager
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Optional
+import uuid
 
 router = APIRouter()
 ai_moderation = AIModerationService()
@@ -39,12 +48,90 @@ class MessageUpdate(BaseModel):
 class ReactionAdd(BaseModel):
     emoji: str
 
+class ReactionBatchRequest(BaseModel):
+    message_ids: List[uuid.UUID] = Field(..., max_length=200)
+
+class MessageBatchRequest(BaseModel):
+    message_ids: List[uuid.UUID] = Field(..., max_length=200)
+
+class ChannelPagesRequest(BaseModel):
+    channel_ids: List[uuid.UUID] = Field(..., max_length=50)
+    limit: int = Field(50, ge=1, le=100)
+
+# Only the columns MessageResponse needs; skips moderation flags, read_by and
+# the legacy reactions blob on list endpoints
+MESSAGE_RESPONSE_COLUMNS = (
+    Message.id,
+    Message.channel_id,
+    Message.user_id,
+    Message.content,
+    Message.parent_id,
+    Message.is_edited,
+    Message.is_pinned,
+    Message.mentions,
+    Message.attachments,
+    Message.created_at,
+    Message.updated_at
+)
+
+def member_of_channel(user_id: str):
+    """Join condition restricting messages to channels the user belongs to"""
+    return and_(
+        channel_members.c.channel_id == Message.channel_id,
+        channel_members.c.user_id == user_id
+    )
+
+def message_row_to_dict(row, reactions: Dict[str, int]) -> dict:
+    """Plain dict in MessageResponse shape, ready for orjson (UUIDs and datetimes encode natively)"""
+    return {
+        "id": row.id,
+        "channel_id": row.channel_id,
+        "user_id": row.user_id,
+        "content": row.content,
+        "parent_id": row.parent_id,
+        "is_edited": row.is_edited,
+        "is_pinned": row.is_pinned,
+        "reactions": reactions,
+        "mentions": row.mentions,
+        "attachments": row.attachments,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at
+    }
+
+async def get_reaction_counts(
+    db: AsyncSession, message_ids: List, visible_to: Optional[str] = None
+) -> Dict[str, Dict[str, int]]:
+    """Aggregated reaction counts for many messages in a single query.
+
+    With `visible_to`, messages outside that user's channels report no reactions.
+    """
+    counts: Dict[str, Dict[str, int]] = {str(message_id): {} for message_id in message_ids}
+    if not message_ids:
+        return counts
+    
+    query = (
+        select(ReactionCount.message_id, ReactionCount.emoji, ReactionCount.count)
+        .where(ReactionCount.message_id.in_(message_ids), ReactionCount.count > 0)
+    )
+    if visible_to is not None:
+        query = (
+            query.join(Message, Message.id == ReactionCount.message_id)
+            .join(channel_members, member_of_channel(visible_to))
+        )
+    result = await db.execute(query)
+    for message_id, emoji, count in result.all():
+        counts[str(message_id)][emoji] = count
+    return counts
+
 @router.post("/", response_model=MessageResponse, status_code=201)
 async def create_message(
     message_data: MessageCreate,
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
+    if not await manager.membership.is_member(message_data.channel_id, current_user["id"], db):
+        raise HTTPException(status_code=403, detail="Not a member of this channel")
+    
     # AI Moderation
     moderation_result = await ai_moderation.moderate_content(message_data.content)
     
@@ -65,6 +152,33 @@ async def create_message(
     await db.commit()
     await db.refresh(message)
     
+    notification_job = message_notification_job(
+        channel_id=message.channel_id,
+        sender_id=message.user_id,
+        content=message.content,
+        mentions=message.mentions or [],
+        parent_id=message.parent_id,
+        message_id=message.id,
+        created_at=message.created_at
+    )
+    if notification_job:
+        await rabbitmq_service.publish_message_notification(notification_job)
+    
+    # Thumbnails are rendered by the media worker and merged into attachments later.
+    # Only files this server stored are fetched, with the type recorded at upload.
+    urls = {attachment.get("url") for attachment in message.attachments or [] if isinstance(attachment.get("url"), str)}
+    if urls:
+        result = await db.execute(
+            select(StoredFile.url, StoredFile.content_type).where(StoredFile.url.in_(urls))
+        )
+        for url, content_type in result.all():
+            if needs_preview(content_type):
+                await rabbitmq_service.publish_media_job({
+                    "message_id": str(message.id),
+                    "url": url,
+                    "content_type": content_type
+                })
+    
     return MessageResponse(
         id=str(message.id),
         channel_id=str(message.channel_id),
@@ -73,13 +187,77 @@ async def create_message(
         parent_id=str(message.parent_id) if message.parent_id else None,
         is_edited=message.is_edited,
         is_pinned=message.is_pinned,
-        reactions=message.reactions,
+        reactions={},
         mentions=message.mentions,
         attachments=message.attachments,
         created_at=message.created_at,
         updated_at=message.updated_at
     )
 
+@router.post("/batch", response_model=List[MessageResponse])
+async def get_messages_batch(
+    batch: MessageBatchRequest,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if not batch.message_ids:
+        return ORJSONResponse([])
+    
+    result = await db.execute(
+        select(*MESSAGE_RESPONSE_COLUMNS)
+        .join(channel_members, member_of_channel(current_user["id"]))
+        .where(Message.id.in_(batch.message_ids), Message.is_deleted == False)
+    )
+    rows = result.all()
+    reactions = await get_reaction_counts(db, [row.id for row in rows])
+    
+    return ORJSONResponse([message_row_to_dict(row, reactions[str(row.id)]) for row in rows])
+
+@router.post("/channels/latest", response_model=Dict[str, List[MessageResponse]])
+async def get_latest_messages_for_channels(
+    pages: ChannelPagesRequest,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if not pages.channel_ids:
+        return ORJSONResponse({})
+    
+    channel_ids = list(dict.fromkeys(pages.channel_ids))
+    requested = values(
+        column("channel_id", UUID(as_uuid=True)),
+        name="requested"
+    ).data([(channel_id,) for channel_id in channel_ids])
+    
+    # Newest `limit` messages per channel via LATERAL, so each channel reads only
+    # its page from the (channel_id, created_at) index instead of its whole history
+    latest_page = (
+        select(*MESSAGE_RESPONSE_COLUMNS)
+        .where(Message.channel_id == requested.c.channel_id, Message.is_deleted == False)
+        .order_by(Message.created_at.desc())
+        .limit(pages.limit)
+        .lateral("latest_page")
+    )
+    result = await db.execute(
+        select(latest_page)
+        .select_from(requested)
+        .join(
+            channel_members,
+            and_(
+                channel_members.c.channel_id == requested.c.channel_id,
+                channel_members.c.user_id == current_user["id"]
+            )
+        )
+        .join(latest_page, true())
+        .order_by(latest_page.c.channel_id, latest_page.c.created_at.desc())
+    )
+    rows = result.all()
+    reactions = await get_reaction_counts(db, [row.id for row in rows])
+    
+    latest: Dict[str, List[dict]] = {str(channel_id): [] for channel_id in channel_ids}
+    for row in rows:
+        latest[str(row.channel_id)].append(message_row_to_dict(row, reactions[str(row.id)]))
+    return ORJSONResponse(latest)
+
 @router.get("/{channel_id}", response_model=List[MessageResponse])
 async def get_messages(
     channel_id: str,
@@ -88,32 +266,20 @@ async def get_messages(
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
+    if not await manager.membership.is_member(channel_id, current_user["id"], db):
+        raise HTTPException(status_code=403, detail="Not a member of this channel")
+    
     result = await db.execute(
-        select(Message)
+        select(*MESSAGE_RESPONSE_COLUMNS)
         .where(Message.channel_id == channel_id, Message.is_deleted == False)
         .order_by(Message.created_at.desc())
         .limit(limit)
         .offset(offset)
     )
-    messages = result.scalars().all()
-    
-    return [
-        MessageResponse(
-            id=str(msg.id),
-            channel_id=str(msg.channel_id),
-            user_id=str(msg.user_id),
-            content=msg.content,
-            parent_id=str(msg.parent_id) if msg.parent_id else None,
-            is_edited=msg.is_edited,
-            is_pinned=msg.is_pinned,
-            reactions=msg.reactions,
-            mentions=msg.mentions,
-            attachments=msg.attachments,
-            created_at=msg.created_at,
-            updated_at=msg.updated_at
-        )
-        for msg in messages
-    ]
+    rows = result.all()
+    reactions = await get_reaction_counts(db, [row.id for row in rows])
+    
+    return ORJSONResponse([message_row_to_dict(row, reactions[str(row.id)]) for row in rows])
 
 @router.put("/{message_id}", response_model=MessageResponse)
 async def update_message(
@@ -135,6 +301,7 @@ async def update_message(
     message.is_edited = True
     await db.commit()
     await db.refresh(message)
+    reactions = await get_reaction_counts(db, [message.id])
     
     return MessageResponse(
         id=str(message.id),
@@ -144,7 +311,7 @@ async def update_message(
         parent_id=str(message.parent_id) if message.parent_id else None,
         is_edited=message.is_edited,
         is_pinned=message.is_pinned,
-        reactions=message.reactions,
+        reactions=reactions[str(message.id)],
         mentions=message.mentions,
         attachments=message.attachments,
         created_at=message.created_at,
@@ -170,6 +337,14 @@ async def delete_message(
     await db.commit()
     return {"message": "Message deleted"}
 
+@router.post("/reactions/batch", response_model=Dict[str, Dict[str, int]])
+async def get_reactions_batch(
+    batch: ReactionBatchRequest,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await get_reaction_counts(db, list(dict.fromkeys(batch.message_ids)), visible_to=current_user["id"])
+
 @router.post("/{message_id}/reactions")
 async def add_reaction(
     message_id: str,
@@ -177,22 +352,100 @@ async def add_reaction(
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    result = await db.execute(select(Message).where(Message.id == message_id))
-    message = result.scalar_one_or_none()
+    result = await db.execute(select(Message.channel_id).where(Message.id == message_id))
+    channel_id = result.scalar_one_or_none()
     
-    if not message:
+    if not channel_id:
         raise HTTPException(status_code=404, detail="Message not found")
+    if not await manager.membership.is_member(channel_id, current_user["id"], db):
+        raise HTTPException(status_code=403, detail="Not a member of this channel")
     
-    reactions = message.reactions or {}
-    if reaction.emoji not in reactions:
-        reactions[reaction.emoji] = []
-    if current_user["id"] not in reactions[reaction.emoji]:
-        reactions[reaction.emoji].append(current_user["id"])
+    # The unique key makes concurrent reactions safe; only a real insert bumps the count
+    result = await db.execute(
+        pg_insert(Reaction)
+        .values(message_id=message_id, user_id=current_user["id"], emoji=reaction.emoji)
+        .on_conflict_do_nothing(constraint="uq_message_reactions_message_user_emoji")
+        .returning(Reaction.id)
+    )
+    if result.scalar_one_or_none() is None:
+        return {"message": "Reaction already exists"}
     
-    message.reactions = reactions
+    stmt = pg_insert(ReactionCount).values(message_id=message_id, emoji=reaction.emoji, count=1)
+    result = await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[ReactionCount.message_id, ReactionCount.emoji],
+            set_={"count": ReactionCount.count + 1}
+        ).returning(ReactionCount.count)
+    )
+    count = result.scalar_one()
     await db.commit()
+    
+    await manager.publish_channel_event(str(channel_id), {
+        "type": "reaction",
+        "channel_id": str(channel_id),
+        "action": "added",
+        "message_id": message_id,
+        "user_id": current_user["id"],
+        "emoji": reaction.emoji,
+        "count": count
+    })
     return {"message": "Reaction added"}
 
+@router.delete("/{message_id}/reactions/{emoji}")
+async def remove_reaction(
+    message_id: str,
+    emoji: str,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    result = await db.execute(select(Message.channel_id).where(Message.id == message_id))
+    channel_id = result.scalar_one_or_none()
+    
+    if not channel_id:
+        raise HTTPException(status_code=404, detail="Message not found")
+    if not await manager.membership.is_member(channel_id, current_user["id"], db):
+        raise HTTPException(status_code=403, detail="Not a member of this channel")
+    
+    result = await db.execute(
+        delete(Reaction)
+        .where(
+            Reaction.message_id == message_id,
+            Reaction.user_id == current_user["id"],
+            Reaction.emoji == emoji
+        )
+        .returning(Reaction.id)
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Reaction not found")
+    
+    result = await db.execute(
+        update(ReactionCount)
+        .where(ReactionCount.message_id == message_id, ReactionCount.emoji == emoji)
+        .values(count=ReactionCount.count - 1)
+        .returning(ReactionCount.count)
+    )
+    count = max(result.scalar_one_or_none() or 0, 0)
+    if count == 0:
+        await db.execute(
+            delete(ReactionCount).where(
+                ReactionCount.message_id == message_id,
+                ReactionCount.emoji == emoji,
+                ReactionCount.count <= 0
+            )
+        )
+    await db.commit()
+    
+    await manager.publish_channel_event(str(channel_id), {
+        "type": "reaction",
+        "channel_id": str(channel_id),
+        "action": "removed",
+        "message_id": message_id,
+        "user_id": current_user["id"],
+        "emoji": emoji,
+        "count": count
+    })
+    return {"message": "Reaction removed"}
+
 @router.post("/{message_id}/bookmark")
 async def bookmark_message(
     message_id: str,
@@ -1,13 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from app.core.database import get_db
 from app.core.security import get_current_user
 from app.models.user import User, UserStatus
+from app.services.redis_service import RedisService
 from datetime import datetime
+from typing import Dict, List
+import uuid
 
 router = APIRouter()
+redis_service = RedisService()
 
 class UserProfile(BaseModel):
     id: str
@@ -19,6 +24,33 @@ class UserProfile(BaseModel):
     last_seen: datetime
     created_at: datetime
 
+class UserSummary(BaseModel):
+    id: str
+    username: str
+    full_name: str | None
+    avatar_url: str | None
+    status: UserStatus
+
+USER_PROFILE_COLUMNS = (
+    User.id,
+    User.email,
+    User.username,
+    User.full_name,
+    User.avatar_url,
+    User.status,
+    User.last_seen,
+    User.created_at
+)
+
+USER_SUMMARY_COLUMNS = (User.id, User.username, User.full_name, User.avatar_url, User.status)
+
+class UserBatchRequest(BaseModel):
+    user_ids: List[uuid.UUID] = Field(..., max_length=500)
+
+class UserPresence(BaseModel):
+    status: str
+    last_seen: int | None
+
 class UserUpdate(BaseModel):
     full_name: str | None = None
     avatar_url: str | None = None
@@ -77,24 +109,38 @@ async def update_user_profile(
         created_at=user.created_at
     )
 
+@router.post("/batch", response_model=List[UserSummary])
+async def get_users_batch(
+    batch: UserBatchRequest,
+    current_user: dict = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if not batch.user_ids:
+        return ORJSONResponse([])
+    
+    result = await db.execute(
+        select(*USER_SUMMARY_COLUMNS).where(User.id.in_(set(batch.user_ids)))
+    )
+    return ORJSONResponse([dict(row._mapping) for row in result.all()])
+
+@router.post("/presence", response_model=Dict[str, UserPresence])
+async def get_users_presence(
+    batch: UserBatchRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    if not batch.user_ids:
+        return ORJSONResponse({})
+    return ORJSONResponse(await redis_service.get_presence(list(dict.fromkeys(map(str, batch.user_ids)))))
+
 @router.get("/{user_id}", response_model=UserProfile)
 async def get_user_by_id(
     user_id: str,
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
-    if not user:
+    result = await db.execute(select(*USER_PROFILE_COLUMNS).where(User.id == user_id))
+    row = result.one_or_none()
+    if not row:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return UserProfile(
-        id=str(user.id),
-        email=user.email,
-        username=user.username,
-        full_name=user.full_name,
-        avatar_url=user.avatar_url,
-        status=user.status,
-        last_seen=user.last_seen,
-        created_at=user.created_at
-    )
+    return ORJSONResponse(dict(row._mapping))
@@ -1,11 +1,15 @@
+import asyncio
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from app.core.config import settings
+from app.core.metrics import instrument_engine
 
 # Convert postgresql:// to postgresql+asyncpg://
 database_url = settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
 
 engine = create_async_engine(database_url, echo=True, future=True)
+instrument_engine(engine.sync_engine)
 AsyncSessionLocal = async_sessionmaker(
     engine, 
     class_=AsyncSession, 
@@ -26,3 +30,11 @@ async def get_db():
             raise
         finally:
             await session.close()
+
+async def ping_database():
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+async def warm_up_database():
+    """Open the whole pool concurrently so early requests skip the connect handshake"""
+    await asyncio.gather(*(ping_database() for _ in range(engine.pool.size())))
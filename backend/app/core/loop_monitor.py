@@ -0,0 +1,113 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Optional
+from app.core.config import settings
+from app.core.metrics import LOOP_LAG_SECONDS, LOOP_STALLS
+
+class LoopMonitor:
+    """Measures event-loop lag and reports what was blocking it.
+
+    A sampler task sleeps for `interval` and records how late it woke up.
+    A watchdog thread notices when that wake-up is overdue by more than
+    `threshold` and grabs the loop thread's stack while it is still stuck,
+    so the report names the blocking callback rather than whatever ran after.
+    State is per process; each uvicorn worker has its own monitor.
+    """
+
+    def __init__(self, interval: float = None, threshold: float = None):
+        self.interval = interval or settings.LOOP_MONITOR_INTERVAL
+        self.threshold = threshold or settings.LOOP_MONITOR_THRESHOLD
+        self.stalls: Deque[Dict] = deque(maxlen=20)
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_tick: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._task is not None
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._sample())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopped.set()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        # Join before a later start() clears _stopped, or the old thread would keep watching
+        await asyncio.to_thread(self._watchdog.join)
+        self._watchdog = None
+        self._last_tick = None
+
+    async def configure(self, enabled: bool = None, threshold: float = None):
+        if threshold is not None:
+            self.threshold = threshold
+        if enabled is True:
+            self.start()
+        elif enabled is False:
+            await self.stop()
+
+    def status(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "recent_stalls": list(self.stalls)
+        }
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            self._last_tick = time.monotonic()
+            await asyncio.sleep(self.interval)
+            LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - started - self.interval))
+
+    def _watch(self):
+        reported_tick = None
+        while not self._stopped.wait(min(self.interval, self.threshold) / 2):
+            tick = self._last_tick
+            if tick is None or tick == reported_tick:
+                continue
+            blocked = time.monotonic() - tick - self.interval
+            if blocked > self.threshold:
+                reported_tick = tick
+                self._report(blocked)
+
+    def _report(self, blocked: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame else ""
+        task = asyncio.current_task(self._loop)
+        stall = {
+            "at": datetime.utcnow().isoformat(),
+            "blocked_ms": round(blocked * 1000, 1),
+            "task": task.get_name() if task else None,
+            "coroutine": repr(task.get_coro()) if task else None,
+            "stack": stack
+        }
+        self.stalls.append(stall)
+        LOOP_STALLS.inc()
+        # Printed from the watchdog thread, so the stuck loop is not touched
+        print(
+            f"Event loop blocked for {stall['blocked_ms']}ms+ in task {stall['task']} {stall['coroutine']}\n{stack}",
+            file=sys.stderr
+        )
+
+loop_monitor = LoopMonitor()
@@ -0,0 +1,88 @@
+"""Prometheus metrics for the hot paths, served at /metrics.
+
+Label values are fixed or bounded (stage and command names) and labelled
+children are resolved once at import, so recording a sample is a dict-free
+observe()/inc() call. Gauges use set_function and cost nothing until scraped.
+"""
+import time
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 100µs .. 2.5s; the default buckets start at 5ms, which hides most Redis calls
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5
+)
+
+WS_STAGE_SECONDS = Histogram(
+    "nexcord_ws_stage_seconds",
+    "Time spent in each stage of ConnectionManager.handle_message",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+WS_STAGES = {
+    stage: WS_STAGE_SECONDS.labels(stage)
+    for stage in ("membership", "rate_limit", "moderation", "broadcast", "total")
+}
+
+DB_QUERY_SECONDS = Histogram(
+    "nexcord_db_query_seconds",
+    "Postgres statement latency by statement type",
+    ["operation"],
+    buckets=LATENCY_BUCKETS
+)
+
+REDIS_COMMAND_SECONDS = Histogram(
+    "nexcord_redis_command_seconds",
+    "Redis round-trip latency by command; pipelines are recorded as PIPELINE",
+    ["command"],
+    buckets=LATENCY_BUCKETS
+)
+
+WS_BATCHED_EVENTS = Histogram(
+    "nexcord_ws_batched_events",
+    "Events per outgoing frame for connections with frame coalescing",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+
+LOOP_LAG_SECONDS = Histogram(
+    "nexcord_event_loop_lag_seconds",
+    "How late the loop monitor's sleep woke up",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+LOOP_STALLS = Counter("nexcord_event_loop_stalls_total", "Loop blocks past LOOP_MONITOR_THRESHOLD")
+
+ACTIVE_CONNECTIONS = Gauge("nexcord_ws_active_connections", "WebSocket connections held by this process")
+LOCAL_CHANNELS = Gauge(
+    "nexcord_ws_channels_with_local_subscribers",
+    "Channels whose latest broadcast reached at least one socket on this process"
+)
+PENDING_SENDS = Gauge("nexcord_ws_pending_sends", "WebSocket frames waiting on a slow socket")
+PUBLISH_BACKLOG = Gauge("nexcord_rabbitmq_publish_backlog", "Events buffered for RabbitMQ, in memory")
+
+MODERATION_VERDICTS = Counter("nexcord_moderation_verdicts_total", "AI moderation results", ["verdict"])
+VERDICTS = {
+    verdict: MODERATION_VERDICTS.labels(verdict)
+    for verdict in ("flagged", "clean", "skipped", "error")
+}
+
+DROPPED_EVENTS = Counter("nexcord_dropped_events_total", "Events not delivered, by reason", ["reason"])
+DROPPED = {
+    reason: DROPPED_EVENTS.labels(reason)
+    for reason in (
+        "not_member", "rate_limited", "moderation_blocked", "send_failed",
+        "publish_buffer_full", "read_cursor_failed", "spill_corrupt", "notification_failed"
+    )
+}
+
+def instrument_engine(engine: Engine):
+    """Time every statement on the engine via cursor execute events"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement else "UNKNOWN"
+        DB_QUERY_SECONDS.labels(operation).observe(time.perf_counter() - context._query_started)
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import random
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional, Set
+
+def fold(frame) -> str:
+    """One stack in collapsed format, root first: `f (file:line);g (file:line)`"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class SamplingProfiler:
+    """Statistical profiler for the event-loop thread of a running worker.
+
+    A background thread reads the loop thread's current frame at `rate_hz`
+    and counts folded stacks, which render directly with flamegraph.pl,
+    inferno or speedscope. In traced mode only samples taken while a traced
+    task is on the loop are kept, which profiles a random fraction of HTTP
+    requests and WebSocket messages. Nothing runs while no profile is active;
+    the request hooks cost one attribute check.
+    """
+
+    def __init__(self):
+        self.samples: Counter = Counter()
+        self.fraction = 0.0
+        self._traced: Set[asyncio.Task] = set()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def should_trace(self) -> bool:
+        return self.fraction > 0 and random.random() < self.fraction
+
+    @contextmanager
+    def trace(self):
+        """Mark the current task as profiled for the duration of the block"""
+        task = asyncio.current_task()
+        self._traced.add(task)
+        try:
+            yield
+        finally:
+            self._traced.discard(task)
+
+    async def profile(self, duration: float, rate_hz: int, fraction: float = None) -> str:
+        """Sample for `duration` seconds; with `fraction`, only traced requests count"""
+        if self.running:
+            raise RuntimeError("A profile is already running on this worker")
+        self.samples = Counter()
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._sample,
+            args=(asyncio.get_running_loop(), threading.get_ident(), 1 / rate_hz, fraction is not None),
+            name="sampling-profiler",
+            daemon=True
+        )
+        self.fraction = fraction or 0.0
+        self._thread.start()
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            self.fraction = 0.0
+            self._stopped.set()
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+            self._traced.clear()
+        return self.collapsed()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def _sample(self, loop: asyncio.AbstractEventLoop, thread_id: int, interval: float, traced_only: bool):
+        while not self._stopped.wait(interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            if traced_only and asyncio.current_task(loop) not in self._traced:
+                continue
+            self.samples[fold(frame)] += 1
+
+profiler = SamplingProfiler()
+
+class ProfilingMiddleware:
+    """Runs a sampled fraction of HTTP requests under profiler.trace()"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiler.should_trace():
+            await self.app(scope, receive, send)
+            return
+        with profiler.trace():
+            await self.app(scope, receive, send)
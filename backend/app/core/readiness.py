@@ -0,0 +1,63 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Optional
+from app.core.config import settings
+
+Check = Callable[[], Awaitable[None]]
+
+class Readiness:
+    """Per-dependency readiness for the /ready probe.
+
+    Each dependency registers a cheap check that raises when it is unusable.
+    Until the lifespan marks startup finished the probe reports
+    "starting"; after that every probe runs all checks concurrently, each
+    bounded by READINESS_CHECK_TIMEOUT, so one hung dependency cannot stall
+    the others. /health stays a plain liveness check.
+    """
+
+    def __init__(self):
+        self.checks: Dict[str, Check] = {}
+        self.started = False
+        self.startup: Dict[str, Dict] = {}
+
+    def register(self, name: str, check: Check):
+        self.checks[name] = check
+
+    async def warm_up(self, steps: Dict[str, Awaitable[None]], timeout: float = None):
+        """Run startup steps in parallel; failures are recorded, not raised"""
+        timeout = timeout or settings.STARTUP_WARMUP_TIMEOUT
+        results = await asyncio.gather(
+            *(self._timed(step, timeout) for step in steps.values())
+        )
+        self.startup = dict(zip(steps, results))
+        for name, result in self.startup.items():
+            if not result["ready"]:
+                print(f"Startup warm-up of {name} failed: {result['error']}")
+
+    async def report(self, timeout: float = None) -> Dict:
+        if not self.started:
+            return {"status": "starting", "dependencies": {}}
+        timeout = timeout or settings.READINESS_CHECK_TIMEOUT
+        results = await asyncio.gather(
+            *(self._timed(check(), timeout) for check in self.checks.values())
+        )
+        dependencies = dict(zip(self.checks, results))
+        ready = all(result["ready"] for result in dependencies.values())
+        return {"status": "ready" if ready else "not_ready", "dependencies": dependencies}
+
+    @staticmethod
+    async def _timed(step: Awaitable[None], timeout: float) -> Dict:
+        started = time.perf_counter()
+        error: Optional[str] = None
+        try:
+            await asyncio.wait_for(step, timeout)
+        except asyncio.TimeoutError:
+            error = f"timed out after {timeout}s"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        result = {"ready": error is None, "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+        if error is not None:
+            result["error"] = error
+        return result
+
+readiness = Readiness()
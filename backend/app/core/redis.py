@@ -0,0 +1,138 @@
+import asyncio
+import time
+from typing import List, Optional, Tuple
+import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
+from app.core.config import settings
+from app.core.metrics import REDIS_COMMAND_SECONDS
+
+# Single-key commands that are safe to reorder into a shared non-transactional pipeline
+AUTO_PIPELINE_COMMANDS = frozenset({
+    "get", "set", "setex", "delete", "exists", "expire", "incr", "incrby",
+    "hget", "hset", "hmget", "hgetall", "hdel",
+    "sadd", "srem", "smembers", "sismember", "scard",
+    "zadd", "zrem", "zcard", "zremrangebyscore",
+    "publish"
+})
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        started = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            REDIS_COMMAND_SECONDS.labels("PIPELINE").observe(time.perf_counter() - started)
+
+class InstrumentedRedis(redis.Redis):
+    """Redis client that records per-command latency; pub/sub reads are not timed"""
+
+    async def execute_command(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_SECONDS.labels(str(args[0]).upper()).observe(time.perf_counter() - started)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> Pipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+class AutoPipelineRedis:
+    """Redis client wrapper that coalesces commands issued in the same loop tick.
+
+    Calls to AUTO_PIPELINE_COMMANDS are queued and sent together as one pipeline
+    once the current tick yields, so N concurrent coroutines cost one network
+    write instead of N. Everything else (pipeline(), scan_iter(), ...) is passed
+    straight through to the underlying client.
+    """
+
+    def __init__(self, client: redis.Redis):
+        self.client = client
+        self._queue: List[Tuple[str, tuple, dict, asyncio.Future]] = []
+        self._flush_scheduled = False
+
+    def __getattr__(self, name: str):
+        if name not in AUTO_PIPELINE_COMMANDS:
+            return getattr(self.client, name)
+
+        def command(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._queue.append((name, args, kwargs, future))
+            if not self._flush_scheduled:
+                self._flush_scheduled = True
+                loop.call_soon(lambda: asyncio.ensure_future(self._flush()))
+            return future
+
+        return command
+
+    async def _flush(self):
+        batch, self._queue = self._queue, []
+        self._flush_scheduled = False
+        if not batch:
+            return
+
+        if len(batch) == 1:
+            name, args, kwargs, future = batch[0]
+            try:
+                result = await getattr(self.client, name)(*args, **kwargs)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                return
+            if not future.done():
+                future.set_result(result)
+            return
+
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for name, args, kwargs, _ in batch:
+                getattr(pipe, name)(*args, **kwargs)
+            results = await pipe.execute(raise_on_error=False)
+        except Exception as e:
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (*_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+_client: Optional[redis.Redis] = None
+
+def get_redis():
+    """Process-wide Redis client backed by one connection pool; created lazily"""
+    global _client
+    if _client is None:
+        pool = redis.ConnectionPool.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            health_check_interval=30
+        )
+        client = InstrumentedRedis(connection_pool=pool)
+        _client = AutoPipelineRedis(client) if settings.REDIS_AUTO_PIPELINE else client
+    return _client
+
+async def ping_redis():
+    await get_redis().ping()
+
+async def warm_up_redis():
+    # PING bypasses auto-pipelining, so each concurrent call holds its own connection
+    await asyncio.gather(*(ping_redis() for _ in range(settings.REDIS_WARMUP_CONNECTIONS)))
+
+async def close_redis():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        await _client.connection_pool.disconnect()
+        _client = None
@@ -45,6 +45,11 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
     except JWTError:
         raise credentials_exception
 
+async def require_admin(current_user: dict = Depends(get_current_user)) -> dict:
+    if current_user["id"] not in settings.ADMIN_USER_IDS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
+
 def create_refresh_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=7)
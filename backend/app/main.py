@@ -1,32 +1,56 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 from pathlib import Path
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 
 from app.core.config import settings
-from app.api.v1 import auth, channels, messages, users, files, analytics
-from app.websocket.manager import ConnectionManager
-from app.core.database import engine, Base
-from app.services.rabbitmq import RabbitMQService
+from app.api.v1 import auth, channels, messages, users, files, analytics, admin
+from app.websocket.manager import manager
+from app.websocket.codec import FrameError, negotiate
+from app.core.database import ping_database, warm_up_database
+from app.core.redis import close_redis, ping_redis, warm_up_redis
+from app.core.readiness import readiness
+from app.core.loop_monitor import loop_monitor
+from app.core.profiler import ProfilingMiddleware
+from app.services.rabbitmq import rabbitmq_service
 
-manager = ConnectionManager()
-rabbitmq_service = RabbitMQService()
+readiness.register("database", ping_database)
+readiness.register("redis", ping_redis)
+readiness.register("rabbitmq", rabbitmq_service.ping)
+
+async def connect_rabbitmq():
+    await rabbitmq_service.connect()
+    await rabbitmq_service.ping()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    
+    # Startup; the schema is owned by Alembic migrations (`alembic upgrade head`)
     # Create uploads directory
-    uploads_dir = Path("/app/uploads")
+    uploads_dir = Path(settings.LOCAL_UPLOAD_DIR)
     uploads_dir.mkdir(parents=True, exist_ok=True)
     
-    await rabbitmq_service.connect()
+    await readiness.warm_up({
+        "database": warm_up_database(),
+        "redis": warm_up_redis(),
+        "rabbitmq": connect_rabbitmq()
+    })
+    manager.read_cursors.start()
+    manager.presence.start()
+    manager.notifications.start()
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    readiness.started = True
     yield
-    # Shutdown
+    # Shutdown; stop reporting ready first so load balancers drain this instance
+    readiness.started = False
+    await loop_monitor.stop()
+    await manager.notifications.stop()
+    await manager.presence.stop()
+    await manager.read_cursors.stop()
     await rabbitmq_service.close()
+    await close_redis()
 
 app = FastAPI(
     title="Chat API with AI Moderation",
@@ -42,11 +66,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfilingMiddleware)
 
-# Mount uploads directory for serving files
-uploads_dir = Path("/app/uploads")
-uploads_dir.mkdir(parents=True, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=str(uploads_dir)), name="uploads")
+# Local-mode uploads, served with immutable caching, ETags and range support
+app.include_router(files.uploads_router)
 
 # API Routes
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
@@ -55,15 +78,25 @@ app.include_router(channels.router, prefix="/api/v1/channels", tags=["channels"]
 app.include_router(messages.router, prefix="/api/v1/messages", tags=["messages"])
 app.include_router(files.router, prefix="/api/v1/files", tags=["files"])
 app.include_router(analytics.router, prefix="/api/v1/analytics", tags=["analytics"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"])
 
 @app.websocket("/ws/{user_id}")
 async def websocket_endpoint(websocket: WebSocket, user_id: str):
-    await manager.connect(websocket, user_id)
+    # Opt-ins: ?batch=1 for coalesced `batch` frames, ?encoding=msgpack for binary frames
+    codec = negotiate(websocket.query_params.get("encoding"))
+    await manager.connect(websocket, user_id, batch=websocket.query_params.get("batch") == "1", codec=codec)
     try:
         while True:
-            data = await websocket.receive_json()
+            try:
+                data = await codec.receive(websocket)
+            except FrameError as e:
+                # A malformed frame is answered, not fatal; the socket stays open
+                await manager.send_personal_message(user_id, {"type": "error", "message": str(e)})
+                continue
             await manager.handle_message(user_id, data)
     except WebSocketDisconnect:
+        pass
+    finally:
         await manager.disconnect(user_id)
 
 @app.get("/")
@@ -77,3 +110,12 @@ async def root():
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
+
+@app.get("/ready")
+async def ready():
+    report = await readiness.report()
+    return JSONResponse(report, status_code=200 if report["status"] == "ready" else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,6 +1,7 @@
 from app.models.user import User, UserStatus
 from app.models.channel import Channel, ChannelType, MemberRole, channel_members
-from app.models.message import Message, Bookmark
+from app.models.message import Message, Bookmark, Reaction, ReactionCount, ReadCursor
+from app.models.file import StoredFile, FileReference
 
 __all__ = [
     "User",
@@ -10,5 +11,10 @@ __all__ = [
     "MemberRole",
     "channel_members",
     "Message",
-    "Bookmark"
+    "Bookmark",
+    "Reaction",
+    "ReactionCount",
+    "ReadCursor",
+    "StoredFile",
+    "FileReference"
 ]
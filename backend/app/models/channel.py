@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Table, Enum
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Table, Enum, Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
 import uuid
@@ -24,11 +24,16 @@ channel_members = Table(
     Column("channel_id", UUID(as_uuid=True), ForeignKey("channels.id", ondelete="CASCADE")),
     Column("user_id", UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE")),
     Column("role", Enum(MemberRole), default=MemberRole.MEMBER),
-    Column("joined_at", DateTime, default=datetime.utcnow)
+    Column("joined_at", DateTime, default=datetime.utcnow),
+    UniqueConstraint("channel_id", "user_id", name="uq_channel_members_channel_user"),
+    Index("ix_channel_members_user_id", "user_id")
 )
 
 class Channel(Base):
     __tablename__ = "channels"
+    __table_args__ = (
+        Index("ix_channels_created_at_id", "created_at", "id"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
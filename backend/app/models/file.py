@@ -0,0 +1,30 @@
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+from app.core.database import Base
+
+class StoredFile(Base):
+    """One stored blob per distinct upload content, shared by reference count.
+
+    Objects stored since content keys were introduced live at a key derived
+    from `content_hash`; older rows keep the URL they were uploaded under.
+    """
+    __tablename__ = "stored_files"
+    
+    content_hash = Column(String(64), primary_key=True)
+    url = Column(String, unique=True, nullable=False, index=True)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class FileReference(Base):
+    """A user's claim on a stored blob; StoredFile.ref_count counts these rows"""
+    __tablename__ = "file_references"
+    
+    content_hash = Column(String(64), ForeignKey("stored_files.content_hash", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    # The name and type this user uploaded the content as
+    filename = Column(String, nullable=True)
+    content_type = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
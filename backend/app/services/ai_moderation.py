@@ -1,17 +1,28 @@
-from openai import AsyncOpenAI
 from app.core.config import settings
+from app.core.metrics import VERDICTS
 
 class AIModerationService:
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY) if settings.OPENAI_API_KEY else None
+        self._client = None
+    
+    @property
+    def client(self):
+        """OpenAI client, built on first use so importing the app stays cheap"""
+        if self._client is None and settings.OPENAI_API_KEY:
+            # The SDK takes about half a second to import
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        return self._client
     
     async def moderate_content(self, content: str) -> dict:
         if not self.client:
+            VERDICTS["skipped"].inc()
             return {"is_toxic": False, "categories": {}, "scores": {}}
         
         try:
             response = await self.client.moderations.create(input=content)
             result = response.results[0]
+            VERDICTS["flagged" if result.flagged else "clean"].inc()
             
             return {
                 "is_toxic": result.flagged,
@@ -31,6 +42,7 @@ class AIModerationService:
                 }
             }
         except Exception as e:
+            VERDICTS["error"].inc()
             print(f"AI Moderation error: {e}")
             return {"is_toxic": False, "categories": {}, "scores": {}}
     
@@ -0,0 +1,42 @@
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.services.redis_service import RedisService
+
+# Channel events a reconnecting client needs to catch up on; typing is transient
+SEQUENCED_EVENTS = frozenset({"message", "read_receipt", "reaction"})
+
+class ChannelEventLog:
+    """Per-channel event sequence numbers and replay of missed events.
+
+    Each sequenced event takes its channel's next sequence number and is kept
+    in a capped, expiring Redis stream (CHANNEL_EVENT_LOG_SIZE entries). A
+    reconnecting client reports the last sequence it saw per channel and is
+    sent only the events after it. When a gap cannot be replayed exactly
+    (more than RESUME_MAX_EVENTS behind, trimmed or expired from the log, or
+    Redis lost the counter), the channel is reset and the client falls back
+    to a full history fetch.
+    """
+
+    def __init__(self, redis_service: RedisService = None):
+        self.redis_service = redis_service or RedisService()
+
+    async def append(self, channel_id: str, event: dict) -> dict:
+        seq = await self.redis_service.append_channel_event(channel_id, event)
+        return {**event, "seq": seq}
+
+    async def missed(self, positions: Dict[str, int], limit: int = None) -> Dict[str, Tuple[int, Optional[List[dict]]]]:
+        """Current sequence and missed events per channel; None events means reset"""
+        if not positions:
+            return {}
+        limit = limit or settings.RESUME_MAX_EVENTS
+        logged = await self.redis_service.get_channel_events_since(positions, limit + 1)
+        result = {}
+        for channel_id, last_seen in positions.items():
+            current, events = logged[channel_id]
+            if last_seen == current:
+                result[channel_id] = (current, [])
+            elif last_seen > current or current - last_seen > limit or not events or events[0]["seq"] != last_seen + 1:
+                result[channel_id] = (current, None)
+            else:
+                result[channel_id] = (current, events[:current - last_seen])
+        return result
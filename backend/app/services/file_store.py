@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from typing import AsyncIterator
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.file import FileReference, StoredFile
+from app.services.media import derived_keys
+from app.services.s3_service import S3Service
+
+@dataclass
+class StoredUpload:
+    url: str
+    size: int
+    content_hash: str
+    deduplicated: bool
+
+class FileStore:
+    """Content-addressed uploads on top of S3Service.
+
+    Uploads are hashed while they stream and then moved to a key derived from
+    the hash alone. If the content is already stored, the new copy is dropped
+    and the uploader gains a reference to the existing object, so identical
+    files are kept once. The uploader's filename and content type live on
+    their own reference, never in the shared key. References are held per user
+    and a user can only release their own; blobs are removed with the last one.
+    """
+
+    def __init__(self, s3_service: S3Service):
+        self.s3_service = s3_service
+
+    async def store(
+        self,
+        db: AsyncSession,
+        chunks: AsyncIterator[bytes],
+        filename: str,
+        content_type: str,
+        owner_id: str,
+        max_size: int = None
+    ) -> StoredUpload:
+        digest = hashlib.sha256()
+
+        async def hashed_chunks():
+            async for chunk in chunks:
+                # hashlib releases the GIL on large buffers, so this overlaps with I/O
+                await asyncio.to_thread(digest.update, chunk)
+                yield chunk
+
+        url, size = await self.s3_service.upload_stream(hashed_chunks(), filename, content_type, max_size)
+        content_hash = digest.hexdigest()
+
+        content_url = self.s3_service.url_for_key(self.s3_service.content_key(content_hash))
+
+        # Concurrent uploads of the same new content agree on one row; the upsert
+        # also locks it, so a concurrent release cannot drop the row or its blob
+        # before this upload's reference is counted
+        stmt = pg_insert(StoredFile).values(
+            content_hash=content_hash, url=content_url, size=size, content_type=content_type, ref_count=0
+        )
+        result = await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[StoredFile.content_hash],
+                set_={"ref_count": StoredFile.ref_count}
+            ).returning(StoredFile.url)
+        )
+        stored_url = result.scalar_one()
+        await self._add_reference(db, content_hash, owner_id, filename, content_type)
+
+        # Rows indexed before content keys keep their original URL
+        deduplicated = stored_url != content_url or await self.s3_service.exists(self.s3_service.content_key(content_hash))
+        if deduplicated:
+            await self.s3_service.delete_file(url)
+        else:
+            await self.s3_service.move(url, self.s3_service.content_key(content_hash), content_type)
+        await db.commit()
+        return StoredUpload(url=stored_url, size=size, content_hash=content_hash, deduplicated=deduplicated)
+
+    async def reuse(self, db: AsyncSession, content_hash: str, owner_id: str):
+        """The stored file and the user's own reference to it, or None; nothing is uploaded again"""
+        result = await db.execute(
+            select(StoredFile, FileReference)
+            .join(FileReference, FileReference.content_hash == StoredFile.content_hash)
+            .where(StoredFile.content_hash == content_hash.lower(), FileReference.user_id == owner_id)
+        )
+        return result.one_or_none()
+
+    async def release(self, db: AsyncSession, url: str, owner_id: str) -> bool:
+        """Drop the user's reference; the blob itself goes when the last one does.
+
+        Returns False if the user holds no reference to `url`.
+        """
+        result = await db.execute(
+            delete(FileReference)
+            .where(
+                FileReference.user_id == owner_id,
+                FileReference.content_hash == select(StoredFile.content_hash).where(StoredFile.url == url).scalar_subquery()
+            )
+            .returning(FileReference.content_hash)
+        )
+        content_hash = result.scalar_one_or_none()
+        if content_hash is None:
+            await db.rollback()
+            return False
+
+        result = await db.execute(
+            delete(StoredFile)
+            .where(StoredFile.content_hash == content_hash, StoredFile.ref_count <= 1)
+            .returning(StoredFile.content_hash)
+        )
+        if result.scalar_one_or_none() is None:
+            await db.execute(
+                update(StoredFile)
+                .where(StoredFile.content_hash == content_hash)
+                .values(ref_count=StoredFile.ref_count - 1)
+            )
+            await db.commit()
+            return True
+
+        # The blob goes while the deleted row is still locked: an upload of the same
+        # content waits on it and then stores its own copy under the same key
+        await self.s3_service.delete_file(url)
+        file_key = self.s3_service.storage_key(url)
+        await asyncio.gather(*(
+            self.s3_service.delete_file(self.s3_service.url_for_key(key)) for key in derived_keys(file_key)
+        ))
+        await db.commit()
+        return True
+
+    async def _add_reference(self, db: AsyncSession, content_hash: str, owner_id: str, filename: str, content_type: str):
+        # A user uploading the same content twice still holds a single reference
+        result = await db.execute(
+            pg_insert(FileReference)
+            .values(content_hash=content_hash, user_id=owner_id, filename=filename, content_type=content_type)
+            .on_conflict_do_nothing()
+            .returning(FileReference.content_hash)
+        )
+        if result.scalar_one_or_none() is not None:
+            await db.execute(
+                update(StoredFile)
+                .where(StoredFile.content_hash == content_hash)
+                .values(ref_count=StoredFile.ref_count + 1)
+            )
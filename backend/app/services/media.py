@@ -0,0 +1,75 @@
+import asyncio
+import io
+import shutil
+from typing import Dict, List, Optional
+from app.core.config import settings
+
+IMAGE_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
+VIDEO_TYPES = {"video/mp4", "video/webm"}
+
+def needs_preview(content_type: Optional[str]) -> bool:
+    return content_type in IMAGE_TYPES or content_type in VIDEO_TYPES
+
+def thumbnail_key(file_key: str, size: int) -> str:
+    return f"{file_key}.thumb{size}.webp"
+
+def preview_key(file_key: str) -> str:
+    return f"{file_key}.preview.jpg"
+
+def derived_keys(file_key: str) -> List[str]:
+    """Every object the preview pipeline may store next to an original"""
+    return [thumbnail_key(file_key, size) for size in settings.MEDIA_THUMBNAIL_SIZES] + [preview_key(file_key)]
+
+def encode_webp(image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="WEBP", quality=80, method=4)
+    return buffer.getvalue()
+
+def render_thumbnails(data: bytes, sizes: List[int]) -> Dict[int, bytes]:
+    """Decode an image once and encode a WebP thumbnail per bounding size.
+
+    CPU-bound; meant to run in a process pool, so it only takes and returns
+    picklable values. Images are never upscaled: sizes at or above the source
+    share one full-size encode.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+        thumbnails = {}
+        full_size = None
+        for size in sizes:
+            if size >= max(image.size):
+                full_size = full_size or encode_webp(image)
+                thumbnails[size] = full_size
+            else:
+                thumbnail = image.copy()
+                thumbnail.thumbnail((size, size))
+                thumbnails[size] = encode_webp(thumbnail)
+        return thumbnails
+
+def render_jpeg(data: bytes) -> bytes:
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        buffer = io.BytesIO()
+        image.convert("RGB").save(buffer, format="JPEG", quality=85)
+        return buffer.getvalue()
+
+async def extract_first_frame(source: str) -> Optional[bytes]:
+    """First video frame as PNG via ffmpeg; `source` may be a path or URL"""
+    if not shutil.which("ffmpeg"):
+        return None
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-v", "error", "-i", source, "-frames:v", "1", "-f", "image2pipe", "-vcodec", "png", "-",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0 or not stdout:
+        print(f"ffmpeg preview error: {stderr.decode(errors='replace').strip()}")
+        return None
+    return stdout
@@ -0,0 +1,104 @@
+import time
+import uuid
+from collections import OrderedDict
+from typing import Hashable, Iterable, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.channel import MemberRole, channel_members
+from app.services.redis_service import RedisService
+
+_MISSING = object()
+
+class TTLCache:
+    """Small in-process LRU cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable, default=_MISSING):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value):
+        self._data[key] = (value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+class MembershipService:
+    """Channel membership and role lookups: process cache, then Redis, then Postgres.
+
+    Non-members are cached too, so repeated unauthorized attempts stay cheap.
+    Membership writes store the new role in Redis (see RedisService) and call
+    `evict` for this process; other workers catch up within MEMBERSHIP_LOCAL_TTL.
+    A database read only fills the Redis entry if it is still empty, so a
+    lookup that raced with a write cannot cache the role from before it.
+    """
+
+    def __init__(self, redis_service: RedisService = None):
+        self.redis_service = redis_service or RedisService()
+        self.local = TTLCache(settings.MEMBERSHIP_CACHE_SIZE, settings.MEMBERSHIP_LOCAL_TTL)
+
+    async def get_role(self, channel_id: str, user_id: str, db: AsyncSession = None) -> Optional[MemberRole]:
+        try:
+            channel_id, user_id = str(uuid.UUID(str(channel_id))), str(uuid.UUID(str(user_id)))
+        except ValueError:
+            return None
+
+        key = (channel_id, user_id)
+        role = self.local.get(key)
+        if role is not _MISSING:
+            return role
+
+        cached = await self.redis_service.get_membership(channel_id, user_id)
+        if cached is not None:
+            role = MemberRole(cached) if cached else None
+            self.local.set(key, role)
+            return role
+
+        role = await self._load_role(channel_id, user_id, db)
+        cached = await self.redis_service.cache_membership(
+            channel_id, user_id, role.value if role else "", settings.MEMBERSHIP_REDIS_TTL
+        )
+        role = MemberRole(cached) if cached else None
+        self.local.set(key, role)
+        return role
+
+    async def is_member(self, channel_id: str, user_id: str, db: AsyncSession = None) -> bool:
+        return await self.get_role(channel_id, user_id, db) is not None
+
+    def evict(self, channel_id: str, user_ids: Iterable[str]):
+        try:
+            channel_id = str(uuid.UUID(str(channel_id)))
+            keys = [(channel_id, str(uuid.UUID(str(user_id)))) for user_id in user_ids]
+        except ValueError:
+            return
+        for key in keys:
+            self.local.pop(key)
+
+    async def _load_role(self, channel_id: str, user_id: str, db: AsyncSession = None) -> Optional[MemberRole]:
+        query = select(channel_members.c.role).where(
+            channel_members.c.channel_id == channel_id,
+            channel_members.c.user_id == user_id
+        )
+        if db is not None:
+            return (await db.execute(query)).scalar_one_or_none()
+        async with AsyncSessionLocal() as session:
+            return (await session.execute(query)).scalar_one_or_none()
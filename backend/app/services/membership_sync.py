@@ -0,0 +1,44 @@
+import asyncio
+from sqlalchemy import select
+from app.core.database import AsyncSessionLocal
+from app.models.channel import channel_members
+from app.services.redis_service import RedisService
+
+async def rebuild_channel_member_sets(redis_service: RedisService = None) -> int:
+    """Repopulate every channel:{id}:members set from Postgres.
+
+    Rows are streamed ordered by channel so only one channel's members are held
+    in memory at a time. Sets for channels with no members left are removed.
+    Returns the number of channels rebuilt.
+    """
+    redis_service = redis_service or RedisService()
+    rebuilt = set()
+
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(
+            select(channel_members.c.channel_id, channel_members.c.user_id)
+            .order_by(channel_members.c.channel_id)
+            .execution_options(yield_per=5000)
+        )
+        current_channel, members = None, []
+        async for channel_id, user_id in result:
+            if channel_id != current_channel:
+                if current_channel is not None:
+                    await redis_service.replace_channel_members(str(current_channel), members)
+                    rebuilt.add(str(current_channel))
+                current_channel, members = channel_id, []
+            members.append(str(user_id))
+        if current_channel is not None:
+            await redis_service.replace_channel_members(str(current_channel), members)
+            rebuilt.add(str(current_channel))
+
+    async for key in redis_service.redis.scan_iter(match="channel:*:members", count=1000):
+        channel_id = key.split(":")[1]
+        if channel_id not in rebuilt:
+            await redis_service.redis.delete(key)
+
+    return len(rebuilt)
+
+if __name__ == "__main__":
+    count = asyncio.run(rebuild_channel_member_sets())
+    print(f"Rebuilt member sets for {count} channels")
@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+import orjson
+from app.services.redis_service import RedisService, LIVE_NOTIFICATIONS_CHANNEL
+
+# Mention tokens that address the whole channel; "here" only reaches online members
+CHANNEL_MENTIONS = frozenset({"channel", "everyone", "here"})
+
+PREVIEW_LENGTH = 140
+
+def message_notification_job(
+    channel_id: str,
+    sender_id: str,
+    content: str,
+    mentions: List[str],
+    parent_id: Optional[str] = None,
+    message_id: Optional[str] = None,
+    created_at: Optional[datetime] = None
+) -> Optional[Dict]:
+    """Queue payload for a new message, or None when nobody needs notifying.
+
+    Recipients are resolved by the notification worker, so this stays O(1)
+    for the sender no matter how large the mentioned channel is.
+    """
+    if not mentions and not parent_id:
+        return None
+    return {
+        "type": "message",
+        "channel_id": str(channel_id),
+        "sender_id": str(sender_id),
+        "message_id": str(message_id) if message_id else None,
+        "parent_id": str(parent_id) if parent_id else None,
+        "mentions": [str(mention) for mention in mentions],
+        "preview": content[:PREVIEW_LENGTH],
+        "created_at": (created_at or datetime.utcnow()).isoformat()
+    }
+
+class NotificationRelay:
+    """Forwards live notifications from the worker to sockets held by this process"""
+
+    def __init__(self, redis_service: RedisService, send: Callable[[str, Dict], Awaitable[None]]):
+        self.redis_service = redis_service
+        self.send = send
+        self._task: Optional[asyncio.Task] = None
+
+    async def deliver(self, payload: bytes):
+        event = orjson.loads(payload)
+        for user_id in event["user_ids"]:
+            await self.send(user_id, event["notification"])
+
+    async def _listen(self):
+        while True:
+            pubsub = self.redis_service.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(LIVE_NOTIFICATIONS_CHANNEL)
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message:
+                        await self.deliver(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Notification relay error: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,103 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Tuple
+from sqlalchemy import update, values, column, DateTime
+from sqlalchemy.dialects.postgresql import UUID
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.user import User, UserStatus
+from app.services.redis_service import RedisService
+
+FLUSH_CHUNK_SIZE = 5000
+
+class PresenceService:
+    """Heartbeats Redis presence for local sockets and batches status/last_seen writes to Postgres"""
+
+    def __init__(self, redis_service: RedisService, connected_users: Callable[[], Iterable[str]]):
+        self.redis_service = redis_service
+        self.connected_users = connected_users
+        self.pending: Dict[str, Tuple[UserStatus, datetime]] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    async def mark_online(self, user_id: str):
+        await self.redis_service.set_user_status(user_id, "online")
+        self._record(user_id, UserStatus.ONLINE)
+
+    async def mark_offline(self, user_id: str):
+        await self.redis_service.set_user_status(user_id, "offline")
+        self._record(user_id, UserStatus.OFFLINE)
+
+    def touch(self, user_id: str):
+        self._record(user_id, UserStatus.ONLINE)
+
+    def _record(self, user_id: str, status: UserStatus):
+        try:
+            uuid.UUID(str(user_id))
+        except ValueError:
+            return
+        self.pending[user_id] = (status, datetime.utcnow())
+
+    async def heartbeat(self):
+        user_ids = list(self.connected_users())
+        await self.redis_service.refresh_presence(user_ids)
+        for user_id in user_ids:
+            self.touch(user_id)
+
+    async def flush(self):
+        batch, self.pending = self.pending, {}
+        rows = [(user_id, status, last_seen) for user_id, (status, last_seen) in batch.items()]
+
+        try:
+            async with AsyncSessionLocal() as session:
+                for start in range(0, len(rows), FLUSH_CHUNK_SIZE):
+                    presence = values(
+                        column("id", UUID(as_uuid=False)),
+                        column("status", User.status.type),
+                        column("last_seen", DateTime),
+                        name="presence"
+                    ).data(rows[start:start + FLUSH_CHUNK_SIZE])
+                    await session.execute(
+                        update(User)
+                        .where(User.id == presence.c.id)
+                        .values(status=presence.c.status, last_seen=presence.c.last_seen)
+                        .execution_options(synchronize_session=False)
+                    )
+
+                # Users left "online" by a worker that died without flushing
+                await session.execute(
+                    update(User)
+                    .where(
+                        User.status == UserStatus.ONLINE,
+                        User.last_seen < datetime.utcnow() - timedelta(seconds=settings.PRESENCE_TTL)
+                    )
+                    .values(status=UserStatus.OFFLINE)
+                    .execution_options(synchronize_session=False)
+                )
+                await session.commit()
+        except Exception as e:
+            print(f"Presence flush error: {e}")
+            for user_id, entry in batch.items():
+                self.pending.setdefault(user_id, entry)
+
+    async def _every(self, interval: float, job: Callable):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await job()
+            except Exception as e:
+                print(f"Presence {job.__name__} error: {e}")
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._every(settings.PRESENCE_HEARTBEAT_INTERVAL, self.heartbeat)),
+                asyncio.create_task(self._every(settings.PRESENCE_FLUSH_INTERVAL, self.flush))
+            ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.flush()
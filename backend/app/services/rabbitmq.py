@@ -1,51 +1,238 @@
 import aio_pika
 from app.core.config import settings
-import json
+from app.core.metrics import DROPPED, PUBLISH_BACKLOG
+from collections import deque
+from pathlib import Path
+from typing import Deque, List, Optional, Tuple
+import asyncio
+import orjson
+import threading
+import time
+
+QUEUES = ("notifications", "analytics")
+
+# (routing_key, body, enqueued_at)
+PendingMessage = Tuple[str, bytes, float]
 
 class RabbitMQService:
+    """Buffered publisher with a channel pool and publisher confirms.
+
+    publish_* calls only enqueue; a background task sends batches concurrently
+    over the pooled channels and waits for broker confirms. While the broker is
+    unreachable, events wait in a bounded buffer (overflowing to
+    RABBITMQ_SPILL_PATH when set) and are replayed once it is back.
+    """
+
     def __init__(self):
         self.connection = None
-        self.channel = None
-    
+        self.channels: List[aio_pika.abc.AbstractChannel] = []
+        self.buffer: Deque[PendingMessage] = deque()
+        self.spill_path = Path(settings.RABBITMQ_SPILL_PATH) if settings.RABBITMQ_SPILL_PATH else None
+        self.spilled_backlog = 0
+        # Spills and replays run in worker threads; one lock serializes all file access
+        self._spill_lock = threading.Lock()
+        self.latencies: Deque[float] = deque(maxlen=1000)
+        self.counters = {"published": 0, "failed": 0, "dropped": 0, "spilled": 0, "corrupt": 0}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def channel(self):
+        return self.channels[0] if self.channels else None
+
+    @property
+    def connected(self) -> bool:
+        return bool(self.channels) and self.connection is not None and not self.connection.is_closed
+
     async def connect(self):
+        if self.spill_path:
+            # Events spilled before a restart are replayed like any other backlog
+            await asyncio.to_thread(self._count_spilled)
+        await self._open_channels()
+        self._ensure_publisher()
+        if self.spilled_backlog:
+            self._wakeup.set()
+
+    async def ping(self):
+        if not self.connected:
+            raise ConnectionError("RabbitMQ is not connected")
+
+    async def _open_channels(self):
         try:
             self.connection = await aio_pika.connect_robust(settings.RABBITMQ_URL)
-            self.channel = await self.connection.channel()
-            await self.channel.declare_queue("notifications", durable=True)
-            await self.channel.declare_queue("analytics", durable=True)
+            # Robust channels are restored by aio_pika after a reconnect
+            self.channels = [
+                await self.connection.channel(publisher_confirms=True)
+                for _ in range(settings.RABBITMQ_CHANNEL_POOL_SIZE)
+            ]
+            for queue in QUEUES + (settings.MEDIA_QUEUE,):
+                await self.channels[0].declare_queue(queue, durable=True)
         except Exception as e:
             print(f"RabbitMQ connection error: {e}")
-    
+            self.connection = None
+            self.channels = []
+
     async def publish_notification(self, user_id: str, notification: dict):
-        if not self.channel:
-            await self.connect()
-        
-        try:
-            message = aio_pika.Message(
-                body=json.dumps({"user_id": user_id, **notification}).encode(),
-                delivery_mode=aio_pika.DeliveryMode.PERSISTENT
-            )
-            await self.channel.default_exchange.publish(
-                message, routing_key="notifications"
-            )
-        except Exception as e:
-            print(f"RabbitMQ publish error: {e}")
-    
+        await self.publish("notifications", {"user_id": user_id, **notification})
+
+    async def publish_message_notification(self, job: dict):
+        """Recipients of a message job are resolved by app.workers.notifications"""
+        await self.publish("notifications", job)
+
     async def publish_analytics_event(self, event: dict):
-        if not self.channel:
-            await self.connect()
-        
-        try:
-            message = aio_pika.Message(
-                body=json.dumps(event).encode(),
-                delivery_mode=aio_pika.DeliveryMode.PERSISTENT
-            )
-            await self.channel.default_exchange.publish(
-                message, routing_key="analytics"
+        await self.publish("analytics", event)
+
+    async def publish_media_job(self, job: dict):
+        await self.publish(settings.MEDIA_QUEUE, job)
+
+    async def publish(self, routing_key: str, payload: dict):
+        item = (routing_key, orjson.dumps(payload), time.monotonic())
+        if len(self.buffer) >= settings.RABBITMQ_BUFFER_SIZE:
+            if self.spill_path:
+                await asyncio.to_thread(self._spill, [item])
+            else:
+                self.buffer.popleft()
+                self.counters["dropped"] += 1
+                DROPPED["publish_buffer_full"].inc()
+        if len(self.buffer) < settings.RABBITMQ_BUFFER_SIZE:
+            self.buffer.append(item)
+        self._ensure_publisher()
+        self._wakeup.set()
+
+    def _ensure_publisher(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._publish_loop())
+
+    async def _publish_loop(self):
+        while True:
+            # Without channels keep reconnecting even when idle, or a broker that was
+            # down at boot would leave the service unready with nothing to wake it
+            if self.channels and not self.buffer and not self.spilled_backlog:
+                await self._wakeup.wait()
+            self._wakeup.clear()
+
+            if not self.channels:
+                await self._open_channels()
+                if not self.channels:
+                    await asyncio.sleep(settings.RABBITMQ_RETRY_DELAY)
+                continue
+
+            if self.spilled_backlog and len(self.buffer) < settings.RABBITMQ_BUFFER_SIZE // 2:
+                try:
+                    await self._replay_spilled()
+                except OSError as e:
+                    # The spill file stays as it was; buffered events still go out
+                    print(f"RabbitMQ spill replay error: {e}")
+                    await asyncio.sleep(settings.RABBITMQ_RETRY_DELAY)
+
+            batch = [self.buffer.popleft() for _ in range(min(settings.RABBITMQ_BATCH_SIZE, len(self.buffer)))]
+            if not batch:
+                continue
+            results = await asyncio.gather(
+                *(self._publish_one(index, item) for index, item in enumerate(batch)),
+                return_exceptions=True
             )
-        except Exception as e:
-            print(f"RabbitMQ publish error: {e}")
-    
+            failed = [item for item, result in zip(batch, results) if isinstance(result, Exception)]
+            if failed:
+                self.counters["failed"] += len(failed)
+                print(f"RabbitMQ publish error: {next(r for r in results if isinstance(r, Exception))}")
+                # Retry in original order once the robust connection recovers
+                self.buffer.extendleft(reversed(failed))
+                await asyncio.sleep(settings.RABBITMQ_RETRY_DELAY)
+
+    async def _publish_one(self, index: int, item: PendingMessage):
+        routing_key, body, enqueued_at = item
+        channel = self.channels[index % len(self.channels)]
+        # With publisher confirms this returns only once the broker has the message
+        await channel.default_exchange.publish(
+            aio_pika.Message(body=body, delivery_mode=aio_pika.DeliveryMode.PERSISTENT),
+            routing_key=routing_key,
+            timeout=settings.RABBITMQ_PUBLISH_TIMEOUT
+        )
+        self.counters["published"] += 1
+        self.latencies.append(time.monotonic() - enqueued_at)
+
+    def _count_spilled(self):
+        with self._spill_lock:
+            if self.spill_path.exists():
+                with open(self.spill_path, "rb") as f:
+                    self.spilled_backlog = sum(1 for _ in f)
+
+    def _spill(self, items: List[PendingMessage]):
+        with self._spill_lock:
+            with open(self.spill_path, "ab") as f:
+                for routing_key, body, _ in items:
+                    f.write(orjson.dumps({"routing_key": routing_key, "body": body.decode()}) + b"\n")
+            self.spilled_backlog += len(items)
+            self.counters["spilled"] += len(items)
+
+    def _take_spilled(self, limit: int) -> List[PendingMessage]:
+        with self._spill_lock:
+            if not self.spill_path.exists():
+                self.spilled_backlog = 0
+                return []
+            lines = self.spill_path.read_bytes().splitlines()
+            taken, rest = lines[:limit], lines[limit:]
+            # Every taken line is parsed before the file is rewritten; a line cut short
+            # by a crash mid-spill is set aside instead of wedging the replay
+            now = time.monotonic()
+            pending, corrupt = [], []
+            for line in taken:
+                if not line.strip():
+                    continue
+                try:
+                    record = orjson.loads(line)
+                    pending.append((record["routing_key"], record["body"].encode(), now))
+                except (orjson.JSONDecodeError, KeyError, TypeError, AttributeError):
+                    corrupt.append(line)
+            if corrupt:
+                with open(self.spill_path.with_name(self.spill_path.name + ".corrupt"), "ab") as f:
+                    f.write(b"\n".join(corrupt) + b"\n")
+                self.counters["corrupt"] += len(corrupt)
+                DROPPED["spill_corrupt"].inc(len(corrupt))
+            if rest:
+                self.spill_path.write_bytes(b"\n".join(rest) + b"\n")
+            else:
+                self.spill_path.unlink()
+            self.spilled_backlog = len(rest)
+        return pending
+
+    async def _replay_spilled(self):
+        room = settings.RABBITMQ_BUFFER_SIZE - len(self.buffer)
+        self.buffer.extend(await asyncio.to_thread(self._take_spilled, room))
+
+    def metrics(self) -> dict:
+        latencies = sorted(self.latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000, 2)
+
+        return {
+            "connected": self.connected,
+            "backlog": len(self.buffer),
+            "spilled_backlog": self.spilled_backlog,
+            **self.counters,
+            "publish_latency_ms": {"p50": percentile(0.5), "p99": percentile(0.99)}
+        }
+
     async def close(self):
+        if self._task:
+            # Give queued events a moment to go out, then keep the rest on disk
+            deadline = time.monotonic() + settings.RABBITMQ_PUBLISH_TIMEOUT
+            while self.buffer and self.channels and time.monotonic() < deadline:
+                self._wakeup.set()
+                await asyncio.sleep(0.05)
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.buffer and self.spill_path:
+            await asyncio.to_thread(self._spill, list(self.buffer))
+            self.buffer.clear()
         if self.connection:
             await self.connection.close()
+
+rabbitmq_service = RabbitMQService()
+PUBLISH_BACKLOG.set_function(lambda: len(rabbitmq_service.buffer))
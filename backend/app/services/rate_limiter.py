@@ -1,13 +1,16 @@
-import redis.asyncio as redis
 from app.core.config import settings
+from app.core.redis import get_redis
 from datetime import datetime
 
 class RateLimiter:
     def __init__(self):
-        self.redis = redis.from_url(settings.REDIS_URL, decode_responses=True)
         self.max_messages = settings.RATE_LIMIT_MESSAGES
         self.window = settings.RATE_LIMIT_WINDOW
     
+    @property
+    def redis(self):
+        return get_redis()
+    
     async def check_rate_limit(self, user_id: str) -> bool:
         key = f"rate_limit:{user_id}"
         current_time = int(datetime.utcnow().timestamp())
@@ -0,0 +1,108 @@
+import asyncio
+import uuid
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from sqlalchemy import select, values, column
+from sqlalchemy.dialects.postgresql import insert as pg_insert, UUID
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.metrics import DROPPED
+from app.models.message import Message, ReadCursor
+
+class ReadCursorService:
+    """Coalesces read receipts; the latest per (user, channel) is upserted each interval"""
+
+    def __init__(self, flush_interval: float = None):
+        self.flush_interval = flush_interval or settings.READ_CURSOR_FLUSH_INTERVAL
+        self.pending: Dict[Tuple[str, str], str] = {}
+        # Failed flushes per pending key; receipts are dropped after READ_CURSOR_MAX_ATTEMPTS
+        self.attempts: Dict[Tuple[str, str], int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, user_id: str, channel_id: str, message_id: str):
+        # Canonical ids, so one (user, channel) never becomes two rows in the upsert
+        try:
+            user_id = str(uuid.UUID(str(user_id)))
+            channel_id = str(uuid.UUID(str(channel_id)))
+            message_id = str(uuid.UUID(str(message_id)))
+        except ValueError:
+            return
+        self.pending[(user_id, channel_id)] = message_id
+
+    async def flush(self):
+        if not self.pending:
+            return
+
+        batch, self.pending = self.pending, {}
+        receipts = values(
+            column("user_id", UUID(as_uuid=False)),
+            column("channel_id", UUID(as_uuid=False)),
+            column("message_id", UUID(as_uuid=False)),
+            name="receipts"
+        ).data([(user_id, channel_id, message_id) for (user_id, channel_id), message_id in batch.items()])
+
+        # The read position comes from the message itself, so a client cannot
+        # move a cursor past what exists in the channel. Receipts naming a message
+        # from another channel are dropped, which also keeps (user, channel)
+        # unique within the upsert.
+        source = select(
+            receipts.c.user_id,
+            Message.channel_id,
+            Message.id,
+            Message.created_at
+        ).join(
+            receipts,
+            (Message.id == receipts.c.message_id) & (Message.channel_id == receipts.c.channel_id)
+        )
+
+        stmt = pg_insert(ReadCursor).from_select(
+            ["user_id", "channel_id", "last_read_message_id", "last_read_at"], source
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ReadCursor.user_id, ReadCursor.channel_id],
+            set_={
+                "last_read_message_id": stmt.excluded.last_read_message_id,
+                "last_read_at": stmt.excluded.last_read_at,
+                "updated_at": datetime.utcnow()
+            },
+            where=ReadCursor.last_read_at < stmt.excluded.last_read_at
+        )
+
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.execute(stmt)
+                await session.commit()
+        except Exception as e:
+            print(f"Read cursor flush error: {e}")
+            # Keep receipts for the next window unless a newer one arrived meanwhile,
+            # but give up on a receipt that keeps failing rather than retrying forever
+            for key, message_id in batch.items():
+                attempts = self.attempts.get(key, 0) + 1
+                if attempts >= settings.READ_CURSOR_MAX_ATTEMPTS:
+                    self.attempts.pop(key, None)
+                    DROPPED["read_cursor_failed"].inc()
+                    continue
+                self.attempts[key] = attempts
+                self.pending.setdefault(key, message_id)
+            return
+        for key in batch:
+            self.attempts.pop(key, None)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
@@ -1,31 +1,225 @@
-import redis.asyncio as redis
 from app.core.config import settings
+from app.core.redis import get_redis
+from typing import Dict, List, Optional, Tuple
 import json
+import time
+
+# Pub/sub channel every API instance listens on for live notifications
+LIVE_NOTIFICATIONS_CHANNEL = "notifications:live"
+
+# Bumped whenever a public channel appears; cached channel list pages built
+# before the bump are treated as misses, for every user at once
+CHANNEL_DIRECTORY_VERSION = "channel_list:version"
+
+# Takes the channel's next sequence number and logs the event under stream id
+# "<seq>-0" in one step, so log order always matches sequence order
+APPEND_CHANNEL_EVENT = """
+local seq = redis.call('INCR', KEYS[1])
+redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[2], seq .. '-0', 'event', ARGV[1])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return seq
+"""
 
 class RedisService:
-    def __init__(self):
-        self.redis = redis.from_url(settings.REDIS_URL, decode_responses=True)
+    @property
+    def redis(self):
+        # Resolved per call so services built at import never hold a closed client
+        return get_redis()
     
-    async def set_user_status(self, user_id: str, status: str):
-        await self.redis.hset(f"user:{user_id}", "status", status)
-        await self.redis.hset(f"user:{user_id}", "last_seen", str(int(redis.time.time())))
+    async def set_user_status(self, user_id: str, status: str, ttl: int = None):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(f"user:{user_id}", mapping={"status": status, "last_seen": str(int(time.time()))})
+        pipe.expire(f"user:{user_id}", ttl or settings.PRESENCE_TTL)
+        await pipe.execute()
+    
+    async def refresh_presence(self, user_ids: list, ttl: int = None):
+        """Heartbeat many users in one round trip; keys expire if heartbeats stop"""
+        if not user_ids:
+            return
+        now = str(int(time.time()))
+        pipe = self.redis.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.hset(f"user:{user_id}", mapping={"status": "online", "last_seen": now})
+            pipe.expire(f"user:{user_id}", ttl or settings.PRESENCE_TTL)
+        await pipe.execute()
     
     async def get_user_status(self, user_id: str) -> str:
         return await self.redis.hget(f"user:{user_id}", "status") or "offline"
     
+    async def get_presence(self, user_ids: list) -> dict:
+        pipe = self.redis.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.hmget(f"user:{user_id}", "status", "last_seen")
+        results = await pipe.execute()
+        return {
+            user_id: {
+                "status": status or "offline",
+                "last_seen": int(last_seen) if last_seen else None
+            }
+            for user_id, (status, last_seen) in zip(user_ids, results)
+        }
+    
     async def add_to_channel(self, channel_id: str, user_id: str):
         await self.redis.sadd(f"channel:{channel_id}:members", user_id)
     
     async def remove_from_channel(self, channel_id: str, user_id: str):
         await self.redis.srem(f"channel:{channel_id}:members", user_id)
     
+    async def add_channel_members(self, channel_id: str, user_ids: list, role: str = "member"):
+        """Add members, write their role through and drop their cached channel lists in one round trip"""
+        if not user_ids:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.sadd(f"channel:{channel_id}:members", *user_ids)
+        pipe.delete(*[f"channel_list:{user_id}" for user_id in user_ids])
+        for user_id in user_ids:
+            pipe.set(f"membership:{channel_id}:{user_id}", role, ex=settings.MEMBERSHIP_REDIS_TTL)
+        await pipe.execute()
+    
+    async def remove_channel_members(self, channel_id: str, user_ids: list):
+        if not user_ids:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.srem(f"channel:{channel_id}:members", *user_ids)
+        pipe.delete(*[f"channel_list:{user_id}" for user_id in user_ids])
+        for user_id in user_ids:
+            pipe.set(f"membership:{channel_id}:{user_id}", "", ex=settings.MEMBERSHIP_REDIS_TTL)
+        await pipe.execute()
+    
+    async def replace_channel_members(self, channel_id: str, user_ids: list):
+        """Swap in a freshly built member set atomically so readers never see it empty"""
+        key = f"channel:{channel_id}:members"
+        if not user_ids:
+            await self.redis.delete(key)
+            return
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(f"{key}:rebuild")
+        pipe.sadd(f"{key}:rebuild", *user_ids)
+        pipe.rename(f"{key}:rebuild", key)
+        await pipe.execute()
+    
+    async def get_membership(self, channel_id: str, user_id: str) -> str:
+        """Cached role for a member, "" for a known non-member, None if not cached"""
+        return await self.redis.get(f"membership:{channel_id}:{user_id}")
+    
+    async def cache_membership(self, channel_id: str, user_id: str, role: str, ttl: int) -> str:
+        """Cache a role read from the database unless a membership write already
+        stored a newer one; returns whichever role is cached afterwards"""
+        key = f"membership:{channel_id}:{user_id}"
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.set(key, role, ex=ttl, nx=True)
+        pipe.get(key)
+        _, cached = await pipe.execute()
+        return cached if cached is not None else role
+    
     async def get_channel_members(self, channel_id: str) -> list:
         members = await self.redis.smembers(f"channel:{channel_id}:members")
         return list(members)
     
+    async def filter_channel_members(self, channel_id: str, user_ids: list) -> list:
+        if not user_ids:
+            return []
+        flags = await self.redis.smismember(f"channel:{channel_id}:members", user_ids)
+        return [user_id for user_id, is_member in zip(user_ids, flags) if is_member]
+    
+    async def iter_channel_members(self, channel_id: str, chunk_size: int):
+        """Yield the member set in chunks via SSCAN; members may repeat across chunks"""
+        chunk = []
+        async for user_id in self.redis.sscan_iter(f"channel:{channel_id}:members", count=chunk_size):
+            chunk.append(user_id)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    
+    async def publish_live_notification(self, user_ids: list, notification: dict):
+        await self.redis.publish(
+            LIVE_NOTIFICATIONS_CHANNEL,
+            json.dumps({"user_ids": user_ids, "notification": notification})
+        )
+    
+    async def add_to_digests(self, user_ids: list, notification: dict):
+        """Coalesce a notification into each offline user's pending digest"""
+        payload = json.dumps(notification)
+        ttl = settings.NOTIFICATION_DIGEST_TTL
+        pipe = self.redis.pipeline(transaction=False)
+        for user_id in user_ids:
+            key = f"notification_digest:{user_id}"
+            pipe.hincrby(key, "total", 1)
+            pipe.hincrby(key, f"channel:{notification['channel_id']}", 1)
+            pipe.lpush(f"{key}:recent", payload)
+            pipe.ltrim(f"{key}:recent", 0, settings.NOTIFICATION_DIGEST_MAX_ITEMS - 1)
+            pipe.expire(key, ttl)
+            pipe.expire(f"{key}:recent", ttl)
+        await pipe.execute()
+    
+    async def pop_notification_digest(self, user_id: str) -> dict:
+        key = f"notification_digest:{user_id}"
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hgetall(key)
+        pipe.lrange(f"{key}:recent", 0, -1)
+        pipe.delete(key, f"{key}:recent")
+        counts, recent, _ = await pipe.execute()
+        if not counts:
+            return None
+        return {
+            "total": int(counts.pop("total", 0)),
+            "channels": {field.split(":", 1)[1]: int(count) for field, count in counts.items()},
+            "recent": [json.loads(item) for item in recent]
+        }
+    
+    async def append_channel_event(self, channel_id: str, event: dict) -> int:
+        """Log an event in the channel's capped recent-event stream; returns its sequence number"""
+        return await self.redis.eval(
+            APPEND_CHANNEL_EVENT, 2,
+            f"channel:{channel_id}:seq", f"channel:{channel_id}:events",
+            json.dumps(event), settings.CHANNEL_EVENT_LOG_SIZE, settings.CHANNEL_EVENT_LOG_TTL
+        )
+    
+    async def get_channel_events_since(self, positions: Dict[str, int], count: int) -> Dict[str, Tuple[int, List[dict]]]:
+        """Each channel's current sequence and up to `count` logged events after the given one"""
+        pipe = self.redis.pipeline(transaction=True)
+        for channel_id, seq in positions.items():
+            pipe.get(f"channel:{channel_id}:seq")
+            pipe.xrange(f"channel:{channel_id}:events", min=f"{seq + 1}-0", count=count)
+        results = await pipe.execute()
+        return {
+            channel_id: (
+                int(current or 0),
+                [
+                    {**json.loads(fields["event"]), "seq": int(entry_id.split("-", 1)[0])}
+                    for entry_id, fields in entries
+                ]
+            )
+            for channel_id, current, entries in zip(positions, results[::2], results[1::2])
+        }
+    
     async def cache_message(self, message_id: str, message_data: dict, ttl: int = 3600):
         await self.redis.setex(f"message:{message_id}", ttl, json.dumps(message_data))
     
     async def get_cached_message(self, message_id: str) -> dict:
         data = await self.redis.get(f"message:{message_id}")
         return json.loads(data) if data else None
+    
+    async def get_cached_channel_list(self, user_id: str, page_key: str) -> Tuple[Optional[str], str]:
+        """The cached page if it is still current, and the directory version to cache a rebuilt one under"""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.get(CHANNEL_DIRECTORY_VERSION)
+        pipe.hget(f"channel_list:{user_id}", page_key)
+        version, cached = await pipe.execute()
+        version = version or "0"
+        if not cached:
+            return None, version
+        stamp, _, payload = cached.partition(":")
+        return (payload if stamp == version else None), version
+    
+    async def cache_channel_list(self, user_id: str, page_key: str, payload: str, ttl: int, version: str = "0"):
+        pipe = self.redis.pipeline()
+        pipe.hset(f"channel_list:{user_id}", page_key, f"{version}:{payload}")
+        pipe.expire(f"channel_list:{user_id}", ttl)
+        await pipe.execute()
+    
+    async def invalidate_channel_directory(self):
+        """Expire every user's cached channel list pages, e.g. once a public channel is created"""
+        await self.redis.incr(CHANNEL_DIRECTORY_VERSION)
@@ -1,73 +1,258 @@
-import boto3
+import asyncio
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from app.core.config import settings
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Tuple
 import uuid
 import os
 from pathlib import Path
 
+class FileTooLargeError(Exception):
+    pass
+
+async def iter_bytes(data: bytes, chunk_size: int = None) -> AsyncIterator[bytes]:
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
 class S3Service:
     def __init__(self):
-        if settings.AWS_ACCESS_KEY_ID and settings.AWS_SECRET_ACCESS_KEY and settings.AWS_ACCESS_KEY_ID != "placeholder":
-            self.s3_client = boto3.client(
+        self.use_local = not (
+            settings.AWS_ACCESS_KEY_ID and settings.AWS_SECRET_ACCESS_KEY and settings.AWS_ACCESS_KEY_ID != "placeholder"
+        )
+        self._s3_client = None
+        if self.use_local:
+            # Use local file storage for development
+            self.bucket = None
+            self.local_upload_dir = Path(settings.LOCAL_UPLOAD_DIR)
+            self.local_upload_dir.mkdir(parents=True, exist_ok=True)
+        else:
+            # boto3 is blocking, so every call runs on a dedicated bounded pool
+            # sized to match the client's HTTP connection pool
+            self.executor = ThreadPoolExecutor(
+                max_workers=settings.S3_MAX_CONNECTIONS, thread_name_prefix="s3"
+            )
+            self.bucket = settings.AWS_S3_BUCKET
+    
+    @property
+    def s3_client(self):
+        """boto3 client, built on first use; boto3 is slow to import and construct"""
+        if self._s3_client is None and not self.use_local:
+            import boto3
+            self._s3_client = boto3.client(
                 's3',
                 aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
                 aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_REGION
+                region_name=settings.AWS_REGION,
+                endpoint_url=settings.AWS_S3_ENDPOINT_URL or None,
+                config=Config(
+                    max_pool_connections=settings.S3_MAX_CONNECTIONS,
+                    retries={"max_attempts": 3, "mode": "standard"},
+                    s3={"addressing_style": "path" if settings.AWS_S3_ENDPOINT_URL else "auto"}
+                )
             )
-            self.bucket = settings.AWS_S3_BUCKET
-            self.use_local = False
-        else:
-            # Use local file storage for development
-            self.s3_client = None
-            self.bucket = None
-            self.use_local = True
-            self.local_upload_dir = Path("/app/uploads")
-            self.local_upload_dir.mkdir(parents=True, exist_ok=True)
+        return self._s3_client
+    
+    @s3_client.setter
+    def s3_client(self, client):
+        self._s3_client = client
     
     async def upload_file(self, file_data: bytes, filename: str, content_type: str) -> str:
+        url, _ = await self.upload_stream(iter_bytes(file_data), filename, content_type)
+        return url
+    
+    async def upload_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        filename: str,
+        content_type: str,
+        max_size: int = None
+    ) -> Tuple[str, int]:
+        """Store an upload chunk by chunk; raises FileTooLargeError once max_size is crossed"""
+        max_size = max_size or settings.MAX_UPLOAD_SIZE
+        filename = Path(filename or "file").name
+        
         if self.use_local:
-            # Local file storage
-            file_id = str(uuid.uuid4())
-            file_path = self.local_upload_dir / f"{file_id}_{filename}"
-            
-            with open(file_path, "wb") as f:
-                f.write(file_data)
-            
-            return f"/uploads/{file_id}_{filename}"
+            return await self._upload_local_stream(chunks, filename, max_size)
         
         # S3 storage
         if not self.s3_client:
             raise Exception("S3 is not configured")
         
+        file_key = f"uploads/{uuid.uuid4()}/{filename}"
+        size = await self._upload_s3_stream(chunks, file_key, content_type, max_size)
+        return self.object_url(file_key), size
+    
+    def object_url(self, file_key: str) -> str:
+        if settings.AWS_S3_ENDPOINT_URL:
+            return f"{settings.AWS_S3_ENDPOINT_URL.rstrip('/')}/{self.bucket}/{file_key}"
+        return f"https://{self.bucket}.s3.{settings.AWS_REGION}.amazonaws.com/{file_key}"
+    
+    def key_from_url(self, file_url: str) -> str:
+        return file_url.split(self.object_url(""), 1)[1]
+    
+    def storage_key(self, file_url: str) -> str:
+        """Key of a stored file in whichever backend is active"""
+        if self.use_local:
+            return file_url.split("/")[-1]
+        return self.key_from_url(file_url)
+    
+    def url_for_key(self, file_key: str) -> str:
+        return f"/uploads/{file_key}" if self.use_local else self.object_url(file_key)
+    
+    def content_key(self, content_hash: str) -> str:
+        """Object key for deduplicated content; names nothing but the content itself"""
+        return content_hash if self.use_local else f"uploads/{content_hash}"
+    
+    async def move(self, file_url: str, file_key: str, content_type: str) -> str:
+        """Move a stored upload to `file_key`, replacing any object already there"""
+        source_key = self.storage_key(file_url)
+        if self.use_local:
+            await asyncio.to_thread(os.replace, self.local_upload_dir / source_key, self.local_upload_dir / file_key)
+            return self.url_for_key(file_key)
+        await self._run(
+            self.s3_client.copy_object,
+            Bucket=self.bucket, Key=file_key, CopySource={"Bucket": self.bucket, "Key": source_key},
+            ContentType=content_type, MetadataDirective="REPLACE", ACL='public-read'
+        )
+        await self._run(self.s3_client.delete_object, Bucket=self.bucket, Key=source_key)
+        return self.object_url(file_key)
+    
+    async def exists(self, file_key: str) -> bool:
+        if self.use_local:
+            return await asyncio.to_thread((self.local_upload_dir / file_key).exists)
         try:
-            file_key = f"uploads/{uuid.uuid4()}/{filename}"
-            self.s3_client.put_object(
-                Bucket=self.bucket,
-                Key=file_key,
-                Body=file_data,
-                ContentType=content_type,
-                ACL='public-read'
+            await self._run(self.s3_client.head_object, Bucket=self.bucket, Key=file_key)
+            return True
+        except ClientError:
+            return False
+    
+    async def read_bytes(self, file_key: str) -> bytes:
+        if self.use_local:
+            return await asyncio.to_thread((self.local_upload_dir / file_key).read_bytes)
+        response = await self._run(self.s3_client.get_object, Bucket=self.bucket, Key=file_key)
+        return await asyncio.to_thread(response["Body"].read)
+    
+    async def put_bytes(self, file_key: str, data: bytes, content_type: str) -> str:
+        """Write a small object at a fixed key, e.g. a derived preview"""
+        if self.use_local:
+            await asyncio.to_thread((self.local_upload_dir / file_key).write_bytes, data)
+        else:
+            await self._run(
+                self.s3_client.put_object,
+                Bucket=self.bucket, Key=file_key, Body=data, ContentType=content_type, ACL='public-read'
             )
-            return f"https://{self.bucket}.s3.{settings.AWS_REGION}.amazonaws.com/{file_key}"
-        except ClientError as e:
-            print(f"S3 upload error: {e}")
-            raise Exception("Failed to upload file")
+        return self.url_for_key(file_key)
+    
+    async def _run(self, fn, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(fn, **kwargs))
+    
+    async def _upload_local_stream(self, chunks: AsyncIterator[bytes], filename: str, max_size: int) -> Tuple[str, int]:
+        file_id = str(uuid.uuid4())
+        file_path = self.local_upload_dir / f"{file_id}_{filename}"
+        size = 0
+        
+        # Blocking file I/O runs in worker threads so the event loop keeps serving sockets
+        f = await asyncio.to_thread(open, file_path, "wb")
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLargeError(f"File exceeds {max_size} bytes")
+                await asyncio.to_thread(f.write, chunk)
+        except BaseException:
+            await asyncio.to_thread(f.close)
+            await asyncio.to_thread(file_path.unlink, True)
+            raise
+        await asyncio.to_thread(f.close)
+        
+        return f"/uploads/{file_id}_{filename}", size
+    
+    async def _upload_s3_stream(self, chunks: AsyncIterator[bytes], file_key: str, content_type: str, max_size: int) -> int:
+        part_size = settings.S3_MULTIPART_PART_SIZE
+        # Bounds both parallel part uploads and the parts held in memory
+        slots = asyncio.Semaphore(settings.S3_MULTIPART_CONCURRENCY)
+        buffer = bytearray()
+        uploads = []
+        upload_id = None
+        size = 0
+        
+        async def upload_part(part_number: int, body: bytes) -> dict:
+            try:
+                response = await self._run(
+                    self.s3_client.upload_part,
+                    Bucket=self.bucket, Key=file_key, UploadId=upload_id, PartNumber=part_number, Body=body
+                )
+                return {"ETag": response["ETag"], "PartNumber": part_number}
+            finally:
+                slots.release()
+        
+        async def start_part(body: bytes):
+            await slots.acquire()
+            uploads.append(asyncio.create_task(upload_part(len(uploads) + 1, body)))
+        
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLargeError(f"File exceeds {max_size} bytes")
+                buffer += chunk
+                if len(buffer) >= part_size:
+                    if upload_id is None:
+                        response = await self._run(
+                            self.s3_client.create_multipart_upload,
+                            Bucket=self.bucket, Key=file_key, ContentType=content_type, ACL='public-read'
+                        )
+                        upload_id = response["UploadId"]
+                    await start_part(bytes(buffer))
+                    buffer.clear()
+            
+            if upload_id is None:
+                # Small file: one request, no multipart bookkeeping
+                await self._run(
+                    self.s3_client.put_object,
+                    Bucket=self.bucket, Key=file_key, Body=bytes(buffer), ContentType=content_type, ACL='public-read'
+                )
+                return size
+            
+            if buffer:
+                await start_part(bytes(buffer))
+            parts = await asyncio.gather(*uploads)
+            await self._run(
+                self.s3_client.complete_multipart_upload,
+                Bucket=self.bucket, Key=file_key, UploadId=upload_id, MultipartUpload={"Parts": list(parts)}
+            )
+            return size
+        except BaseException as e:
+            for task in uploads:
+                task.cancel()
+            await asyncio.gather(*uploads, return_exceptions=True)
+            if upload_id is not None:
+                await self._run(
+                    self.s3_client.abort_multipart_upload, Bucket=self.bucket, Key=file_key, UploadId=upload_id
+                )
+            if isinstance(e, ClientError):
+                print(f"S3 upload error: {e}")
+                raise Exception("Failed to upload file")
+            raise
     
     async def delete_file(self, file_url: str):
         if self.use_local:
             # Local file deletion
             filename = file_url.split("/")[-1]
             file_path = self.local_upload_dir / filename
-            if file_path.exists():
-                file_path.unlink()
+            await asyncio.to_thread(file_path.unlink, missing_ok=True)
             return
         
         if not self.s3_client:
             raise Exception("S3 is not configured")
         
         try:
-            file_key = file_url.split(f"{self.bucket}.s3.{settings.AWS_REGION}.amazonaws.com/")[1]
-            self.s3_client.delete_object(Bucket=self.bucket, Key=file_key)
+            file_key = self.key_from_url(file_url)
+            await self._run(self.s3_client.delete_object, Bucket=self.bucket, Key=file_key)
         except ClientError as e:
             print(f"S3 delete error: {e}")
             raise Exception("Failed to delete file")
@@ -81,8 +266,9 @@ class S3Service:
             raise Exception("S3 is not configured")
         
         try:
-            url = self.s3_client.generate_presigned_url(
-                'get_object',
+            url = await self._run(
+                self.s3_client.generate_presigned_url,
+                ClientMethod='get_object',
                 Params={'Bucket': self.bucket, 'Key': file_key},
                 ExpiresIn=expiration
             )
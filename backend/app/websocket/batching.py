@@ -0,0 +1,55 @@
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+from app.core.config import settings
+from app.core.metrics import WS_BATCHED_EVENTS
+
+# Sent on their own frame at once; anything already buffered is flushed first to keep order
+BYPASS_EVENTS = frozenset({"heartbeat_ack", "error", "moderation_warning", "notification", "resumed"})
+
+class FrameBatcher:
+    """Coalesces one connection's outgoing events into `batch` frames.
+
+    Events wait up to WS_COALESCE_DELAY, or until WS_COALESCE_MAX_EVENTS are
+    buffered, and then go out as one `{"type": "batch", "events": [...]}`
+    frame; a lone event is sent as a plain frame. Only used for clients that
+    opted in on connect, so older clients see one frame per event as before.
+    """
+
+    def __init__(self, send: Callable[[dict], Awaitable[None]], delay: float = None, max_events: int = None):
+        self.send = send
+        self.delay = delay or settings.WS_COALESCE_DELAY
+        self.max_events = max_events or settings.WS_COALESCE_MAX_EVENTS
+        self.pending: List[dict] = []
+        self._timer: Optional[asyncio.Task] = None
+
+    async def add(self, event: dict):
+        if event.get("type") in BYPASS_EVENTS:
+            await self.flush()
+            await self.send(event)
+            return
+        self.pending.append(event)
+        if len(self.pending) >= self.max_events:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def flush(self):
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        self._timer = None
+        events, self.pending = self.pending, []
+        if not events:
+            return
+        WS_BATCHED_EVENTS.observe(len(events))
+        await self.send(events[0] if len(events) == 1 else {"type": "batch", "events": events})
+
+    def close(self):
+        """Drop buffered events; the socket is gone"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.pending = []
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.delay)
+        await self.flush()
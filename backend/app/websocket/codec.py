@@ -0,0 +1,102 @@
+from typing import Dict, Optional, Union
+import json
+import msgpack
+from fastapi import WebSocket
+
+# Field names shortened on the MessagePack wire, in both directions. Only
+# top-level keys and the events inside a batch frame are mapped; nested
+# payloads (moderation categories, digests, resume summaries) keep theirs.
+SHORT_KEYS: Dict[str, str] = {
+    "type": "t",
+    "channel_id": "c",
+    "user_id": "u",
+    "message_id": "m",
+    "content": "b",
+    "timestamp": "ts",
+    "status": "s",
+    "seq": "q",
+    "events": "e",
+    "channels": "ch",
+    "mentions": "mn",
+    "parent_id": "p",
+    "message": "msg",
+    "notification": "n",
+}
+LONG_KEYS = {short: key for key, short in SHORT_KEYS.items()}
+
+class FrameError(ValueError):
+    """A client frame that could not be decoded into a message"""
+
+def _rename(message: dict, keys: Dict[str, str]) -> dict:
+    return {keys.get(key, key): value for key, value in message.items()}
+
+class JSONCodec:
+    """The original protocol: JSON text frames"""
+
+    name = "json"
+
+    def encode(self, message: dict) -> bytes:
+        # Same output as WebSocket.send_json, which send() uses
+        return json.dumps(message, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    def decode(self, data: bytes) -> dict:
+        return json.loads(data)
+
+    async def send(self, websocket: WebSocket, message: dict):
+        await websocket.send_json(message)
+
+    async def receive(self, websocket: WebSocket) -> dict:
+        try:
+            # KeyError: the client sent a binary frame
+            message = await websocket.receive_json()
+        except (KeyError, ValueError) as e:
+            raise FrameError("Expected a JSON text frame") from e
+        if not isinstance(message, dict):
+            raise FrameError("Expected a JSON object")
+        return message
+
+class MessagePackCodec:
+    """MessagePack binary frames with SHORT_KEYS field names"""
+
+    name = "msgpack"
+
+    def encode(self, message: dict) -> bytes:
+        message = _rename(message, SHORT_KEYS)
+        if message.get("t") == "batch":
+            message["e"] = [_rename(event, SHORT_KEYS) for event in message["e"]]
+        return msgpack.packb(message)
+
+    def decode(self, data: bytes) -> dict:
+        try:
+            message = msgpack.unpackb(data)
+        except (ValueError, TypeError, msgpack.UnpackException) as e:
+            raise FrameError("Malformed MessagePack frame") from e
+        if not isinstance(message, dict):
+            raise FrameError("Expected a MessagePack map")
+        message = _rename(message, LONG_KEYS)
+        if message.get("type") == "batch":
+            events = message.get("events")
+            if not isinstance(events, list) or not all(isinstance(event, dict) for event in events):
+                raise FrameError("Expected a list of maps in a batch frame")
+            message["events"] = [_rename(event, LONG_KEYS) for event in events]
+        return message
+
+    async def send(self, websocket: WebSocket, message: dict):
+        await websocket.send_bytes(self.encode(message))
+
+    async def receive(self, websocket: WebSocket) -> dict:
+        try:
+            # KeyError: the client sent a text frame
+            data = await websocket.receive_bytes()
+        except KeyError as e:
+            raise FrameError("Expected a binary frame") from e
+        return self.decode(data)
+
+Codec = Union[JSONCodec, MessagePackCodec]
+
+JSON = JSONCodec()
+CODECS = {codec.name: codec for codec in (JSON, MessagePackCodec())}
+
+def negotiate(encoding: Optional[str]) -> Codec:
+    """Codec for the ?encoding= a client asked for; unknown or missing means JSON"""
+    return CODECS.get(encoding or "json", JSON)
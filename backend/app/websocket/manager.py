@@ -1,34 +1,132 @@
 from fastapi import WebSocket
-from typing import Dict
+from contextlib import AsyncExitStack, asynccontextmanager, nullcontext
+import asyncio
+from typing import Dict, List
 from datetime import datetime
+from app.core.config import settings
+from app.core.metrics import (
+    WS_STAGES, DROPPED, ACTIVE_CONNECTIONS, LOCAL_CHANNELS, PENDING_SENDS
+)
+from app.core.profiler import profiler
 from app.services.redis_service import RedisService
 from app.services.ai_moderation import AIModerationService
 from app.services.rate_limiter import RateLimiter
+from app.services.read_cursors import ReadCursorService
+from app.services.membership import MembershipService
+from app.services.presence import PresenceService
+from app.services.notifications import NotificationRelay, message_notification_job
+from app.services.channel_events import ChannelEventLog, SEQUENCED_EVENTS
+from app.websocket.batching import FrameBatcher
+from app.websocket.codec import Codec, JSON
+from app.services.rabbitmq import rabbitmq_service
+
+class ChannelLocks:
+    """Per-channel asyncio locks, dropped once nobody holds or waits on them"""
+
+    def __init__(self):
+        self._locks: Dict[str, List] = {}
+
+    @asynccontextmanager
+    async def hold(self, channel_id: str):
+        entry = self._locks.setdefault(channel_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[channel_id]
+
+    def __len__(self):
+        return len(self._locks)
 
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
+        # Connections that negotiated frame coalescing or a non-JSON encoding
+        self.batchers: Dict[str, FrameBatcher] = {}
+        self.codecs: Dict[str, Codec] = {}
         self.redis_service = RedisService()
         self.ai_moderation = AIModerationService()
         self.rate_limiter = RateLimiter()
+        self.read_cursors = ReadCursorService()
+        self.membership = MembershipService(self.redis_service)
+        self.presence = PresenceService(self.redis_service, lambda: self.active_connections.keys())
+        self.notifications = NotificationRelay(self.redis_service, self.send_personal_message)
+        self.channel_events = ChannelEventLog(self.redis_service)
+        # Sequencing and delivery of a channel's events happen under its lock, so
+        # every local recipient sees them in seq order
+        self.channel_locks = ChannelLocks()
+        # Local recipients of each channel's latest broadcast; channels at zero are dropped
+        self.local_subscribers: Dict[str, int] = {}
+        self.pending_sends = 0
+        ACTIVE_CONNECTIONS.set_function(lambda: len(self.active_connections))
+        LOCAL_CHANNELS.set_function(lambda: len(self.local_subscribers))
+        PENDING_SENDS.set_function(lambda: self.pending_sends)
     
-    async def connect(self, websocket: WebSocket, user_id: str):
+    async def connect(self, websocket: WebSocket, user_id: str, batch: bool = False, codec: Codec = JSON):
         await websocket.accept()
         self.active_connections[user_id] = websocket
-        await self.redis_service.set_user_status(user_id, "online")
+        previous = self.batchers.pop(user_id, None)
+        if previous:
+            previous.close()
+        self.codecs.pop(user_id, None)
+        if codec is not JSON:
+            self.codecs[user_id] = codec
+        if batch and settings.WS_COALESCE_ENABLED:
+            self.batchers[user_id] = FrameBatcher(lambda message: self._send(websocket, message, codec))
+        await self.presence.mark_online(user_id)
         await self.broadcast_presence(user_id, "online")
+        
+        # Mentions and replies that arrived while the user was offline
+        digest = await self.redis_service.pop_notification_digest(user_id)
+        if digest:
+            await self.send_personal_message(user_id, {"type": "notification_digest", **digest})
     
     async def disconnect(self, user_id: str):
         if user_id in self.active_connections:
             del self.active_connections[user_id]
-        await self.redis_service.set_user_status(user_id, "offline")
+        batcher = self.batchers.pop(user_id, None)
+        if batcher:
+            batcher.close()
+        self.codecs.pop(user_id, None)
+        await self.presence.mark_offline(user_id)
         await self.broadcast_presence(user_id, "offline")
     
     async def handle_message(self, user_id: str, data: dict):
+        traced = profiler.trace() if profiler.should_trace() else nullcontext()
+        with WS_STAGES["total"].time(), traced:
+            await self._handle_message(user_id, data)
+    
+    async def _handle_message(self, user_id: str, data: dict):
         message_type = data.get("type")
         
+        if message_type == "heartbeat":
+            self.presence.touch(user_id)
+            await self.send_personal_message(user_id, {"type": "heartbeat_ack"})
+            return
+        
+        if message_type == "resume":
+            await self.resume(user_id, data.get("channels"))
+            return
+        
+        if message_type in ("message", "typing", "read_receipt"):
+            with WS_STAGES["membership"].time():
+                is_member = await self.membership.is_member(data.get("channel_id"), user_id)
+            if not is_member:
+                DROPPED["not_member"].inc()
+                await self.send_personal_message(user_id, {
+                    "type": "error",
+                    "message": "Not a member of this channel"
+                })
+                return
+        
         if message_type == "message":
-            if not await self.rate_limiter.check_rate_limit(user_id):
+            with WS_STAGES["rate_limit"].time():
+                allowed = await self.rate_limiter.check_rate_limit(user_id)
+            if not allowed:
+                DROPPED["rate_limited"].inc()
                 await self.send_personal_message(user_id, {
                     "type": "error",
                     "message": "Rate limit exceeded (100 messages/min)"
@@ -36,9 +134,11 @@ class ConnectionManager:
                 return
             
             content = data.get("content", "")
-            moderation_result = await self.ai_moderation.moderate_content(content)
+            with WS_STAGES["moderation"].time():
+                moderation_result = await self.ai_moderation.moderate_content(content)
             
             if moderation_result["is_toxic"]:
+                DROPPED["moderation_blocked"].inc()
                 await self.send_personal_message(user_id, {
                     "type": "moderation_warning",
                     "message": "Your message was flagged by AI moderation",
@@ -46,12 +146,24 @@ class ConnectionManager:
                 })
                 return
             
-            await self.broadcast_to_channel(data.get("channel_id"), {
-                "type": "message",
-                "user_id": user_id,
-                "content": content,
-                "timestamp": datetime.utcnow().isoformat()
-            })
+            with WS_STAGES["broadcast"].time():
+                await self.publish_channel_event(data.get("channel_id"), {
+                    "type": "message",
+                    "channel_id": data.get("channel_id"),
+                    "user_id": user_id,
+                    "content": content,
+                    "timestamp": datetime.utcnow().isoformat()
+                })
+            
+            notification_job = message_notification_job(
+                channel_id=data.get("channel_id"),
+                sender_id=user_id,
+                content=content,
+                mentions=data.get("mentions") or [],
+                parent_id=data.get("parent_id")
+            )
+            if notification_job:
+                await rabbitmq_service.publish_message_notification(notification_job)
         
         elif message_type == "typing":
             await self.broadcast_to_channel(data.get("channel_id"), {
@@ -60,21 +172,89 @@ class ConnectionManager:
             }, exclude_user=user_id)
         
         elif message_type == "read_receipt":
-            await self.broadcast_to_channel(data.get("channel_id"), {
+            self.read_cursors.record(user_id, data.get("channel_id"), data.get("message_id"))
+            await self.publish_channel_event(data.get("channel_id"), {
                 "type": "read_receipt",
+                "channel_id": data.get("channel_id"),
                 "user_id": user_id,
                 "message_id": data.get("message_id")
             })
     
+    async def resume(self, user_id: str, positions: dict):
+        """Replay what a reconnecting client missed, given its last-seen sequence per channel.
+
+        Missed events are sent as ordinary frames, then one `resumed` frame
+        with each channel's current sequence; channels marked `reset` must be
+        refetched over REST. The replay holds the channels' locks, so live
+        events reach the client only after it, and in seq order; clients drop
+        any event whose seq is not above the last one applied (a duplicate).
+        """
+        if not isinstance(positions, dict):
+            await self.send_personal_message(user_id, {"type": "error", "message": "Invalid resume request"})
+            return
+        positions = {
+            channel_id: seq for channel_id, seq in list(positions.items())[:settings.RESUME_MAX_CHANNELS]
+            if isinstance(seq, int) and not isinstance(seq, bool) and seq >= 0
+        }
+        allowed = await asyncio.gather(*(self.membership.is_member(channel_id, user_id) for channel_id in positions))
+        positions = {channel_id: seq for (channel_id, seq), is_member in zip(positions.items(), allowed) if is_member}
+        channels = {}
+        async with AsyncExitStack() as stack:
+            # Hold the channels (in a fixed order) so no live event overtakes the replay
+            for channel_id in sorted(positions):
+                await stack.enter_async_context(self.channel_locks.hold(channel_id))
+            missed = await self.channel_events.missed(positions)
+            for channel_id, (current, events) in missed.items():
+                for event in events or ():
+                    await self.send_personal_message(user_id, event)
+                channels[channel_id] = {
+                    "seq": current,
+                    "replayed": len(events) if events is not None else 0,
+                    "reset": events is None
+                }
+        await self.send_personal_message(user_id, {"type": "resumed", "channels": channels})
+    
+    async def _send(self, websocket: WebSocket, message: dict, codec: Codec = JSON):
+        # A socket that died mid-broadcast must not stop delivery to the rest
+        self.pending_sends += 1
+        try:
+            await codec.send(websocket, message)
+        except Exception:
+            DROPPED["send_failed"].inc()
+        finally:
+            self.pending_sends -= 1
+    
+    async def _deliver(self, user_id: str, websocket: WebSocket, message: dict):
+        batcher = self.batchers.get(user_id)
+        if batcher:
+            await batcher.add(message)
+        else:
+            await self._send(websocket, message, self.codecs.get(user_id, JSON))
+    
     async def send_personal_message(self, user_id: str, message: dict):
         if user_id in self.active_connections:
-            await self.active_connections[user_id].send_json(message)
+            await self._deliver(user_id, self.active_connections[user_id], message)
+    
+    async def publish_channel_event(self, channel_id: str, event: dict):
+        """Broadcast a channel event, sequencing it first so resuming clients can replay it"""
+        if event["type"] not in SEQUENCED_EVENTS:
+            await self.broadcast_to_channel(channel_id, event)
+            return
+        async with self.channel_locks.hold(channel_id):
+            event = await self.channel_events.append(channel_id, event)
+            await self.broadcast_to_channel(channel_id, event)
     
     async def broadcast_to_channel(self, channel_id: str, message: dict, exclude_user: str = None):
         channel_members = await self.redis_service.get_channel_members(channel_id)
+        local_recipients = 0
         for user_id in channel_members:
             if user_id != exclude_user and user_id in self.active_connections:
-                await self.active_connections[user_id].send_json(message)
+                local_recipients += 1
+                await self._deliver(user_id, self.active_connections[user_id], message)
+        if local_recipients:
+            self.local_subscribers[channel_id] = local_recipients
+        else:
+            self.local_subscribers.pop(channel_id, None)
     
     async def broadcast_presence(self, user_id: str, status: str):
         message = {
@@ -83,5 +263,7 @@ class ConnectionManager:
             "status": status,
             "timestamp": datetime.utcnow().isoformat()
         }
-        for connection in self.active_connections.values():
-            await connection.send_json(message)
+        for recipient, connection in list(self.active_connections.items()):
+            await self._deliver(recipient, connection, message)
+
+manager = ConnectionManager()
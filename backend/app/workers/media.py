@@ -0,0 +1,116 @@
+"""Media preview worker: consumes jobs from the media queue and stores thumbnails.
+
+Run with:  python -m app.workers.media
+"""
+import asyncio
+import json
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
+import aio_pika
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.message import Message
+from app.services import media
+from app.services.s3_service import S3Service
+
+class MediaWorker:
+    def __init__(self, s3_service: S3Service = None, processes: int = None):
+        self.s3_service = s3_service or S3Service()
+        # Image decoding is CPU-bound; a process pool keeps it off this loop and the API workers
+        self.pool = ProcessPoolExecutor(max_workers=processes or settings.MEDIA_WORKER_PROCESSES)
+
+    async def generate(self, url: str, content_type: str) -> Dict:
+        """Thumbnails (and a poster frame for video) stored next to the original.
+
+        Derived keys are deterministic, so content shared through deduplication
+        is only rendered once.
+        """
+        file_key = self.s3_service.storage_key(url)
+        sizes = settings.MEDIA_THUMBNAIL_SIZES
+        thumbnail_keys = {size: media.thumbnail_key(file_key, size) for size in sizes}
+        metadata = {}
+        loop = asyncio.get_running_loop()
+
+        if content_type in media.VIDEO_TYPES:
+            poster_key = media.preview_key(file_key)
+            if not await self.s3_service.exists(poster_key):
+                source = (
+                    str(self.s3_service.local_upload_dir / file_key) if self.s3_service.use_local
+                    else await self.s3_service.generate_presigned_url(file_key)
+                )
+                frame = await media.extract_first_frame(source)
+                if frame is None:
+                    return metadata
+                poster = await loop.run_in_executor(self.pool, media.render_jpeg, frame)
+                await self.s3_service.put_bytes(poster_key, poster, "image/jpeg")
+                image_data = frame
+            else:
+                image_data = await self.s3_service.read_bytes(poster_key)
+            metadata["preview"] = self.s3_service.url_for_key(poster_key)
+        else:
+            image_data = None
+
+        existing = await asyncio.gather(*(self.s3_service.exists(key) for key in thumbnail_keys.values()))
+        if not all(existing):
+            if image_data is None:
+                image_data = await self.s3_service.read_bytes(file_key)
+            rendered = await loop.run_in_executor(self.pool, media.render_thumbnails, image_data, sizes)
+            await asyncio.gather(*(
+                self.s3_service.put_bytes(thumbnail_keys[size], data, "image/webp")
+                for size, data in rendered.items()
+            ))
+
+        metadata["thumbnails"] = {
+            str(size): self.s3_service.url_for_key(key) for size, key in thumbnail_keys.items()
+        }
+        return metadata
+
+    async def record(self, message_id: str, url: str, metadata: Dict):
+        """Merge preview URLs into the matching entry of Message.attachments"""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(Message).where(Message.id == message_id).with_for_update()
+            )
+            message = result.scalar_one_or_none()
+            if not message:
+                return
+            message.attachments = [
+                {**attachment, **metadata} if attachment.get("url") == url else attachment
+                for attachment in message.attachments or []
+            ]
+            await session.commit()
+
+    async def handle(self, job: Dict):
+        metadata = await self.generate(job["url"], job.get("content_type"))
+        if metadata:
+            await self.record(job["message_id"], job["url"], metadata)
+
+    async def run(self):
+        connection = await aio_pika.connect_robust(settings.RABBITMQ_URL)
+        async with connection:
+            channel = await connection.channel()
+            await channel.set_qos(prefetch_count=settings.MEDIA_WORKER_PREFETCH)
+            queue = await channel.declare_queue(settings.MEDIA_QUEUE, durable=True)
+
+            async def on_message(message: aio_pika.abc.AbstractIncomingMessage):
+                # Undecodable media would fail forever, so failed jobs are dropped, not requeued
+                async with message.process(requeue=False):
+                    try:
+                        await self.handle(json.loads(message.body))
+                    except Exception as e:
+                        print(f"Media job error: {e}")
+
+            await queue.consume(on_message)
+            print(f"Media worker consuming '{settings.MEDIA_QUEUE}'")
+            await asyncio.Future()
+
+    def close(self):
+        self.pool.shutdown()
+
+if __name__ == "__main__":
+    worker = MediaWorker()
+    try:
+        asyncio.run(worker.run())
+    finally:
+        worker.close()
@@ -0,0 +1,125 @@
+"""Notification worker: resolves mention/reply recipients and delivers or digests them.
+
+Run with:  python -m app.workers.notifications
+"""
+import asyncio
+import json
+import uuid
+from typing import Dict, List, Optional
+import aio_pika
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.metrics import DROPPED
+from app.models.message import Message
+from app.services.notifications import CHANNEL_MENTIONS
+from app.services.redis_service import RedisService
+
+def build_notification(job: Dict, kind: str) -> Dict:
+    return {
+        "type": "notification",
+        "kind": kind,
+        "channel_id": job["channel_id"],
+        "message_id": job.get("message_id"),
+        "sender_id": job["sender_id"],
+        "preview": job.get("preview", ""),
+        "created_at": job.get("created_at")
+    }
+
+class NotificationWorker:
+    def __init__(self, redis_service: RedisService = None):
+        self.redis_service = redis_service or RedisService()
+
+    async def deliver(self, user_ids: List[str], notification: Dict, online_only: bool = False):
+        """Push to users with a live socket; fold into a digest for everyone else"""
+        if not user_ids:
+            return
+        presence = await self.redis_service.get_presence(user_ids)
+        online = [user_id for user_id in user_ids if presence[user_id]["status"] != "offline"]
+        offline = [user_id for user_id in user_ids if presence[user_id]["status"] == "offline"]
+        if online:
+            await self.redis_service.publish_live_notification(online, notification)
+        if offline and not online_only:
+            await self.redis_service.add_to_digests(offline, notification)
+
+    async def parent_author(self, parent_id: str) -> Optional[str]:
+        try:
+            uuid.UUID(parent_id)
+        except ValueError:
+            return None
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(Message.user_id).where(Message.id == parent_id))
+            author = result.scalar_one_or_none()
+        return str(author) if author else None
+
+    async def handle(self, job: Dict):
+        if job.get("type") != "message":
+            # Published for a single user through RabbitMQService.publish_notification
+            await self.deliver([job["user_id"]], job)
+            return
+
+        channel_id = job["channel_id"]
+        mentions = set(job.get("mentions") or [])
+        notified = {job["sender_id"]}
+
+        direct = [user_id for user_id in mentions - CHANNEL_MENTIONS if user_id not in notified]
+        direct = await self.redis_service.filter_channel_members(channel_id, direct)
+        await self.deliver(direct, build_notification(job, "mention"))
+        notified.update(direct)
+
+        if job.get("parent_id"):
+            author = await self.parent_author(job["parent_id"])
+            if author and author not in notified:
+                await self.deliver([author], build_notification(job, "reply"))
+                notified.add(author)
+
+        if mentions & CHANNEL_MENTIONS:
+            online_only = not mentions & (CHANNEL_MENTIONS - {"here"})
+            notification = build_notification(job, "channel_mention")
+            # Chunked so one huge channel shares the worker with other jobs
+            async for chunk in self.redis_service.iter_channel_members(
+                channel_id, settings.NOTIFICATION_FANOUT_CHUNK_SIZE
+            ):
+                recipients = [user_id for user_id in dict.fromkeys(chunk) if user_id not in notified]
+                await self.deliver(recipients, notification, online_only)
+                notified.update(recipients)
+                await asyncio.sleep(0)
+
+    async def process(self, channel: aio_pika.abc.AbstractChannel, message: aio_pika.abc.AbstractIncomingMessage):
+        # A job that failed once would fail again, so it is not requeued; it is
+        # parked on the dead-letter queue for inspection or a manual replay
+        async with message.process(requeue=False):
+            try:
+                await self.handle(json.loads(message.body))
+            except Exception as e:
+                print(f"Notification job error: {e}")
+                DROPPED["notification_failed"].inc()
+                try:
+                    await channel.default_exchange.publish(
+                        aio_pika.Message(
+                            body=message.body,
+                            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                            headers={"x-error": repr(e)[:500]}
+                        ),
+                        routing_key=settings.NOTIFICATION_DEAD_LETTER_QUEUE
+                    )
+                except Exception as dead_letter_error:
+                    print(f"Notification dead-letter error: {dead_letter_error}")
+
+    async def run(self):
+        connection = await aio_pika.connect_robust(settings.RABBITMQ_URL)
+        async with connection:
+            channel = await connection.channel()
+            await channel.set_qos(prefetch_count=settings.NOTIFICATION_WORKER_PREFETCH)
+            queue = await channel.declare_queue("notifications", durable=True)
+            await channel.declare_queue(settings.NOTIFICATION_DEAD_LETTER_QUEUE, durable=True)
+
+            async def on_message(message: aio_pika.abc.AbstractIncomingMessage):
+                await self.process(channel, message)
+
+            await queue.consume(on_message)
+            print("Notification worker consuming 'notifications'")
+            await asyncio.Future()
+
+if __name__ == "__main__":
+    asyncio.run(NotificationWorker().run())
@@ -0,0 +1,90 @@
+"""Serialization cost of one 100-message history page, ORM/pydantic path vs projected rows + orjson.
+
+Run from backend/:  python -m benchmarks.bench_message_page
+"""
+import asyncio
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime
+from typing import List
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.api.v1.messages import MessageResponse, MESSAGE_RESPONSE_COLUMNS, message_row_to_dict
+from app.models.message import Message
+
+PAGE_SIZE = 100
+ITERATIONS = 2000
+RESPONSE_FIELD = create_response_field(name="page", type_=List[MessageResponse])
+
+def build_messages():
+    channel_id = uuid.uuid4()
+    now = datetime.utcnow()
+    return [
+        Message(
+            id=uuid.uuid4(),
+            channel_id=channel_id,
+            user_id=uuid.uuid4(),
+            content="Lorem ipsum dolor sit amet, consectetur adipiscing elit " * 2,
+            parent_id=None,
+            is_edited=False,
+            is_pinned=False,
+            mentions=[str(uuid.uuid4())],
+            attachments=[],
+            ai_moderation_flags=[],
+            read_by=[str(uuid.uuid4()) for _ in range(20)],
+            created_at=now,
+            updated_at=now
+        )
+        for _ in range(PAGE_SIZE)
+    ]
+
+async def before(messages, reactions):
+    page = [
+        MessageResponse(
+            id=str(msg.id),
+            channel_id=str(msg.channel_id),
+            user_id=str(msg.user_id),
+            content=msg.content,
+            parent_id=str(msg.parent_id) if msg.parent_id else None,
+            is_edited=msg.is_edited,
+            is_pinned=msg.is_pinned,
+            reactions=reactions,
+            mentions=msg.mentions,
+            attachments=msg.attachments,
+            created_at=msg.created_at,
+            updated_at=msg.updated_at
+        )
+        for msg in messages
+    ]
+    # What FastAPI does with a response_model: validate, serialize, then json.dumps
+    content = await serialize_response(field=RESPONSE_FIELD, response_content=page)
+    return JSONResponse(content).body
+
+async def after(rows, reactions):
+    return ORJSONResponse([message_row_to_dict(row, reactions) for row in rows]).body
+
+async def measure(fn, *args):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        await fn(*args)
+    return ITERATIONS / (time.perf_counter() - start)
+
+async def main():
+    messages = build_messages()
+    Row = namedtuple("Row", [column.key for column in MESSAGE_RESPONSE_COLUMNS])
+    rows = [Row(*(getattr(msg, column.key) for column in MESSAGE_RESPONSE_COLUMNS)) for msg in messages]
+    reactions = {"👍": 3, "🎉": 1}
+
+    before_rate = await measure(before, messages, reactions)
+    after_rate = await measure(after, rows, reactions)
+    print(f"{PAGE_SIZE}-message page, pages serialized per second")
+    print(f"  before (pydantic response_model):      {before_rate:10.0f}")
+    print(f"  after  (projected rows + orjson):     {after_rate:10.0f}")
+    print(f"  speedup: {after_rate / before_rate:.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,384 @@
+"""Throughput and tail latency of the hot REST endpoints, checked against stored baselines.
+
+Needs the Postgres and Redis from DATABASE_URL / REDIS_URL. Seed a dedicated
+database first (the seed refuses to touch a non-empty one without --reset):
+
+    python -m benchmarks.bench_rest seed --messages 5000000 --reset
+
+then measure. Without --base-url the app is started under uvicorn in a child
+process against the same settings:
+
+    python -m benchmarks.bench_rest run
+    python -m benchmarks.bench_rest run --update-baseline   # accept current numbers
+
+Each scenario records requests/sec and p50/p95/p99 latency. A scenario whose
+throughput drops, or whose p99 grows, by more than the baseline threshold
+(default 15%) fails the run with exit status 1, as does a run with no
+baseline to compare against. Baselines are per machine; keep
+benchmarks/baselines/rest.json from the host that runs the check.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+BENCHMARKS_DIR = Path(__file__).parent
+RESULTS_DIR = BENCHMARKS_DIR / "results"
+BASELINE_PATH = BENCHMARKS_DIR / "baselines" / "rest.json"
+DEFAULT_THRESHOLD = 0.15
+
+PASSWORD = "benchmark-password"
+MESSAGE_DEPTHS = (0, 1_000, 10_000, 100_000)
+COPY_CHUNK = 50_000
+
+def seeded_id(kind: int, index: int) -> uuid.UUID:
+    """Deterministic ids so `run` can find what `seed` created"""
+    return uuid.UUID(int=(kind << 64) | index)
+
+def bench_user_id(index: int) -> uuid.UUID:
+    return seeded_id(1, index)
+
+def bench_channel_id(index: int) -> uuid.UUID:
+    return seeded_id(2, index)
+
+def bench_email(index: int) -> str:
+    return f"bench{index}@example.com"
+
+def postgres_dsn() -> str:
+    from app.core.config import settings
+    return settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+
+# -- seeding --------------------------------------------------------------------
+
+async def create_schema():
+    """Bring the database to the migration head, the same schema production runs"""
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "alembic", "upgrade", "head", cwd=BENCHMARKS_DIR.parent
+    )
+    if await process.wait() != 0:
+        raise SystemExit("alembic upgrade head failed")
+
+async def seed(args):
+    import asyncpg
+    from app.core.security import get_password_hash
+
+    await create_schema()
+    conn = await asyncpg.connect(postgres_dsn())
+    try:
+        if await conn.fetchval("SELECT EXISTS (SELECT 1 FROM users)"):
+            if not args.reset:
+                sys.exit("users table is not empty; pass --reset to wipe it (use a dedicated database)")
+            await conn.execute(
+                "TRUNCATE users, channels, channel_members, messages, message_reactions, "
+                "message_reaction_counts, channel_read_cursors, bookmarks CASCADE"
+            )
+
+        rng = random.Random(args.seed)
+        now = datetime.utcnow()
+        hashed = get_password_hash(PASSWORD)
+
+        started = time.perf_counter()
+        await conn.copy_records_to_table(
+            "users",
+            columns=["id", "email", "username", "hashed_password", "full_name", "status",
+                     "last_seen", "is_active", "created_at"],
+            records=[
+                (bench_user_id(i), bench_email(i), f"bench{i}", hashed, f"Bench User {i}", "OFFLINE",
+                 now - timedelta(seconds=rng.randrange(7 * 24 * 3600)), True, now)
+                for i in range(args.users)
+            ]
+        )
+        await conn.copy_records_to_table(
+            "channels",
+            columns=["id", "name", "description", "type", "owner_id", "is_active", "created_at", "updated_at"],
+            records=[
+                (bench_channel_id(i), f"bench-{i}", "benchmark channel", "PRIVATE" if i % 4 else "PUBLIC",
+                 bench_user_id(0), True, now - timedelta(seconds=args.channels - i), now)
+                for i in range(args.channels)
+            ]
+        )
+
+        # User 0 is the benchmark client: member of the first --bench-user-channels channels
+        members = {}
+        for i in range(args.channels):
+            others = rng.sample(range(1, args.users), min(args.members_per_channel, args.users - 1))
+            members[i] = ([0] if i < args.bench_user_channels else []) + others
+        await conn.copy_records_to_table(
+            "channel_members",
+            columns=["id", "channel_id", "user_id", "role", "joined_at"],
+            records=[
+                (uuid.uuid4(), bench_channel_id(i), bench_user_id(u), "OWNER" if u == 0 else "MEMBER", now)
+                for i, user_indexes in members.items()
+                for u in user_indexes
+            ]
+        )
+
+        # A share of all messages lands in channel 0 so deep history pages exist
+        first_created = now - timedelta(milliseconds=args.messages)
+        for start in range(0, args.messages, COPY_CHUNK):
+            records = []
+            for n in range(start, min(start + COPY_CHUNK, args.messages)):
+                channel = 0 if args.channels == 1 or rng.random() < args.hot_share else rng.randrange(1, args.channels)
+                created = first_created + timedelta(milliseconds=n)
+                records.append((
+                    uuid.uuid4(), bench_channel_id(channel), bench_user_id(rng.choice(members[channel])),
+                    f"benchmark message {n} " + "lorem ipsum " * rng.randrange(1, 12),
+                    False, False, False, False, "{}", "[]", "[]", 0.0, "[]", "[]", created, created
+                ))
+            await conn.copy_records_to_table(
+                "messages",
+                columns=["id", "channel_id", "user_id", "content", "is_edited", "is_deleted", "is_pinned",
+                         "is_encrypted", "reactions", "mentions", "attachments", "ai_moderation_score",
+                         "ai_moderation_flags", "read_by", "created_at", "updated_at"],
+                records=records
+            )
+            print(f"  messages {min(start + COPY_CHUNK, args.messages):,}/{args.messages:,}", end="\r")
+        await conn.execute("ANALYZE")
+        print(f"\nseeded {args.users:,} users, {args.channels:,} channels, {args.messages:,} messages "
+              f"in {time.perf_counter() - started:.0f}s")
+    finally:
+        await conn.close()
+
+    # Membership sets for broadcast and channel listing live in Redis
+    from app.services.membership_sync import rebuild_channel_member_sets
+    await rebuild_channel_member_sets()
+
+# -- measuring ------------------------------------------------------------------
+
+def percentile(ordered: List[float], p: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(int(len(ordered) * p), len(ordered) - 1)]
+
+async def measure(make_request: Callable, requests: int, concurrency: int, warmup: int) -> Dict:
+    for _ in range(warmup):
+        await make_request()
+
+    latencies: List[float] = []
+    errors = 0
+    counter = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        while next(counter) < requests:
+            started = time.perf_counter()
+            response = await make_request()
+            elapsed = time.perf_counter() - started
+            if response.status_code >= 400:
+                errors += 1
+            else:
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    to_ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None
+    return {
+        "requests": requests,
+        "errors": errors,
+        "concurrency": concurrency,
+        "rps": round(len(latencies) / duration, 1),
+        "p50_ms": to_ms(percentile(ordered, 0.50)),
+        "p95_ms": to_ms(percentile(ordered, 0.95)),
+        "p99_ms": to_ms(percentile(ordered, 0.99))
+    }
+
+async def hot_channel_depth() -> int:
+    import asyncpg
+
+    conn = await asyncpg.connect(postgres_dsn())
+    try:
+        return await conn.fetchval(
+            "SELECT count(*) FROM messages WHERE channel_id = $1 AND NOT is_deleted", bench_channel_id(0)
+        )
+    finally:
+        await conn.close()
+
+async def run_scenarios(args) -> Dict[str, Dict]:
+    import httpx
+
+    depth = await hot_channel_depth()
+    if not depth:
+        sys.exit("no seeded data found; run `python -m benchmarks.bench_rest seed` first")
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        login = await client.post("/api/v1/auth/login", json={"email": bench_email(0), "password": PASSWORD})
+        login.raise_for_status()
+        client.headers["Authorization"] = f"Bearer {login.json()['access_token']}"
+        hot_channel = str(bench_channel_id(0))
+
+        scenarios = {
+            "post_message": lambda: client.post(
+                "/api/v1/messages/", json={"channel_id": hot_channel, "content": "benchmark " + uuid.uuid4().hex}
+            ),
+            **{
+                f"get_messages_offset_{offset}": (
+                    lambda offset=offset: client.get(f"/api/v1/messages/{hot_channel}", params={"limit": 50, "offset": offset})
+                )
+                for offset in MESSAGE_DEPTHS if offset < depth
+            },
+            "list_channels": lambda: client.get("/api/v1/channels/", params={"limit": 50}),
+            "analytics_dashboard": lambda: client.get("/api/v1/analytics/dashboard"),
+            # bcrypt dominates login, so it gets a fraction of the request budget
+            "auth_login": lambda: client.post(
+                "/api/v1/auth/login",
+                json={"email": bench_email(random.randrange(args.login_users)), "password": PASSWORD}
+            )
+        }
+
+        results = {}
+        for name, make_request in scenarios.items():
+            if args.only and name not in args.only:
+                continue
+            requests = max(args.requests // 10, 50) if name == "auth_login" else args.requests
+            results[name] = await measure(make_request, requests, args.concurrency, args.warmup)
+            result = results[name]
+            print(f"  {name:<28} {result['rps']:>9.1f} req/s   p50 {result['p50_ms']:>8} ms   "
+                  f"p99 {result['p99_ms']:>8} ms   errors {result['errors']}")
+        return results
+
+def compare_to_baseline(results: Dict[str, Dict], baseline: Dict) -> List[str]:
+    """Regressions beyond the baseline threshold, one readable line each"""
+    threshold = baseline.get("threshold", DEFAULT_THRESHOLD)
+    regressions = []
+    for name, expected in baseline.get("scenarios", {}).items():
+        actual = results.get(name)
+        if not actual:
+            continue
+        if actual["errors"]:
+            regressions.append(f"{name}: {actual['errors']} failed requests")
+        if actual["rps"] < expected["rps"] * (1 - threshold):
+            regressions.append(f"{name}: {actual['rps']} req/s vs baseline {expected['rps']} (-{threshold:.0%} allowed)")
+        if actual["p99_ms"] is not None and actual["p99_ms"] > expected["p99_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p99 {actual['p99_ms']} ms vs baseline {expected['p99_ms']} ms (+{threshold:.0%} allowed)")
+    return regressions
+
+async def wait_until_healthy(base_url: str, server: subprocess.Popen, timeout: float = 60):
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError("benchmark server exited during startup")
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError("benchmark server did not start")
+
+async def run(args) -> int:
+    if not args.update_baseline and not BASELINE_PATH.exists():
+        # A check with nothing to compare against must not pass silently
+        print(f"no baseline at {BASELINE_PATH}; rerun with --update-baseline to record one")
+        return 1
+
+    server = None
+    if not args.base_url:
+        args.base_url = f"http://127.0.0.1:{args.port}"
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(args.port),
+             "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+            cwd=BENCHMARKS_DIR.parent,
+            stdout=subprocess.DEVNULL
+        )
+    try:
+        if server:
+            await wait_until_healthy(args.base_url, server)
+        results = await run_scenarios(args)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    report = {
+        "benchmark": "rest_hot_paths",
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "git_revision": git_revision(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "config": {"requests": args.requests, "concurrency": args.concurrency, "workers": args.workers},
+        "scenarios": results
+    }
+    output = args.output or RESULTS_DIR / f"rest_{datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"saved {output}")
+
+    if args.update_baseline:
+        BASELINE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        BASELINE_PATH.write_text(json.dumps({
+            "threshold": args.threshold,
+            "recorded_at": report["timestamp"],
+            "git_revision": report["git_revision"],
+            "scenarios": {
+                name: {"rps": result["rps"], "p99_ms": result["p99_ms"]} for name, result in results.items()
+            }
+        }, indent=2))
+        print(f"baseline updated: {BASELINE_PATH}")
+        return 0
+
+    regressions = compare_to_baseline(results, json.loads(BASELINE_PATH.read_text()))
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="bulk-load a benchmark dataset with COPY")
+    seed_parser.add_argument("--users", type=int, default=10_000)
+    seed_parser.add_argument("--channels", type=int, default=1_000)
+    seed_parser.add_argument("--messages", type=int, default=1_000_000)
+    seed_parser.add_argument("--members-per-channel", type=int, default=50)
+    seed_parser.add_argument("--bench-user-channels", type=int, default=100)
+    seed_parser.add_argument("--hot-share", type=float, default=0.2, help="fraction of messages in channel 0")
+    seed_parser.add_argument("--seed", type=int, default=42)
+    seed_parser.add_argument("--reset", action="store_true", help="truncate existing data first")
+
+    run_parser = commands.add_parser("run", help="measure the endpoints and compare to the baseline")
+    run_parser.add_argument("--base-url", help="target a running server instead of starting one")
+    run_parser.add_argument("--port", type=int, default=8766)
+    run_parser.add_argument("--workers", type=int, default=1)
+    run_parser.add_argument("--requests", type=int, default=2_000, help="requests per scenario")
+    run_parser.add_argument("--concurrency", type=int, default=32)
+    run_parser.add_argument("--warmup", type=int, default=20)
+    run_parser.add_argument("--login-users", type=int, default=1_000, help="seeded accounts used by auth_login")
+    run_parser.add_argument("--only", nargs="+", help="scenario names to run")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    run_parser.add_argument("--update-baseline", action="store_true")
+    run_parser.add_argument("--output", type=Path, help="JSON results path")
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        asyncio.run(seed(args))
+    else:
+        sys.exit(asyncio.run(run(args)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Bytes on the wire and CPU per frame for each WebSocket encoding, with and without permessage-deflate.
+
+Replays a synthetic mix of the high-volume server events (presence, read
+receipts, typing and chat messages), one frame per event and as 16-event
+`batch` frames, through every codec in app.websocket.codec. Deflate is
+measured the way the websockets server applies it: one raw-deflate stream per
+connection with context takeover, sync-flushed per frame.
+
+Run from backend/:
+    python -m benchmarks.bench_ws_encoding
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import time
+import uuid
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+from app.websocket.codec import CODECS
+from benchmarks.bench_ws_fanout import git_revision
+
+RESULTS_DIR = Path(__file__).parent / "results"
+BATCH_SIZE = 16
+# Share of each event type in the mix; presence and receipts dominate busy servers
+EVENT_MIX = {"presence": 0.35, "read_receipt": 0.35, "typing": 0.15, "message": 0.15}
+
+def build_events(count: int, seed: int = 7) -> List[dict]:
+    rng = random.Random(seed)
+    users = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(200)]
+    channels = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(10)]
+    seqs = dict.fromkeys(channels, 0)
+    events = []
+    for kind in rng.choices(list(EVENT_MIX), weights=list(EVENT_MIX.values()), k=count):
+        channel_id, user_id = rng.choice(channels), rng.choice(users)
+        if kind == "presence":
+            event = {"type": "presence", "user_id": user_id, "status": rng.choice(("online", "offline")),
+                     "timestamp": datetime.utcnow().isoformat()}
+        elif kind == "typing":
+            event = {"type": "typing", "user_id": user_id}
+        else:
+            seqs[channel_id] += 1
+            event = {"type": kind, "channel_id": channel_id, "user_id": user_id}
+            if kind == "read_receipt":
+                event["message_id"] = str(uuid.UUID(int=rng.getrandbits(128)))
+            else:
+                event["content"] = " ".join(rng.choice(("ok", "ship it", "lgtm", "see thread", "deploying now")) for _ in range(3))
+                event["timestamp"] = datetime.utcnow().isoformat()
+            event["seq"] = seqs[channel_id]
+        events.append(event)
+    return events
+
+def frames_for(events: List[dict], batched: bool) -> List[dict]:
+    if not batched:
+        return events
+    return [{"type": "batch", "events": events[i:i + BATCH_SIZE]} for i in range(0, len(events), BATCH_SIZE)]
+
+def deflate_sizes(payloads: List[bytes], level: int) -> List[int]:
+    stream = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    # permessage-deflate drops the 0x00 0x00 0xff 0xff tail of each sync flush
+    return [len(stream.compress(payload) + stream.flush(zlib.Z_SYNC_FLUSH)) - 4 for payload in payloads]
+
+def per_frame_us(fn, items: list, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            fn(item)
+    return round((time.perf_counter() - start) * 1e6 / (repeat * len(items)), 3)
+
+def measure(events: List[dict], batched: bool, level: int, repeat: int) -> Dict:
+    frames = frames_for(events, batched)
+    results = {}
+    for name, codec in CODECS.items():
+        payloads = [codec.encode(frame) for frame in frames]
+        raw = sum(map(len, payloads))
+        deflated = sum(deflate_sizes(payloads, level))
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            deflate_sizes(payloads, level)
+        deflate_us = round((time.perf_counter() - start) * 1e6 / (repeat * len(payloads)), 3)
+
+        results[name] = {
+            "frames": len(frames),
+            "bytes_per_event": round(raw / len(events), 1),
+            "deflated_bytes_per_event": round(deflated / len(events), 1),
+            "encode_us_per_frame": per_frame_us(codec.encode, frames, repeat),
+            "decode_us_per_frame": per_frame_us(codec.decode, payloads, repeat),
+            "deflate_us_per_frame": deflate_us
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--level", type=int, default=6, help="zlib level; the websockets server default is 6")
+    parser.add_argument("--output", type=Path, help="JSON results path")
+    args = parser.parse_args()
+
+    events = build_events(args.events)
+    results = {
+        mode: measure(events, mode == "batched", args.level, args.repeat)
+        for mode in ("single", "batched")
+    }
+    report = {
+        "benchmark": "ws_encoding",
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "git_revision": git_revision(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "config": {"events": args.events, "batch_size": BATCH_SIZE, "deflate_level": args.level, "mix": EVENT_MIX},
+        "results": results
+    }
+
+    print(f"{'frames':8} {'codec':8} {'B/event':>8} {'deflated':>9} {'encode us':>10} {'decode us':>10} {'deflate us':>11}")
+    for mode, codecs in results.items():
+        for name, row in codecs.items():
+            print(f"{mode:8} {name:8} {row['bytes_per_event']:8} {row['deflated_bytes_per_event']:9} "
+                  f"{row['encode_us_per_frame']:10} {row['decode_us_per_frame']:10} {row['deflate_us_per_frame']:11}")
+
+    output = args.output or RESULTS_DIR / f"ws_encoding_{datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"saved {output}")
+
+if __name__ == "__main__":
+    main()
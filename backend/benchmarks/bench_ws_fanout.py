@@ -0,0 +1,337 @@
+"""WebSocket fan-out load test against the real /ws/{user_id} endpoint.
+
+Starts app.main under uvicorn in a child process with in-memory stand-ins for
+Redis, moderation and rate limiting (no Postgres, RabbitMQ or OpenAI needed),
+opens --connections sockets, then has a few members send --messages chat
+messages into one --channel-size member channel at --rate messages/sec.
+
+Reports delivered messages/sec, end-to-end p50/p99 delivery latency, server
+RSS per connection and server CPU per broadcast, and writes them as JSON to
+benchmarks/results/ (or --output) so releases can be compared.
+
+Run from backend/:
+    python -m benchmarks.bench_ws_fanout --connections 10000 --channel-size 5000
+
+Clients share one process, so on small machines client-side parsing competes
+with the server for CPU; compare runs from the same host. Presence broadcasts
+go to every socket on each connect (O(connections^2) at startup), so they are
+stubbed unless --presence is given. --batch connects with ?batch=1 so the
+server coalesces frames; compare frames_per_delivery and CPU with and without.
+--encoding msgpack negotiates binary frames (see bench_ws_encoding for sizes),
+and --no-deflate turns permessage-deflate off on the server.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+CHANNEL_ID = str(uuid.UUID(int=0xC0FFEE))
+RESULTS_DIR = Path(__file__).parent / "results"
+
+def user_id(index: int) -> str:
+    return str(uuid.UUID(int=index + 1))
+
+# -- server side --------------------------------------------------------------
+
+class LocalRedisService:
+    """In-memory stand-in for the RedisService calls made on the WebSocket path"""
+
+    def __init__(self, members: List[str], latency: float = 0.0):
+        self.members = members
+        self.member_set = set(members)
+        self.latency = latency
+        self.sequences: Dict[str, int] = {}
+
+    async def _round_trip(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def set_user_status(self, user_id: str, status: str, ttl: int = None):
+        await self._round_trip()
+
+    async def refresh_presence(self, user_ids: list, ttl: int = None):
+        await self._round_trip()
+
+    async def get_channel_members(self, channel_id: str) -> list:
+        await self._round_trip()
+        return list(self.members) if channel_id == CHANNEL_ID else []
+
+    async def get_membership(self, channel_id: str, user_id: str) -> str:
+        await self._round_trip()
+        return "member" if channel_id == CHANNEL_ID and user_id in self.member_set else ""
+
+    async def cache_membership(self, channel_id: str, user_id: str, role: str, ttl: int) -> str:
+        return role
+
+    async def pop_notification_digest(self, user_id: str) -> dict:
+        await self._round_trip()
+        return None
+
+    async def append_channel_event(self, channel_id: str, event: dict) -> int:
+        await self._round_trip()
+        self.sequences[channel_id] = self.sequences.get(channel_id, 0) + 1
+        return self.sequences[channel_id]
+
+class LocalModeration:
+    async def moderate_content(self, content: str) -> dict:
+        return {"is_toxic": False, "categories": {}, "scores": {}}
+
+class UnlimitedRateLimiter:
+    async def check_rate_limit(self, user_id: str) -> bool:
+        return True
+
+def serve(args):
+    import uvicorn
+    from app.main import app
+    from app.services.channel_events import ChannelEventLog
+    from app.services.membership import MembershipService
+    from app.services.presence import PresenceService
+    from app.websocket.manager import manager
+
+    redis_service = LocalRedisService(
+        [user_id(i) for i in range(args.channel_size)], args.redis_latency_ms / 1000
+    )
+    manager.redis_service = redis_service
+    manager.membership = MembershipService(redis_service)
+    manager.channel_events = ChannelEventLog(redis_service)
+    manager.presence = PresenceService(redis_service, lambda: manager.active_connections.keys())
+    manager.ai_moderation = LocalModeration()
+    manager.rate_limiter = UnlimitedRateLimiter()
+    if not args.presence:
+        async def skip_presence(user_id: str, status: str):
+            pass
+        manager.broadcast_presence = skip_presence
+
+    # Lifespan would connect to Postgres and RabbitMQ; the stand-ins replace both
+    uvicorn.run(
+        app, host="127.0.0.1", port=args.port, lifespan="off", log_level="warning", backlog=4096,
+        ws_per_message_deflate=not args.no_deflate
+    )
+
+# -- client side --------------------------------------------------------------
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+def process_rss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+def process_cpu_seconds(pid: int) -> float:
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    # utime and stime are fields 14 and 15 of /proc/<pid>/stat
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class Client:
+    def __init__(
+        self, index: int, latencies: List[int], delivered: asyncio.Event, expected: Dict,
+        batch: bool = False, encoding: str = "json"
+    ):
+        from app.websocket.codec import negotiate
+
+        self.user_id = user_id(index)
+        self.batch = batch
+        self.encoding = encoding
+        self.codec = negotiate(encoding)
+        self.frames = 0
+        self.latencies = latencies
+        self.delivered = delivered
+        self.expected = expected
+        self.websocket = None
+        self.reader: Optional[asyncio.Task] = None
+
+    async def connect(self, base_url: str):
+        import websockets
+
+        query = f"?encoding={self.encoding}" + ("&batch=1" if self.batch else "")
+        self.websocket = await websockets.connect(
+            f"{base_url}/ws/{self.user_id}{query}", max_size=None, open_timeout=120, ping_interval=None
+        )
+        self.reader = asyncio.create_task(self.read())
+
+    async def read(self):
+        async for raw in self.websocket:
+            self.frames += 1
+            frame = self.codec.decode(raw)
+            for event in frame["events"] if frame.get("type") == "batch" else (frame,):
+                if event.get("type") == "message":
+                    self.latencies.append(time.time_ns() - int(event["content"]))
+                    if len(self.latencies) >= self.expected["deliveries"]:
+                        self.delivered.set()
+
+    async def send_message(self):
+        frame = self.codec.encode({
+            "type": "message",
+            "channel_id": CHANNEL_ID,
+            "content": str(time.time_ns())
+        })
+        await self.websocket.send(frame if self.encoding == "msgpack" else frame.decode())
+
+    async def close(self):
+        await self.websocket.close()
+        self.reader.cancel()
+
+async def wait_until_listening(base_url: str, server: subprocess.Popen, timeout: float = 60):
+    import websockets
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("benchmark server exited during startup")
+        try:
+            async with websockets.connect(f"{base_url}/ws/{user_id(10 ** 9)}", ping_interval=None):
+                return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise TimeoutError("benchmark server did not start")
+
+async def run(args) -> Dict:
+    fd_limit = raise_fd_limit()
+    if args.connections * 2 + 64 > fd_limit:
+        print(f"warning: {args.connections} connections need ~{args.connections * 2} file descriptors, limit is {fd_limit}")
+
+    base_url = f"ws://127.0.0.1:{args.port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_ws_fanout", "serve", "--port", str(args.port),
+         "--channel-size", str(args.channel_size), "--redis-latency-ms", str(args.redis_latency_ms)]
+        + (["--presence"] if args.presence else [])
+        + (["--no-deflate"] if args.no_deflate else []),
+        cwd=Path(__file__).resolve().parent.parent
+    )
+    clients: List[Client] = []
+    try:
+        await wait_until_listening(base_url, server)
+        rss_before = process_rss_kb(server.pid)
+
+        latencies: List[int] = []
+        delivered = asyncio.Event()
+        expected = {"deliveries": args.messages * args.channel_size}
+        clients = [Client(i, latencies, delivered, expected, args.batch, args.encoding) for i in range(args.connections)]
+
+        connect_started = time.perf_counter()
+        for start in range(0, len(clients), args.connect_batch):
+            await asyncio.gather(*(client.connect(base_url) for client in clients[start:start + args.connect_batch]))
+        connect_seconds = time.perf_counter() - connect_started
+        await asyncio.sleep(1)
+        rss_connected = process_rss_kb(server.pid)
+
+        senders = clients[:min(args.senders, args.channel_size)]
+        frames_before = sum(client.frames for client in clients)
+        cpu_before = process_cpu_seconds(server.pid)
+        send_started = time.perf_counter()
+        for sequence in range(args.messages):
+            await senders[sequence % len(senders)].send_message()
+            next_send = send_started + (sequence + 1) / args.rate
+            await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+        try:
+            await asyncio.wait_for(delivered.wait(), timeout=args.timeout)
+        except asyncio.TimeoutError:
+            print(f"warning: timed out with {len(latencies)}/{expected['deliveries']} deliveries")
+        elapsed = time.perf_counter() - send_started
+        cpu_used = process_cpu_seconds(server.pid) - cpu_before
+        frames = sum(client.frames for client in clients) - frames_before
+
+        ordered = sorted(latencies)
+        to_ms = lambda ns: round(ns / 1e6, 3) if ns is not None else None
+        return {
+            "benchmark": "ws_fanout",
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "git_revision": git_revision(),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count()
+            },
+            "config": {
+                "connections": args.connections,
+                "channel_size": args.channel_size,
+                "senders": len(senders),
+                "messages": args.messages,
+                "rate": args.rate,
+                "presence": args.presence,
+                "batch": args.batch,
+                "encoding": args.encoding,
+                "deflate": not args.no_deflate,
+                "redis_latency_ms": args.redis_latency_ms
+            },
+            "results": {
+                "connect_seconds": round(connect_seconds, 3),
+                "deliveries": len(latencies),
+                "expected_deliveries": expected["deliveries"],
+                "messages_per_second": round(len(latencies) / elapsed, 1),
+                "frames_per_delivery": round(frames / len(latencies), 3) if latencies else None,
+                "latency_ms": {
+                    "p50": to_ms(percentile(ordered, 0.50)),
+                    "p99": to_ms(percentile(ordered, 0.99)),
+                    "max": to_ms(ordered[-1] if ordered else None)
+                },
+                "server_rss_kb_per_connection": round((rss_connected - rss_before) / args.connections, 2),
+                "server_cpu_ms_per_broadcast": round(cpu_used * 1000 / args.messages, 3)
+            }
+        }
+    finally:
+        await asyncio.gather(*(client.close() for client in clients if client.websocket), return_exceptions=True)
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", nargs="?", default="run", choices=["run", "serve"])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--channel-size", type=int, default=1000)
+    parser.add_argument("--senders", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=20.0, help="messages sent per second")
+    parser.add_argument("--connect-batch", type=int, default=200)
+    parser.add_argument("--redis-latency-ms", type=float, default=0.0, help="simulated Redis round trip")
+    parser.add_argument("--presence", action="store_true", help="keep presence broadcasts on connect")
+    parser.add_argument("--batch", action="store_true", help="negotiate server-side frame coalescing")
+    parser.add_argument("--encoding", default="json", choices=["json", "msgpack"])
+    parser.add_argument("--no-deflate", action="store_true", help="disable permessage-deflate on the server")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", type=Path, help="JSON results path")
+    args = parser.parse_args()
+
+    if args.mode == "serve":
+        serve(args)
+        return
+    if args.channel_size > args.connections:
+        parser.error("--channel-size cannot exceed --connections")
+
+    report = asyncio.run(run(args))
+    output = args.output or RESULTS_DIR / f"ws_fanout_{datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(json.dumps(report["results"], indent=2))
+    print(f"saved {output}")
+
+if __name__ == "__main__":
+    main()
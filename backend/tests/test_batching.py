@@ -0,0 +1,83 @@
+import asyncio
+from app.websocket.batching import FrameBatcher
+from app.websocket.manager import ConnectionManager
+
+class Frames:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, frame):
+        self.sent.append(frame)
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        self.sent.append(message)
+
+class FakeRedisService:
+    async def get_channel_members(self, channel_id):
+        return ["alice", "bob"]
+
+    async def pop_notification_digest(self, user_id):
+        return None
+
+class FakePresence:
+    async def mark_online(self, user_id):
+        pass
+
+    async def mark_offline(self, user_id):
+        pass
+
+async def test_events_within_the_window_share_one_frame():
+    frames = Frames()
+    batcher = FrameBatcher(frames.send, delay=0.01, max_events=100)
+    for i in range(3):
+        await batcher.add({"type": "typing", "user_id": str(i)})
+    assert frames.sent == []
+
+    await asyncio.sleep(0.03)
+    assert frames.sent == [{"type": "batch", "events": [{"type": "typing", "user_id": str(i)} for i in range(3)]}]
+
+async def test_size_limit_flushes_early_and_single_events_stay_plain():
+    frames = Frames()
+    batcher = FrameBatcher(frames.send, delay=10, max_events=2)
+    await batcher.add({"type": "message", "seq": 1})
+    await batcher.add({"type": "message", "seq": 2})
+    assert frames.sent == [{"type": "batch", "events": [{"type": "message", "seq": 1}, {"type": "message", "seq": 2}]}]
+
+    await batcher.add({"type": "message", "seq": 3})
+    await batcher.flush()
+    assert frames.sent[-1] == {"type": "message", "seq": 3}
+
+async def test_latency_sensitive_events_bypass_without_reordering():
+    frames = Frames()
+    batcher = FrameBatcher(frames.send, delay=10, max_events=100)
+    await batcher.add({"type": "presence", "user_id": "bob"})
+    await batcher.add({"type": "heartbeat_ack"})
+    assert frames.sent == [{"type": "presence", "user_id": "bob"}, {"type": "heartbeat_ack"}]
+    assert batcher._timer is None
+
+async def test_only_negotiated_connections_are_batched():
+    manager = ConnectionManager()
+    manager.redis_service = FakeRedisService()
+    manager.presence = FakePresence()
+    old_client, new_client = FakeSocket(), FakeSocket()
+    await manager.connect(old_client, "alice")
+    await manager.connect(new_client, "bob", batch=True)
+    await manager.batchers["bob"].flush()
+    new_client.sent.clear()
+
+    for i in range(3):
+        await manager.broadcast_to_channel("c1", {"type": "typing", "user_id": str(i)})
+    await manager.batchers["bob"].flush()
+
+    assert [frame["type"] for frame in old_client.sent[-3:]] == ["typing"] * 3
+    assert new_client.sent == [{"type": "batch", "events": [{"type": "typing", "user_id": str(i)} for i in range(3)]}]
+
+    await manager.disconnect("bob")
+    assert "bob" not in manager.batchers
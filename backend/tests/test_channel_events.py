@@ -0,0 +1,176 @@
+import asyncio
+import os
+import uuid
+import pytest
+import redis.asyncio as redis
+from app.core.config import settings
+from app.services import redis_service
+from app.services.channel_events import ChannelEventLog
+from app.services.redis_service import RedisService
+from app.websocket.manager import ConnectionManager
+
+class FakeRedisService:
+    """Counter plus a stream capped at `log_size`, like the Redis script"""
+
+    def __init__(self, log_size=10):
+        self.log_size = log_size
+        self.sequences = {}
+        self.logs = {}
+
+    async def append_channel_event(self, channel_id, event):
+        seq = self.sequences.get(channel_id, 0) + 1
+        self.sequences[channel_id] = seq
+        log = self.logs.setdefault(channel_id, [])
+        log.append({**event, "seq": seq})
+        del log[:-self.log_size]
+        return seq
+
+    async def get_channel_events_since(self, positions, count):
+        return {
+            channel_id: (
+                self.sequences.get(channel_id, 0),
+                [event for event in self.logs.get(channel_id, []) if event["seq"] > seq][:count]
+            )
+            for channel_id, seq in positions.items()
+        }
+
+    async def get_channel_members(self, channel_id):
+        return ["alice", "bob"]
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_json(self, message):
+        self.sent.append(message)
+
+class Members:
+    def __init__(self, channels):
+        self.channels = channels
+
+    async def is_member(self, channel_id, user_id):
+        return channel_id in self.channels
+
+async def append_messages(log, channel_id, count):
+    for i in range(count):
+        await log.append(channel_id, {"type": "message", "channel_id": channel_id, "content": str(i)})
+
+async def test_sequences_are_per_channel_and_increasing():
+    log = ChannelEventLog(FakeRedisService())
+    first = await log.append("c1", {"type": "message"})
+    second = await log.append("c1", {"type": "read_receipt"})
+    other = await log.append("c2", {"type": "message"})
+    assert (first["seq"], second["seq"], other["seq"]) == (1, 2, 1)
+
+async def test_only_missed_events_are_replayed():
+    log = ChannelEventLog(FakeRedisService())
+    await append_messages(log, "c1", 5)
+
+    current, events = (await log.missed({"c1": 3}))["c1"]
+    assert current == 5
+    assert [event["seq"] for event in events] == [4, 5]
+    assert (await log.missed({"c1": 5}))["c1"] == (5, [])
+
+async def test_unreplayable_gaps_reset_the_channel():
+    log = ChannelEventLog(FakeRedisService(log_size=10))
+    await append_messages(log, "c1", 30)
+
+    # Trimmed from the log
+    assert (await log.missed({"c1": 5}))["c1"] == (30, None)
+    # Further behind than the replay limit, though still logged
+    assert (await log.missed({"c1": 22}, limit=5))["c1"] == (30, None)
+    # Ahead of the server, e.g. after Redis lost the counter
+    assert (await log.missed({"c1": 40}))["c1"] == (30, None)
+    # A channel with no events yet
+    assert (await log.missed({"c2": 0}))["c2"] == (0, [])
+
+async def test_resume_replays_then_reports_each_channel():
+    manager = ConnectionManager()
+    manager.redis_service = FakeRedisService(log_size=3)
+    manager.channel_events = ChannelEventLog(manager.redis_service)
+    manager.membership = Members({"c1", "c2"})
+    await append_messages(manager.channel_events, "c1", 3)
+    await append_messages(manager.channel_events, "c2", 6)
+    await append_messages(manager.channel_events, "secret", 2)
+
+    socket = manager.active_connections["alice"] = FakeSocket()
+    await manager.handle_message("alice", {"type": "resume", "channels": {"c1": 1, "c2": 1, "secret": 0, "bad": "x"}})
+
+    *replayed, summary = socket.sent
+    assert [(event["channel_id"], event["seq"]) for event in replayed] == [("c1", 2), ("c1", 3)]
+    assert summary == {
+        "type": "resumed",
+        "channels": {
+            "c1": {"seq": 3, "replayed": 2, "reset": False},
+            "c2": {"seq": 6, "replayed": 0, "reset": True}
+        }
+    }
+
+async def test_every_channel_event_but_typing_is_sequenced():
+    manager = ConnectionManager()
+    manager.redis_service = FakeRedisService()
+    manager.channel_events = ChannelEventLog(manager.redis_service)
+    manager.membership = Members({"c1"})
+    socket = manager.active_connections["alice"] = FakeSocket()
+
+    await manager.publish_channel_event("c1", {"type": "reaction", "channel_id": "c1", "emoji": "+1"})
+    await manager.handle_message("bob", {"type": "typing", "channel_id": "c1"})
+    await manager.handle_message("bob", {"type": "read_receipt", "channel_id": "c1", "message_id": "m1"})
+
+    assert [(event["type"], event.get("seq")) for event in socket.sent] == [
+        ("reaction", 1), ("typing", None), ("read_receipt", 2)
+    ]
+
+class SlowFirstSocket(FakeSocket):
+    def __init__(self):
+        super().__init__()
+        self.stalled = False
+
+    async def send_json(self, message):
+        if not self.stalled:
+            self.stalled = True
+            await asyncio.sleep(0.05)
+        await super().send_json(message)
+
+async def test_concurrent_publishes_reach_every_recipient_in_seq_order():
+    manager = ConnectionManager()
+    manager.redis_service = FakeRedisService()
+    manager.channel_events = ChannelEventLog(manager.redis_service)
+    manager.active_connections["alice"] = SlowFirstSocket()
+    bob = manager.active_connections["bob"] = FakeSocket()
+
+    await asyncio.gather(*(
+        manager.publish_channel_event("c1", {"type": "message", "channel_id": "c1", "content": str(i)})
+        for i in range(3)
+    ))
+    assert [event["seq"] for event in bob.sent] == [1, 2, 3]
+    assert [event["seq"] for event in manager.active_connections["alice"].sent] == [1, 2, 3]
+    assert len(manager.channel_locks) == 0
+
+@pytest.fixture
+async def live_redis(monkeypatch):
+    client = redis.from_url(os.getenv("REDIS_TEST_URL", settings.REDIS_URL), decode_responses=True)
+    try:
+        await client.ping()
+    except (redis.ConnectionError, OSError):
+        await client.aclose()
+        pytest.skip("Redis is not reachable; set REDIS_TEST_URL to run")
+    monkeypatch.setattr(redis_service, "get_redis", lambda: client)
+    yield client
+    await client.aclose()
+
+async def test_event_log_round_trip_against_redis(live_redis, monkeypatch):
+    monkeypatch.setattr(settings, "CHANNEL_EVENT_LOG_SIZE", 1000)
+    channel_id = f"test-{uuid.uuid4()}"
+    log = ChannelEventLog(RedisService())
+    try:
+        await append_messages(log, channel_id, 12)
+        assert await live_redis.ttl(f"channel:{channel_id}:events") > 0
+
+        current, events = (await log.missed({channel_id: 9}))[channel_id]
+        assert current == 12
+        # Stream ids are "<seq>-0", so ids past 9 must parse back to 10, 11, 12
+        assert [(event["seq"], event["content"]) for event in events] == [(10, "9"), (11, "10"), (12, "11")]
+        assert (await log.missed({channel_id: 12}))[channel_id] == (12, [])
+    finally:
+        await live_redis.delete(f"channel:{channel_id}:seq", f"channel:{channel_id}:events")
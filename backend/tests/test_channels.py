@@ -0,0 +1,129 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+from app.api.v1 import channels
+from app.core.database import get_db
+from app.core.security import get_current_user
+from app.models.channel import MemberRole
+
+CHANNEL_ID = "6f1c2b1e-52a4-4a53-9f0e-2f3c6a0d9b11"
+CALLER_ID = "0b7a4d6e-1f1a-4f8e-8a43-5b1e2f7c9d20"
+TARGET_ID = "9a3e8c41-7d2b-4c6f-b1e0-4f5a6b7c8d90"
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+class FakeSession:
+    """Every write reports the target user as affected"""
+
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        return FakeResult([TARGET_ID])
+
+    async def commit(self):
+        pass
+
+class FakeRedisService:
+    def __init__(self):
+        self.removed = []
+        self.channels = []
+
+    async def remove_channel_members(self, channel_id, user_ids):
+        self.channels.append(channel_id)
+        self.removed.extend(user_ids)
+
+def make_client(monkeypatch, caller_role, target_role=MemberRole.MEMBER):
+    roles = {CALLER_ID: caller_role, TARGET_ID: target_role}
+
+    async def get_role(channel_id, user_id, db=None):
+        return roles.get(user_id)
+
+    monkeypatch.setattr(channels.manager.membership, "get_role", get_role)
+    monkeypatch.setattr(channels, "redis_service", FakeRedisService())
+    session = FakeSession()
+    app = FastAPI()
+    app.include_router(channels.router, prefix="/channels")
+    app.dependency_overrides[get_current_user] = lambda: {"id": CALLER_ID}
+    app.dependency_overrides[get_db] = lambda: session
+    return TestClient(app), session
+
+def test_non_member_cannot_add_members(monkeypatch):
+    client, session = make_client(monkeypatch, None)
+    response = client.post(f"/channels/{CHANNEL_ID}/members", json={"user_id": TARGET_ID})
+    assert response.status_code == 403
+    response = client.post(f"/channels/{CHANNEL_ID}/members/bulk", json={"user_ids": [TARGET_ID]})
+    assert response.status_code == 403
+    assert session.statements == []
+
+def test_plain_member_cannot_remove_others(monkeypatch):
+    client, session = make_client(monkeypatch, MemberRole.MEMBER)
+    response = client.delete(f"/channels/{CHANNEL_ID}/members/{TARGET_ID}")
+    assert response.status_code == 403
+    assert session.statements == []
+
+def test_owner_role_cannot_be_granted(monkeypatch):
+    client, session = make_client(monkeypatch, MemberRole.ADMIN)
+    response = client.post(f"/channels/{CHANNEL_ID}/members", json={"user_id": TARGET_ID, "role": "owner"})
+    assert response.status_code == 400
+    assert session.statements == []
+
+def test_admins_cannot_remove_the_owner_or_other_admins(monkeypatch):
+    for target_role in (MemberRole.OWNER, MemberRole.ADMIN):
+        client, session = make_client(monkeypatch, MemberRole.ADMIN, target_role)
+        response = client.delete(f"/channels/{CHANNEL_ID}/members/{TARGET_ID}")
+        assert response.status_code == 403
+        assert session.statements == []
+
+def test_owner_can_remove_an_admin(monkeypatch):
+    client, session = make_client(monkeypatch, MemberRole.OWNER, MemberRole.ADMIN)
+    response = client.delete(f"/channels/{CHANNEL_ID}/members/{TARGET_ID}")
+    assert response.status_code == 200
+    assert channels.redis_service.removed == [TARGET_ID]
+
+def test_owner_cannot_leave_without_transferring_ownership(monkeypatch):
+    client, session = make_client(monkeypatch, MemberRole.OWNER)
+    response = client.delete(f"/channels/{CHANNEL_ID}/members/{CALLER_ID}")
+    assert response.status_code == 400
+    assert session.statements == []
+
+def test_bulk_removal_by_an_admin_skips_owner_and_admins(monkeypatch):
+    client, session = make_client(monkeypatch, MemberRole.ADMIN)
+    response = client.post(f"/channels/{CHANNEL_ID}/members/bulk-remove", json={"user_ids": [TARGET_ID]})
+    assert response.status_code == 200
+    params = session.statements[0].compile(dialect=postgresql.dialect()).params
+    roles = next(value for key, value in params.items() if key.startswith("role"))
+    assert set(roles) == {MemberRole.MODERATOR, MemberRole.MEMBER}
+
+def test_bulk_membership_rejects_malformed_ids(monkeypatch):
+    client, session = make_client(monkeypatch, MemberRole.OWNER)
+    response = client.post(f"/channels/{CHANNEL_ID}/members/bulk", json={"user_ids": ["not-a-uuid"]})
+    assert response.status_code == 422
+
+def test_member_removal_uses_canonical_ids(monkeypatch):
+    client, session = make_client(monkeypatch, MemberRole.OWNER, MemberRole.ADMIN)
+    response = client.delete(f"/channels/{CHANNEL_ID.upper()}/members/{TARGET_ID.upper()}")
+    assert response.status_code == 200
+    assert channels.redis_service.channels == [CHANNEL_ID]
+    assert channels.redis_service.removed == [TARGET_ID]
+
+def test_owner_leaving_is_recognised_whatever_the_id_case(monkeypatch):
+    client, session = make_client(monkeypatch, MemberRole.OWNER)
+    response = client.delete(f"/channels/{CHANNEL_ID}/members/{CALLER_ID.upper()}")
+    assert response.status_code == 400
+    assert session.statements == []
+
+def test_malformed_path_ids_are_rejected(monkeypatch):
+    client, session = make_client(monkeypatch, MemberRole.OWNER)
+    assert client.delete(f"/channels/not-a-uuid/members/{TARGET_ID}").status_code == 422
+    assert client.post(f"/channels/{CHANNEL_ID}/members", json={"user_id": "not-a-uuid"}).status_code == 422
+    assert session.statements == []
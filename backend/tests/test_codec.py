@@ -0,0 +1,95 @@
+import msgpack
+from app.websocket.codec import JSON, MessagePackCodec, negotiate
+from app.websocket.manager import ConnectionManager
+
+class BinarySocket:
+    def __init__(self):
+        self.frames = []
+
+    async def send_bytes(self, data):
+        self.frames.append(data)
+
+class FakeRedisService:
+    async def get_channel_members(self, channel_id):
+        return ["alice", "bob"]
+
+def test_msgpack_uses_short_keys_and_round_trips():
+    codec = MessagePackCodec()
+    event = {"type": "read_receipt", "channel_id": "c1", "user_id": "u1", "message_id": "m1", "seq": 7}
+    data = codec.encode(event)
+
+    assert msgpack.unpackb(data) == {"t": "read_receipt", "c": "c1", "u": "u1", "m": "m1", "q": 7}
+    assert len(data) < len(JSON.encode(event))
+    assert codec.decode(data) == event
+
+def test_msgpack_batch_frames_shorten_each_event():
+    codec = MessagePackCodec()
+    frame = {"type": "batch", "events": [{"type": "typing", "user_id": "u1"}, {"type": "typing", "user_id": "u2"}]}
+    data = codec.encode(frame)
+    assert msgpack.unpackb(data) == {"t": "batch", "e": [{"t": "typing", "u": "u1"}, {"t": "typing", "u": "u2"}]}
+    assert codec.decode(data) == frame
+
+def test_inbound_frames_use_the_same_table():
+    codec = MessagePackCodec()
+    data = msgpack.packb({"t": "message", "c": "c1", "b": "hi", "mn": ["bob"]})
+    assert codec.decode(data) == {"type": "message", "channel_id": "c1", "content": "hi", "mentions": ["bob"]}
+
+def test_unknown_encodings_fall_back_to_json():
+    assert negotiate(None) is JSON
+    assert negotiate("cbor") is JSON
+    assert negotiate("msgpack").name == "msgpack"
+
+async def test_broadcast_encodes_per_connection():
+    manager = ConnectionManager()
+    manager.redis_service = FakeRedisService()
+    socket = manager.active_connections["bob"] = BinarySocket()
+    manager.codecs["bob"] = negotiate("msgpack")
+
+    await manager.broadcast_to_channel("c1", {"type": "typing", "user_id": "alice"})
+    assert [msgpack.unpackb(frame) for frame in socket.frames] == [{"t": "typing", "u": "alice"}]
+
+class RecordingManager:
+    """Stands in for the connection manager behind /ws"""
+
+    def __init__(self):
+        self.sockets = {}
+        self.handled = []
+        self.disconnected = []
+
+    async def connect(self, websocket, user_id, batch=False, codec=JSON):
+        await websocket.accept()
+        self.sockets[user_id] = (websocket, codec)
+
+    async def handle_message(self, user_id, data):
+        self.handled.append(data)
+
+    async def send_personal_message(self, user_id, message):
+        websocket, codec = self.sockets[user_id]
+        await codec.send(websocket, message)
+
+    async def disconnect(self, user_id):
+        self.disconnected.append(user_id)
+
+def test_malformed_frames_get_an_error_and_the_socket_stays_open(monkeypatch):
+    from fastapi.testclient import TestClient
+    from app import main
+
+    fake = RecordingManager()
+    monkeypatch.setattr(main, "manager", fake)
+    client = TestClient(main.app)
+
+    with client.websocket_connect("/ws/alice?encoding=msgpack") as ws:
+        for frame in (b"\xc1", msgpack.packb([1, 2])):
+            ws.send_bytes(frame)
+            assert msgpack.unpackb(ws.receive_bytes())["t"] == "error"
+        ws.send_text("not binary")
+        assert msgpack.unpackb(ws.receive_bytes())["t"] == "error"
+        ws.send_bytes(msgpack.packb({"t": "heartbeat"}))
+    with client.websocket_connect("/ws/bob") as ws:
+        ws.send_bytes(b"{}")
+        assert ws.receive_json()["type"] == "error"
+        ws.send_text("[1]")
+        assert ws.receive_json()["type"] == "error"
+
+    assert fake.handled == [{"type": "heartbeat"}]
+    assert fake.disconnected == ["alice", "bob"]
@@ -0,0 +1,340 @@
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+from app.api.v1 import files
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.security import get_current_user
+from app.services.file_store import FileStore
+from app.services.s3_service import S3Service, FileTooLargeError
+
+CHUNK = 1024 * 1024
+
+async def generate(total_size: int):
+    for _ in range(total_size // CHUNK):
+        yield b"x" * CHUNK
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar_one(self):
+        return self.value
+
+    def scalar_one_or_none(self):
+        return self.value
+
+class FakeIndexSession:
+    """Stands in for stored_files and file_references: first URL per content hash wins"""
+
+    def __init__(self):
+        self.urls = {}
+        self.references = set()
+        self.names = {}
+
+    async def execute(self, stmt):
+        params = stmt.compile(dialect=postgresql.dialect()).params
+        table = stmt.table.name
+        if stmt.is_insert and table == "stored_files":
+            return FakeResult(self.urls.setdefault(params["content_hash"], params["url"]))
+        if stmt.is_insert and table == "file_references":
+            reference = (params["content_hash"], params["user_id"])
+            if reference in self.references:
+                return FakeResult(None)
+            self.references.add(reference)
+            self.names[reference] = params["filename"]
+            return FakeResult(params["content_hash"])
+        if stmt.is_delete and table == "file_references":
+            hashes = [content_hash for content_hash, url in self.urls.items() if url == params["url_1"]]
+            reference = (hashes[0] if hashes else None, params["user_id_1"])
+            if reference not in self.references:
+                return FakeResult(None)
+            self.references.discard(reference)
+            return FakeResult(reference[0])
+        if stmt.is_delete and table == "stored_files":
+            content_hash = params["content_hash_1"]
+            if any(held == content_hash for held, _ in self.references):
+                return FakeResult(None)
+            del self.urls[content_hash]
+            return FakeResult(content_hash)
+        return FakeResult(None)
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+@pytest.fixture
+def local_storage(tmp_path, monkeypatch):
+    service = S3Service()
+    monkeypatch.setattr(service, "use_local", True)
+    monkeypatch.setattr(service, "local_upload_dir", tmp_path)
+    return service
+
+async def test_streaming_upload_keeps_peak_memory_bounded(local_storage, tmp_path):
+    total = 32 * CHUNK
+    tracemalloc.start()
+    try:
+        url, size = await local_storage.upload_stream(generate(total), "big.bin", "video/mp4", max_size=64 * CHUNK)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert size == total
+    assert (tmp_path / url.split("/")[-1]).stat().st_size == total
+    assert peak < 4 * CHUNK
+
+async def test_oversize_upload_is_rejected_and_partial_file_removed(local_storage, tmp_path):
+    with pytest.raises(FileTooLargeError):
+        await local_storage.upload_stream(generate(8 * CHUNK), "big.bin", "video/mp4", max_size=3 * CHUNK)
+    assert list(tmp_path.iterdir()) == []
+
+def test_upload_rejected_from_content_length_before_parsing(local_storage, monkeypatch):
+    monkeypatch.setattr(files, "s3_service", local_storage)
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", CHUNK)
+    app = FastAPI()
+    app.include_router(files.router, prefix="/api/v1/files")
+    app.dependency_overrides[get_current_user] = lambda: {"id": "user"}
+
+    response = TestClient(app).post(
+        "/api/v1/files/upload",
+        files={"file": ("big.png", b"x" * (2 * CHUNK), "image/png")}
+    )
+    assert response.status_code == 413
+
+def test_upload_within_limit_is_stored(local_storage, monkeypatch, tmp_path):
+    monkeypatch.setattr(files, "file_store", FileStore(local_storage))
+    app = FastAPI()
+    app.include_router(files.router, prefix="/api/v1/files")
+    app.dependency_overrides[get_current_user] = lambda: {"id": "user"}
+    app.dependency_overrides[get_db] = FakeIndexSession
+
+    response = TestClient(app).post(
+        "/api/v1/files/upload",
+        files={"file": ("photo.png", b"x" * 3000, "image/png")}
+    )
+    assert response.status_code == 200
+    assert response.json()["size"] == 3000
+    assert len(list(tmp_path.iterdir())) == 1
+
+def multipart_chunks(filename: str, content_type: str, total_size: int, boundary: str = "upload-boundary"):
+    yield (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode()
+    for _ in range(total_size // CHUNK):
+        yield b"x" * CHUNK
+    yield f"\r\n--{boundary}--\r\n".encode()
+
+def test_upload_is_streamed_to_storage_in_chunks(local_storage, monkeypatch, tmp_path):
+    monkeypatch.setattr(files, "file_store", FileStore(local_storage))
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 64 * 1024)
+    writes = []
+    upload_stream = local_storage.upload_stream
+
+    async def recording_upload_stream(chunks, *args):
+        async def recorded():
+            async for chunk in chunks:
+                writes.append(len(chunk))
+                yield chunk
+        return await upload_stream(recorded(), *args)
+
+    monkeypatch.setattr(local_storage, "upload_stream", recording_upload_stream)
+    app = FastAPI()
+    app.include_router(files.router, prefix="/api/v1/files")
+    app.dependency_overrides[get_current_user] = lambda: {"id": "user"}
+    app.dependency_overrides[get_db] = FakeIndexSession
+
+    response = TestClient(app).post(
+        "/api/v1/files/upload",
+        files={"file": ("clip.mp4", b"x" * (3 * CHUNK), "video/mp4")}
+    )
+    assert response.status_code == 200
+    assert response.json()["size"] == 3 * CHUNK
+    assert max(writes) == 64 * 1024 and sum(writes) == 3 * CHUNK
+    assert [path.stat().st_size for path in tmp_path.iterdir()] == [3 * CHUNK]
+
+def test_chunked_upload_over_the_limit_is_rejected(local_storage, monkeypatch, tmp_path):
+    monkeypatch.setattr(files, "file_store", FileStore(local_storage))
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", CHUNK)
+    app = FastAPI()
+    app.include_router(files.router, prefix="/api/v1/files")
+    app.dependency_overrides[get_current_user] = lambda: {"id": "user"}
+    app.dependency_overrides[get_db] = FakeIndexSession
+
+    # A generator body is sent with Transfer-Encoding: chunked, so there is no
+    # Content-Length to reject up front
+    response = TestClient(app).post(
+        "/api/v1/files/upload",
+        content=multipart_chunks("big.png", "image/png", 4 * CHUNK),
+        headers={"Content-Type": "multipart/form-data; boundary=upload-boundary"}
+    )
+    assert response.status_code == 413
+    assert list(tmp_path.iterdir()) == []
+
+async def test_duplicate_content_is_stored_once(local_storage, tmp_path):
+    store = FileStore(local_storage)
+    db = FakeIndexSession()
+    first = await store.store(db, generate(2 * CHUNK), "meme.png", "image/png", "alice")
+    second = await store.store(db, generate(2 * CHUNK), "copy.png", "image/png", "bob")
+
+    assert not first.deduplicated
+    assert second.deduplicated
+    assert second.url == first.url
+    assert second.content_hash == first.content_hash
+    assert len(list(tmp_path.iterdir())) == 1
+
+async def test_stored_url_names_only_the_content(local_storage, tmp_path):
+    store = FileStore(local_storage)
+    db = FakeIndexSession()
+    first = await store.store(db, generate(CHUNK), "alice-payroll.pdf", "application/pdf", "alice")
+    second = await store.store(db, generate(CHUNK), "bob-notes.pdf", "application/pdf", "bob")
+
+    assert first.url == second.url == f"/uploads/{first.content_hash}"
+    assert [path.name for path in tmp_path.iterdir()] == [first.content_hash]
+    assert db.names == {
+        (first.content_hash, "alice"): "alice-payroll.pdf",
+        (first.content_hash, "bob"): "bob-notes.pdf"
+    }
+
+async def test_release_only_drops_the_callers_reference(local_storage, tmp_path):
+    store = FileStore(local_storage)
+    db = FakeIndexSession()
+    stored = await store.store(db, generate(CHUNK), "meme.png", "image/png", "alice")
+    await store.store(db, generate(CHUNK), "copy.png", "image/png", "bob")
+
+    assert not await store.release(db, stored.url, "mallory")
+    assert await store.release(db, stored.url, "alice")
+    assert not await store.release(db, stored.url, "alice")
+    assert len(list(tmp_path.iterdir())) == 1
+
+    assert await store.release(db, stored.url, "bob")
+    assert list(tmp_path.iterdir()) == []
+
+class FakeS3Client:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.parts = {}
+        self.completed = None
+
+    def create_multipart_upload(self, **kwargs):
+        return {"UploadId": "upload-1"}
+
+    def upload_part(self, PartNumber, Body, **kwargs):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self.lock:
+            self.in_flight -= 1
+            self.parts[PartNumber] = len(Body)
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, MultipartUpload, **kwargs):
+        self.completed = MultipartUpload["Parts"]
+
+@pytest.fixture
+def fake_s3(monkeypatch):
+    service = S3Service()
+    client = FakeS3Client()
+    monkeypatch.setattr(service, "use_local", False)
+    monkeypatch.setattr(service, "s3_client", client)
+    monkeypatch.setattr(service, "bucket", "test-bucket")
+    monkeypatch.setattr(service, "executor", ThreadPoolExecutor(max_workers=8), raising=False)
+    monkeypatch.setattr(settings, "S3_MULTIPART_PART_SIZE", 2 * CHUNK)
+    monkeypatch.setattr(settings, "S3_MULTIPART_CONCURRENCY", 3)
+    return service, client
+
+async def test_multipart_parts_upload_in_parallel_and_in_order(fake_s3):
+    service, client = fake_s3
+    url, size = await service.upload_stream(generate(13 * CHUNK), "clip.mp4", "video/mp4", max_size=64 * CHUNK)
+
+    assert size == 13 * CHUNK
+    assert url.startswith("https://test-bucket.s3.")
+    assert [part["PartNumber"] for part in client.completed] == list(range(1, 8))
+    assert sum(client.parts.values()) == 13 * CHUNK
+    assert 1 < client.max_in_flight <= 3
+
+@pytest.mark.skipif(not os.getenv("S3_TEST_ENDPOINT_URL"), reason="set S3_TEST_ENDPOINT_URL to run against MinIO")
+async def test_round_trip_against_s3_compatible_endpoint(monkeypatch):
+    monkeypatch.setattr(settings, "AWS_S3_ENDPOINT_URL", os.environ["S3_TEST_ENDPOINT_URL"])
+    monkeypatch.setattr(settings, "AWS_ACCESS_KEY_ID", os.getenv("S3_TEST_ACCESS_KEY", "minioadmin"))
+    monkeypatch.setattr(settings, "AWS_SECRET_ACCESS_KEY", os.getenv("S3_TEST_SECRET_KEY", "minioadmin"))
+    monkeypatch.setattr(settings, "AWS_S3_BUCKET", f"test-{uuid.uuid4().hex[:12]}")
+    monkeypatch.setattr(settings, "S3_MULTIPART_PART_SIZE", 5 * CHUNK)
+    service = S3Service()
+    service.s3_client.create_bucket(Bucket=service.bucket)
+
+    url, size = await service.upload_stream(generate(12 * CHUNK), "clip.mp4", "video/mp4", max_size=64 * CHUNK)
+    key = service.key_from_url(url)
+    head = service.s3_client.head_object(Bucket=service.bucket, Key=key)
+    assert head["ContentLength"] == size == 12 * CHUNK
+
+    await service.delete_file(url)
+
+@pytest.fixture
+def uploads_client(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_UPLOAD_DIR", str(tmp_path))
+    (tmp_path / "abc_clip.mp4").write_bytes(bytes(range(256)) * 40)
+    app = FastAPI()
+    app.include_router(files.uploads_router)
+    return TestClient(app)
+
+def test_uploads_are_served_with_immutable_caching_and_etag(uploads_client):
+    response = uploads_client.get("/uploads/abc_clip.mp4")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert len(response.content) == 10240
+
+    cached = uploads_client.get("/uploads/abc_clip.mp4", headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+def test_uploads_support_byte_ranges(uploads_client):
+    response = uploads_client.get("/uploads/abc_clip.mp4", headers={"Range": "bytes=256-511"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 256-511/10240"
+    assert response.content == bytes(range(256))
+
+    suffix = uploads_client.get("/uploads/abc_clip.mp4", headers={"Range": "bytes=-10"})
+    assert suffix.content == (bytes(range(256)) * 40)[-10:]
+
+    unsatisfiable = uploads_client.get("/uploads/abc_clip.mp4", headers={"Range": "bytes=20000-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == "bytes */10240"
+
+def test_stale_if_range_returns_full_file(uploads_client):
+    response = uploads_client.get(
+        "/uploads/abc_clip.mp4", headers={"Range": "bytes=0-9", "If-Range": '"stale"'}
+    )
+    assert response.status_code == 200
+    assert len(response.content) == 10240
+
+def test_missing_upload_is_404(uploads_client):
+    assert uploads_client.get("/uploads/nope.png").status_code == 404
+
+class FakeTypeSession:
+    async def execute(self, stmt):
+        return FakeResult("application/pdf")
+
+def test_content_keyed_upload_is_served_with_the_requested_name(uploads_client, tmp_path):
+    content_hash = "ab" * 32
+    (tmp_path / content_hash).write_bytes(b"%PDF-1.4")
+    uploads_client.app.dependency_overrides[get_db] = FakeTypeSession
+
+    response = uploads_client.get(f"/uploads/{content_hash}", params={"filename": "résumé final.pdf"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.headers["content-disposition"] == "inline; filename*=UTF-8''r%C3%A9sum%C3%A9%20final.pdf"
+    assert response.headers["x-content-type-options"] == "nosniff"
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from app.api.v1 import admin
+from app.core.config import settings
+from app.core.loop_monitor import LoopMonitor
+from app.core.security import get_current_user
+
+def blocking_handler():
+    time.sleep(0.3)
+
+async def test_stall_is_reported_with_the_blocking_stack():
+    monitor = LoopMonitor(interval=0.02, threshold=0.1)
+    lag_samples = REGISTRY.get_sample_value("nexcord_event_loop_lag_seconds_count") or 0
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        blocking_handler()
+        await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+
+    assert len(monitor.stalls) == 1
+    stall = monitor.stalls[0]
+    assert stall["blocked_ms"] >= 100
+    assert "blocking_handler" in stall["stack"]
+    assert "test_stall_is_reported_with_the_blocking_stack" in stall["coroutine"]
+    assert REGISTRY.get_sample_value("nexcord_event_loop_lag_seconds_count") > lag_samples
+
+async def test_monitor_toggles_at_runtime():
+    monitor = LoopMonitor(interval=0.02, threshold=0.1)
+    await monitor.configure(enabled=True, threshold=0.5)
+    assert monitor.status()["enabled"]
+    assert monitor.status()["threshold_ms"] == 500
+
+    await monitor.configure(enabled=False)
+    assert not monitor.enabled
+    blocking_handler()
+    assert not monitor.stalls
+
+def test_loop_monitor_endpoint_is_admin_only(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_USER_IDS", ["admin-1"])
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api/v1/admin")
+    client = TestClient(app)
+
+    app.dependency_overrides[get_current_user] = lambda: {"id": "user-1"}
+    assert client.get("/api/v1/admin/loop-monitor").status_code == 403
+
+    app.dependency_overrides[get_current_user] = lambda: {"id": "admin-1"}
+    response = client.put("/api/v1/admin/loop-monitor", json={"threshold_ms": 250})
+    assert response.status_code == 200
+    assert response.json()["threshold_ms"] == 250
+
+async def test_restart_leaves_a_single_watchdog():
+    monitor = LoopMonitor(interval=0.02, threshold=0.1)
+    monitor.start()
+    first = monitor._watchdog
+    await monitor.stop()
+    monitor.start()
+    assert not first.is_alive()
+    assert [thread.name for thread in threading.enumerate()].count("loop-monitor") == 1
+    await monitor.stop()
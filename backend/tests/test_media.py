@@ -0,0 +1,37 @@
+import io
+from PIL import Image
+from app.services.media import render_thumbnails, derived_keys, thumbnail_key
+from app.services.s3_service import S3Service
+from app.workers.media import MediaWorker
+
+def make_png(width: int, height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def test_thumbnails_fit_each_bounding_size_without_upscaling():
+    thumbnails = render_thumbnails(make_png(800, 400), [160, 480, 1080])
+    sizes = {size: Image.open(io.BytesIO(data)).size for size, data in thumbnails.items()}
+    assert sizes == {160: (160, 80), 480: (480, 240), 1080: (800, 400)}
+
+def test_derived_keys_sit_next_to_the_original():
+    assert thumbnail_key("abc_photo.png", 160) == "abc_photo.png.thumb160.webp"
+    assert all(key.startswith("abc_photo.png.") for key in derived_keys("abc_photo.png"))
+
+async def test_worker_stores_thumbnails_once(tmp_path, monkeypatch):
+    storage = S3Service()
+    monkeypatch.setattr(storage, "use_local", True)
+    monkeypatch.setattr(storage, "local_upload_dir", tmp_path)
+    (tmp_path / "abc_photo.png").write_bytes(make_png(640, 640))
+    worker = MediaWorker(storage, processes=1)
+    try:
+        metadata = await worker.generate("/uploads/abc_photo.png", "image/png")
+        first_pass = {path.name: path.stat().st_mtime_ns for path in tmp_path.iterdir()}
+        await worker.generate("/uploads/abc_photo.png", "image/png")
+        second_pass = {path.name: path.stat().st_mtime_ns for path in tmp_path.iterdir()}
+    finally:
+        worker.close()
+
+    assert metadata["thumbnails"]["160"] == "/uploads/abc_photo.png.thumb160.webp"
+    assert "abc_photo.png.thumb480.webp" in first_pass
+    assert first_pass == second_pass
@@ -0,0 +1,75 @@
+from app.models.channel import MemberRole
+from app.services.membership import MembershipService, TTLCache
+
+CHANNEL_ID = "6f1c2b1e-52a4-4a53-9f0e-2f3c6a0d9b11"
+USER_ID = "0b7a4d6e-1f1a-4f8e-8a43-5b1e2f7c9d20"
+
+class FakeRedisService:
+    def __init__(self):
+        self.store = {}
+        self.gets = 0
+
+    async def get_membership(self, channel_id, user_id):
+        self.gets += 1
+        return self.store.get((channel_id, user_id))
+
+    async def cache_membership(self, channel_id, user_id, role, ttl):
+        return self.store.setdefault((channel_id, user_id), role)
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("app.services.membership.time.monotonic", lambda: now[0])
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    now[0] += 6
+    assert cache.get("a", None) is None
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b", None) is None
+    assert cache.get("a") == 1
+    assert len(cache) == 2
+
+async def test_membership_lookup_hits_database_once():
+    redis = FakeRedisService()
+    service = MembershipService(redis)
+    loads = []
+
+    async def load_role(channel_id, user_id, db=None):
+        loads.append((channel_id, user_id))
+        return MemberRole.MEMBER
+
+    service._load_role = load_role
+    for _ in range(3):
+        assert await service.is_member(CHANNEL_ID, USER_ID)
+    assert len(loads) == 1
+    assert redis.gets == 1
+    assert redis.store[(CHANNEL_ID, USER_ID)] == "member"
+
+async def test_membership_caches_non_members_and_rejects_bad_ids():
+    redis = FakeRedisService()
+    redis.store[(CHANNEL_ID, USER_ID)] = ""
+    service = MembershipService(redis)
+    assert not await service.is_member(CHANNEL_ID, USER_ID)
+    assert not await service.is_member("not-a-uuid", USER_ID)
+    service.evict(CHANNEL_ID, [USER_ID])
+    redis.store[(CHANNEL_ID, USER_ID)] = "admin"
+    assert await service.get_role(CHANNEL_ID, USER_ID) == MemberRole.ADMIN
+
+async def test_lookup_racing_a_membership_write_keeps_the_written_role():
+    redis = FakeRedisService()
+    service = MembershipService(redis)
+
+    async def load_role(channel_id, user_id, db=None):
+        # The member is added (and written through) while the old row is being read
+        redis.store[(channel_id, user_id)] = "member"
+        return None
+
+    service._load_role = load_role
+    assert await service.get_role(CHANNEL_ID, USER_ID) == MemberRole.MEMBER
+    assert redis.store[(CHANNEL_ID, USER_ID)] == "member"
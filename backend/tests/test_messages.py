@@ -0,0 +1,79 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+from app.api.v1 import messages
+from app.core.database import get_db
+from app.core.security import get_current_user
+
+CHANNEL_ID = "6f1c2b1e-52a4-4a53-9f0e-2f3c6a0d9b11"
+MESSAGE_ID = "3c2d1e0f-9a8b-4c7d-8e6f-5a4b3c2d1e0f"
+CALLER_ID = "0b7a4d6e-1f1a-4f8e-8a43-5b1e2f7c9d20"
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar_one_or_none(self):
+        return self.value
+
+    def all(self):
+        return []
+
+class FakeSession:
+    """Answers the message's channel lookup; anything past it would be a write"""
+
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        return FakeResult(CHANNEL_ID)
+
+def test_non_members_cannot_react(monkeypatch):
+    async def is_member(channel_id, user_id, db=None):
+        return False
+
+    monkeypatch.setattr(messages.manager.membership, "is_member", is_member)
+    session = FakeSession()
+    app = FastAPI()
+    app.include_router(messages.router, prefix="/messages")
+    app.dependency_overrides[get_current_user] = lambda: {"id": CALLER_ID}
+    app.dependency_overrides[get_db] = lambda: session
+    client = TestClient(app)
+
+    response = client.post(f"/messages/{MESSAGE_ID}/reactions", json={"emoji": "👍"})
+    assert response.status_code == 403
+    response = client.delete(f"/messages/{MESSAGE_ID}/reactions/👍")
+    assert response.status_code == 403
+    assert len(session.statements) == 2
+
+def test_malformed_ids_in_batch_requests_are_rejected():
+    session = FakeSession()
+    app = FastAPI()
+    app.include_router(messages.router, prefix="/messages")
+    app.dependency_overrides[get_current_user] = lambda: {"id": CALLER_ID}
+    app.dependency_overrides[get_db] = lambda: session
+    client = TestClient(app)
+
+    response = client.post("/messages/batch", json={"message_ids": [MESSAGE_ID, "not-a-uuid"]})
+    assert response.status_code == 422
+    response = client.post("/messages/channels/latest", json={"channel_ids": ["1; drop table"]})
+    assert response.status_code == 422
+    response = client.post("/messages/reactions/batch", json={"message_ids": ["not-a-uuid"]})
+    assert response.status_code == 422
+    assert session.statements == []
+
+def test_reaction_batch_only_counts_messages_in_the_callers_channels():
+    session = FakeSession()
+    app = FastAPI()
+    app.include_router(messages.router, prefix="/messages")
+    app.dependency_overrides[get_current_user] = lambda: {"id": CALLER_ID}
+    app.dependency_overrides[get_db] = lambda: session
+    client = TestClient(app)
+
+    response = client.post("/messages/reactions/batch", json={"message_ids": [MESSAGE_ID.upper()]})
+    assert response.status_code == 200
+    assert response.json() == {MESSAGE_ID: {}}
+    sql = str(session.statements[0].compile(dialect=postgresql.dialect()))
+    assert "JOIN messages" in sql and "JOIN channel_members" in sql
+    assert session.statements[0].compile(dialect=postgresql.dialect()).params["user_id_1"] == CALLER_ID
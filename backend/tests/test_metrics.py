@@ -0,0 +1,84 @@
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+from app.core.metrics import instrument_engine
+from app.websocket.manager import ConnectionManager
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+class FakeSocket:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.sent = []
+
+    async def send_json(self, message):
+        if self.fail:
+            raise RuntimeError("socket closed")
+        self.sent.append(message)
+
+class FakeRedisService:
+    async def get_channel_members(self, channel_id):
+        return ["alice", "bob", "carol"]
+
+class Allow:
+    async def is_member(self, channel_id, user_id):
+        return True
+
+    async def check_rate_limit(self, user_id):
+        return False
+
+class Clean:
+    async def moderate_content(self, content):
+        return {"is_toxic": False, "categories": {}, "scores": {}}
+
+def make_manager():
+    manager = ConnectionManager()
+    manager.redis_service = FakeRedisService()
+    manager.membership = Allow()
+    manager.rate_limiter = Allow()
+    manager.ai_moderation = Clean()
+    return manager
+
+async def test_handle_message_records_stage_timings_and_drops():
+    manager = make_manager()
+    manager.active_connections["alice"] = FakeSocket()
+    before_total = sample("nexcord_ws_stage_seconds_count", stage="total")
+    before_rate_limit = sample("nexcord_ws_stage_seconds_count", stage="rate_limit")
+    before_dropped = sample("nexcord_dropped_events_total", reason="rate_limited")
+
+    await manager.handle_message("alice", {"type": "message", "channel_id": "c1", "content": "hi"})
+
+    assert sample("nexcord_ws_stage_seconds_count", stage="total") == before_total + 1
+    assert sample("nexcord_ws_stage_seconds_count", stage="rate_limit") == before_rate_limit + 1
+    assert sample("nexcord_dropped_events_total", reason="rate_limited") == before_dropped + 1
+    assert manager.active_connections["alice"].sent[0]["type"] == "error"
+
+async def test_failed_send_does_not_stop_a_broadcast():
+    manager = make_manager()
+    manager.active_connections.update({"alice": FakeSocket(), "bob": FakeSocket(fail=True), "carol": FakeSocket()})
+    before = sample("nexcord_dropped_events_total", reason="send_failed")
+
+    await manager.broadcast_to_channel("c1", {"type": "typing"})
+
+    assert len(manager.active_connections["carol"].sent) == 1
+    assert sample("nexcord_dropped_events_total", reason="send_failed") == before + 1
+    assert manager.local_subscribers == {"c1": 3}
+    assert manager.pending_sends == 0
+
+def test_db_statements_are_timed_by_operation():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    before = sample("nexcord_db_query_seconds_count", operation="SELECT")
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert sample("nexcord_db_query_seconds_count", operation="SELECT") == before + 1
+
+def test_metrics_endpoint_exposes_prometheus_text():
+    from app.main import app
+
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "nexcord_ws_active_connections" in response.text
+    assert "nexcord_rabbitmq_publish_backlog" in response.text
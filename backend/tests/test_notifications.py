@@ -0,0 +1,140 @@
+import json
+from contextlib import asynccontextmanager
+from prometheus_client import REGISTRY
+from app.core.config import settings
+from app.services.notifications import NotificationRelay, message_notification_job
+from app.workers.notifications import NotificationWorker
+
+class FakeRedisService:
+    def __init__(self, members, online):
+        self.members = members
+        self.online = set(online)
+        self.live = []
+        self.digests = []
+        self.member_chunks = 0
+
+    async def get_presence(self, user_ids):
+        return {
+            user_id: {"status": "online" if user_id in self.online else "offline", "last_seen": None}
+            for user_id in user_ids
+        }
+
+    async def filter_channel_members(self, channel_id, user_ids):
+        return [user_id for user_id in user_ids if user_id in self.members]
+
+    async def iter_channel_members(self, channel_id, chunk_size):
+        for start in range(0, len(self.members), chunk_size):
+            self.member_chunks += 1
+            yield self.members[start:start + chunk_size]
+
+    async def publish_live_notification(self, user_ids, notification):
+        self.live.append((user_ids, notification))
+
+    async def add_to_digests(self, user_ids, notification):
+        self.digests.append((user_ids, notification))
+
+def job(**overrides):
+    return message_notification_job(
+        **{"channel_id": "c1", "sender_id": "alice", "content": "hey", "mentions": [], **overrides}
+    )
+
+def recipients(calls, kind=None):
+    return sorted(
+        user_id for user_ids, notification in calls
+        if kind is None or notification["kind"] == kind
+        for user_id in user_ids
+    )
+
+def test_plain_messages_need_no_notification_job():
+    assert job() is None
+    assert job(mentions=["bob"])["mentions"] == ["bob"]
+    assert job(parent_id="m1")["parent_id"] == "m1"
+
+async def test_mentions_go_live_to_online_members_and_to_digests_otherwise():
+    redis_service = FakeRedisService(members=["alice", "bob", "carol"], online=["bob"])
+    worker = NotificationWorker(redis_service)
+    await worker.handle(job(mentions=["alice", "bob", "carol", "mallory"]))
+
+    assert recipients(redis_service.live) == ["bob"]
+    assert recipients(redis_service.digests) == ["carol"]
+    assert redis_service.live[0][1]["kind"] == "mention"
+
+async def test_reply_notifies_the_parent_author_once(monkeypatch):
+    redis_service = FakeRedisService(members=["alice", "bob"], online=["bob"])
+    worker = NotificationWorker(redis_service)
+
+    async def parent_author(parent_id):
+        return "bob"
+
+    monkeypatch.setattr(worker, "parent_author", parent_author)
+    await worker.handle(job(parent_id="m1"))
+    await worker.handle(job(parent_id="m1", mentions=["bob"]))
+
+    assert recipients(redis_service.live, "reply") == ["bob"]
+    assert recipients(redis_service.live, "mention") == ["bob"]
+
+async def test_channel_mention_fans_out_in_chunks(monkeypatch):
+    monkeypatch.setattr(settings, "NOTIFICATION_FANOUT_CHUNK_SIZE", 500)
+    members = [f"user-{i}" for i in range(1200)] + ["alice"]
+    redis_service = FakeRedisService(members=members, online=members[:700])
+    worker = NotificationWorker(redis_service)
+    await worker.handle(job(mentions=["channel", "user-3"]))
+
+    assert redis_service.member_chunks == 3
+    assert recipients(redis_service.live, "mention") == ["user-3"]
+    assert len(recipients(redis_service.live, "channel_mention")) == 699
+    assert len(recipients(redis_service.digests, "channel_mention")) == 500
+    assert "alice" not in recipients(redis_service.live) + recipients(redis_service.digests)
+
+async def test_here_mention_skips_offline_members():
+    redis_service = FakeRedisService(members=["alice", "bob", "carol"], online=["bob"])
+    await NotificationWorker(redis_service).handle(job(mentions=["here"]))
+
+    assert recipients(redis_service.live) == ["bob"]
+    assert redis_service.digests == []
+
+async def test_relay_forwards_live_notifications_to_local_sockets():
+    sent = []
+
+    async def send(user_id, message):
+        sent.append((user_id, message["kind"]))
+
+    relay = NotificationRelay(None, send)
+    await relay.deliver(json.dumps({"user_ids": ["bob", "carol"], "notification": {"kind": "mention"}}))
+    assert sent == [("bob", "mention"), ("carol", "mention")]
+
+class FakeIncomingMessage:
+    def __init__(self, body):
+        self.body = body
+        self.requeued = None
+
+    @asynccontextmanager
+    async def process(self, requeue=False):
+        self.requeued = requeue
+        yield
+
+class FakeExchange:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, message, routing_key):
+        self.published.append((routing_key, message.body, message.headers))
+
+class FakeChannel:
+    def __init__(self):
+        self.default_exchange = FakeExchange()
+
+async def test_failed_jobs_are_dead_lettered_and_counted():
+    failures = REGISTRY.get_sample_value("nexcord_dropped_events_total", {"reason": "notification_failed"}) or 0
+    worker = NotificationWorker(FakeRedisService([], []))
+    channel = FakeChannel()
+    message = FakeIncomingMessage(b'{"type": "direct"}')
+
+    await worker.process(channel, message)
+
+    assert message.requeued is False
+    [(routing_key, body, headers)] = channel.default_exchange.published
+    assert routing_key == settings.NOTIFICATION_DEAD_LETTER_QUEUE
+    assert body == message.body
+    assert "user_id" in headers["x-error"]
+    assert REGISTRY.get_sample_value("nexcord_dropped_events_total", {"reason": "notification_failed"}) == failures + 1
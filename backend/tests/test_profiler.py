@@ -0,0 +1,81 @@
+import asyncio
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api.v1 import admin
+from app.core.config import settings
+from app.core.profiler import SamplingProfiler
+from app.core.security import get_current_user
+
+def spin(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+def hot_function():
+    spin(0.2)
+
+def cold_function():
+    spin(0.2)
+
+def stacks(collapsed: str):
+    return [line.rsplit(" ", 1)[0] for line in collapsed.splitlines()]
+
+async def test_time_boxed_profile_returns_collapsed_stacks():
+    profiler = SamplingProfiler()
+
+    async def busy():
+        await asyncio.sleep(0.02)
+        hot_function()
+
+    task = asyncio.create_task(busy())
+    collapsed = await profiler.profile(duration=0.4, rate_hz=200)
+    await task
+
+    lines = collapsed.splitlines()
+    assert lines
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any(
+        "hot_function (test_profiler.py:" in stack and stack.split(";")[-1].startswith("spin (")
+        for stack in stacks(collapsed)
+    )
+    assert not profiler.running
+
+async def test_request_sampling_keeps_only_traced_tasks():
+    profiler = SamplingProfiler()
+
+    async def traced():
+        with profiler.trace():
+            await asyncio.sleep(0.02)
+            hot_function()
+
+    async def untraced():
+        await asyncio.sleep(0.05)
+        cold_function()
+
+    tasks = [asyncio.create_task(traced()), asyncio.create_task(untraced())]
+    collapsed = await profiler.profile(duration=0.5, rate_hz=200, fraction=1.0)
+    await asyncio.gather(*tasks)
+
+    assert any("hot_function" in stack for stack in stacks(collapsed))
+    assert not any("cold_function" in stack for stack in stacks(collapsed))
+    assert profiler.fraction == 0.0
+
+def test_profiles_are_not_traced_while_disabled():
+    profiler = SamplingProfiler()
+    assert not any(profiler.should_trace() for _ in range(1000))
+
+def test_profile_endpoint_is_admin_only(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_USER_IDS", ["admin-1"])
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api/v1/admin")
+    client = TestClient(app)
+
+    app.dependency_overrides[get_current_user] = lambda: {"id": "user-1"}
+    assert client.post("/api/v1/admin/profile", json={"duration_s": 0.1}).status_code == 403
+
+    app.dependency_overrides[get_current_user] = lambda: {"id": "admin-1"}
+    response = client.post("/api/v1/admin/profile", json={"duration_s": 0.1, "rate_hz": 500})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert int(response.headers["x-profile-samples"]) >= 0
@@ -0,0 +1,184 @@
+import asyncio
+import orjson
+import pytest
+from app.core.config import settings
+from app.services import rabbitmq
+from app.services.rabbitmq import RabbitMQService
+
+class FakeExchange:
+    def __init__(self, broker):
+        self.broker = broker
+
+    async def publish(self, message, routing_key, timeout=None):
+        self.broker.in_flight += 1
+        self.broker.max_in_flight = max(self.broker.max_in_flight, self.broker.in_flight)
+        await asyncio.sleep(0.001)
+        self.broker.in_flight -= 1
+        if not self.broker.up:
+            raise ConnectionError("broker down")
+        self.broker.published.append((routing_key, orjson.loads(message.body)))
+
+class FakeChannel:
+    def __init__(self, broker):
+        self.default_exchange = FakeExchange(broker)
+
+    async def declare_queue(self, name, durable=False):
+        pass
+
+class FakeConnection:
+    is_closed = False
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    async def channel(self, publisher_confirms=False):
+        assert publisher_confirms
+        return FakeChannel(self.broker)
+
+    async def close(self):
+        pass
+
+class FakeBroker:
+    def __init__(self):
+        self.up = True
+        self.reachable = True
+        self.published = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def connect_robust(self, url):
+        if not self.reachable:
+            raise ConnectionError("connection refused")
+        return FakeConnection(self)
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = FakeBroker()
+    monkeypatch.setattr(rabbitmq.aio_pika, "connect_robust", broker.connect_robust)
+    monkeypatch.setattr(settings, "RABBITMQ_RETRY_DELAY", 0.01)
+    return broker
+
+async def wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.005)
+
+async def test_batches_publish_concurrently_over_the_channel_pool(broker):
+    service = RabbitMQService()
+    await service.connect()
+    for i in range(50):
+        await service.publish_analytics_event({"n": i})
+
+    await wait_for(lambda: len(broker.published) == 50)
+    assert sorted(body["n"] for _, body in broker.published) == list(range(50))
+    assert broker.max_in_flight > 1
+    metrics = service.metrics()
+    assert metrics["published"] == 50
+    assert metrics["backlog"] == 0
+    assert metrics["publish_latency_ms"]["p99"] is not None
+    await service.close()
+
+async def test_events_are_buffered_until_the_broker_is_reachable(broker):
+    broker.reachable = False
+    service = RabbitMQService()
+    await service.connect()
+    await service.publish_notification("user-1", {"type": "mention"})
+    await asyncio.sleep(0.05)
+    assert broker.published == []
+    assert service.metrics()["backlog"] == 1
+
+    broker.reachable = True
+    await wait_for(lambda: broker.published)
+    assert broker.published == [("notifications", {"user_id": "user-1", "type": "mention"})]
+    await service.close()
+
+async def test_broker_down_at_startup_is_reconnected_while_idle(broker):
+    broker.reachable = False
+    service = RabbitMQService()
+    await service.connect()
+    with pytest.raises(ConnectionError):
+        await service.ping()
+
+    broker.reachable = True
+    await wait_for(lambda: service.connected)
+    await service.ping()
+    await service.close()
+
+async def test_failed_publishes_are_retried_in_order(broker):
+    service = RabbitMQService()
+    await service.connect()
+    broker.up = False
+    for i in range(3):
+        await service.publish_media_job({"n": i})
+    await wait_for(lambda: service.counters["failed"] >= 3)
+
+    broker.up = True
+    await wait_for(lambda: len(broker.published) == 3)
+    assert [body["n"] for _, body in broker.published] == [0, 1, 2]
+    await service.close()
+
+async def test_overflow_spills_to_disk_and_is_replayed(broker, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "RABBITMQ_BUFFER_SIZE", 4)
+    monkeypatch.setattr(settings, "RABBITMQ_SPILL_PATH", str(tmp_path / "spill.jsonl"))
+    broker.reachable = False
+    service = RabbitMQService()
+    for i in range(10):
+        await service.publish_analytics_event({"n": i})
+    assert service.metrics()["backlog"] == 4
+    assert service.metrics()["spilled_backlog"] == 6
+
+    broker.reachable = True
+    await wait_for(lambda: len(broker.published) == 10)
+    assert sorted(body["n"] for _, body in broker.published) == list(range(10))
+    assert not (tmp_path / "spill.jsonl").exists()
+    await service.close()
+
+async def test_spill_file_left_by_a_previous_run_is_replayed(broker, monkeypatch, tmp_path):
+    spill_path = tmp_path / "spill.jsonl"
+    monkeypatch.setattr(settings, "RABBITMQ_SPILL_PATH", str(spill_path))
+    spill_path.write_bytes(b"".join(
+        orjson.dumps({"routing_key": "analytics", "body": orjson.dumps({"n": i}).decode()}) + b"\n"
+        for i in range(3)
+    ))
+
+    service = RabbitMQService()
+    await service.connect()
+    await wait_for(lambda: len(broker.published) == 3)
+    assert [body["n"] for _, body in broker.published] == [0, 1, 2]
+    assert service.metrics()["spilled_backlog"] == 0
+    assert not spill_path.exists()
+    await service.close()
+
+async def test_truncated_spill_line_is_quarantined_and_replay_continues(broker, monkeypatch, tmp_path):
+    spill_path = tmp_path / "spill.jsonl"
+    monkeypatch.setattr(settings, "RABBITMQ_SPILL_PATH", str(spill_path))
+    lines = [
+        orjson.dumps({"routing_key": "analytics", "body": orjson.dumps({"n": i}).decode()})
+        for i in range(3)
+    ]
+    # A crash mid-spill leaves the middle record cut short
+    spill_path.write_bytes(lines[0] + b"\n" + lines[1][:12] + b"\n" + lines[2] + b"\n")
+
+    service = RabbitMQService()
+    await service.connect()
+    await wait_for(lambda: len(broker.published) == 2)
+    assert [body["n"] for _, body in broker.published] == [0, 2]
+    assert service.metrics()["corrupt"] == 1
+    assert not spill_path.exists()
+    assert (tmp_path / "spill.jsonl.corrupt").read_bytes() == lines[1][:12] + b"\n"
+
+    await service.publish_analytics_event({"n": 3})
+    await wait_for(lambda: len(broker.published) == 3)
+    await service.close()
+
+async def test_overflow_without_spill_drops_oldest(broker, monkeypatch):
+    monkeypatch.setattr(settings, "RABBITMQ_BUFFER_SIZE", 2)
+    broker.reachable = False
+    service = RabbitMQService()
+    for i in range(5):
+        await service.publish_analytics_event({"n": i})
+
+    assert [orjson.loads(body)["n"] for _, body, _ in service.buffer] == [3, 4]
+    assert service.metrics()["dropped"] == 3
+    await service.close()
@@ -0,0 +1,59 @@
+from sqlalchemy.dialects import postgresql
+from app.core.config import settings
+from app.services import read_cursors
+from app.services.read_cursors import ReadCursorService
+
+USER_ID = "0b7a4d6e-1f1a-4f8e-8a43-5b1e2f7c9d20"
+CHANNEL_ID = "6f1c2b1e-52a4-4a53-9f0e-2f3c6a0d9b11"
+MESSAGE_ID = "3c2d1e0f-9a8b-4c7d-8e6f-5a4b3c2d1e0f"
+
+class FakeSession:
+    def __init__(self, store):
+        self.store = store
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    async def execute(self, stmt):
+        self.store.executed.append(stmt.compile(dialect=postgresql.dialect()).params)
+        if self.store.fail:
+            raise RuntimeError("ON CONFLICT DO UPDATE command cannot affect row a second time")
+
+    async def commit(self):
+        pass
+
+class FakeDatabase:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.executed = []
+
+    def __call__(self):
+        return FakeSession(self)
+
+def test_mixed_case_ids_share_one_pending_receipt():
+    service = ReadCursorService()
+    service.record(USER_ID, CHANNEL_ID, MESSAGE_ID)
+    service.record(USER_ID.upper(), CHANNEL_ID.upper(), MESSAGE_ID.upper())
+    assert service.pending == {(USER_ID, CHANNEL_ID): MESSAGE_ID}
+
+async def test_failing_receipts_are_dropped_after_max_attempts(monkeypatch):
+    database = FakeDatabase(fail=True)
+    monkeypatch.setattr(read_cursors, "AsyncSessionLocal", database)
+    monkeypatch.setattr(settings, "READ_CURSOR_MAX_ATTEMPTS", 3)
+    service = ReadCursorService()
+    service.record(USER_ID, CHANNEL_ID, MESSAGE_ID)
+
+    for _ in range(5):
+        await service.flush()
+    assert len(database.executed) == 3
+    assert service.pending == {}
+    assert service.attempts == {}
+
+    database.fail = False
+    service.record(USER_ID, CHANNEL_ID, MESSAGE_ID)
+    await service.flush()
+    assert len(database.executed) == 4
+    assert service.pending == {}
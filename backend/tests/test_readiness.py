@@ -0,0 +1,75 @@
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+from fastapi.testclient import TestClient
+from app.core.database import Base
+from app.core.readiness import Readiness
+import app.models  # noqa: F401
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+async def ok():
+    pass
+
+async def down():
+    raise ConnectionError("connection refused")
+
+async def hang():
+    await asyncio.sleep(10)
+
+async def test_not_ready_until_startup_finishes():
+    readiness = Readiness()
+    readiness.register("database", ok)
+    assert (await readiness.report())["status"] == "starting"
+
+    readiness.started = True
+    report = await readiness.report()
+    assert report["status"] == "ready"
+    assert report["dependencies"]["database"]["ready"]
+
+async def test_reports_each_failing_dependency():
+    readiness = Readiness()
+    readiness.register("database", ok)
+    readiness.register("redis", down)
+    readiness.register("rabbitmq", hang)
+    readiness.started = True
+
+    report = await readiness.report(timeout=0.05)
+    assert report["status"] == "not_ready"
+    assert report["dependencies"]["database"]["ready"]
+    assert report["dependencies"]["redis"]["error"] == "connection refused"
+    assert report["dependencies"]["rabbitmq"]["error"] == "timed out after 0.05s"
+
+async def test_warm_up_runs_in_parallel_and_records_failures():
+    readiness = Readiness()
+
+    async def slow():
+        await asyncio.sleep(0.2)
+
+    started = asyncio.get_running_loop().time()
+    await readiness.warm_up({"database": slow(), "redis": slow(), "rabbitmq": down()})
+    assert asyncio.get_running_loop().time() - started < 0.35
+    assert readiness.startup["database"]["ready"]
+    assert not readiness.startup["rabbitmq"]["ready"]
+
+def test_ready_endpoint_is_503_before_startup():
+    from app.main import app
+
+    response = TestClient(app).get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "starting"
+    assert TestClient(app).get("/health").status_code == 200
+
+def test_importing_the_app_does_not_load_external_sdks():
+    code = "import sys, app.main; print(' '.join(m for m in ('openai', 'boto3') if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
+
+def test_migrations_create_every_model_table():
+    result = subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head", "--sql"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    for table in Base.metadata.tables:
+        assert f"CREATE TABLE {table} " in result.stdout
@@ -0,0 +1,95 @@
+import asyncio
+from app.core.redis import AutoPipelineRedis
+from app.services import redis_service
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args))
+        return queue
+
+    async def execute(self, raise_on_error=True):
+        self.client.round_trips += 1
+        return [self.client.run(name, args) for name, args in self.commands]
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.round_trips = 0
+
+    def run(self, name, args):
+        if name == "set":
+            self.data[args[0]] = args[1]
+            return True
+        if name == "get":
+            return self.data.get(args[0])
+        return ValueError(f"unsupported command {name}")
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def get(self, key):
+        self.round_trips += 1
+        return self.data.get(key)
+
+async def test_concurrent_commands_share_one_round_trip():
+    fake = FakeRedis()
+    client = AutoPipelineRedis(fake)
+    await asyncio.gather(*(client.set(f"key:{i}", i) for i in range(50)))
+    values = await asyncio.gather(*(client.get(f"key:{i}") for i in range(50)))
+    assert values == list(range(50))
+    assert fake.round_trips == 2
+
+async def test_single_command_skips_pipeline():
+    fake = FakeRedis()
+    fake.data["a"] = "1"
+    client = AutoPipelineRedis(fake)
+    assert await client.get("a") == "1"
+    assert fake.round_trips == 1
+
+async def test_command_errors_are_raised_to_their_caller():
+    fake = FakeRedis()
+    client = AutoPipelineRedis(fake)
+    ok, failed = await asyncio.gather(client.set("a", 1), client.hget("h", "f"), return_exceptions=True)
+    assert ok is True
+    assert isinstance(failed, ValueError)
+
+def test_unbatched_attributes_pass_through():
+    fake = FakeRedis()
+    client = AutoPipelineRedis(fake)
+    assert isinstance(client.pipeline(), FakePipeline)
+
+class FakeHashRedis(FakeRedis):
+    def run(self, name, args):
+        if name == "hset":
+            self.data.setdefault(args[0], {})[args[1]] = args[2]
+            return 1
+        if name == "hget":
+            return self.data.get(args[0], {}).get(args[1])
+        if name == "expire":
+            return True
+        return super().run(name, args)
+
+    async def incr(self, key):
+        self.round_trips += 1
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+async def test_public_channel_creation_expires_every_cached_channel_list(monkeypatch):
+    fake = FakeHashRedis()
+    monkeypatch.setattr(redis_service, "get_redis", lambda: fake)
+    service = redis_service.RedisService()
+
+    cached, version = await service.get_cached_channel_list("alice", "1:50:")
+    assert cached is None
+    await service.cache_channel_list("alice", "1:50:", '{"channels": []}', 30, version)
+    assert await service.get_cached_channel_list("alice", "1:50:") == ('{"channels": []}', version)
+
+    await service.invalidate_channel_directory()
+    cached, version = await service.get_cached_channel_list("alice", "1:50:")
+    assert cached is None
+    assert version == "1"
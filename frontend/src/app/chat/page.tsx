@@ -12,6 +12,9 @@ import MessageInput from '@/components/MessageInput'
 export default function ChatPage() {
   const router = useRouter()
   const [channels, setChannels] = useState<any[]>([])
+  const [publicChannels, setPublicChannels] = useState<any[]>([])
+  const [publicCursor, setPublicCursor] = useState<string | null>(null)
+  const [browsed, setBrowsed] = useState(false)
   const [selectedChannel, setSelectedChannel] = useState<any>(null)
   const [messages, setMessages] = useState<any[]>([])
   const [loading, setLoading] = useState(true)
@@ -59,10 +62,18 @@ export default function ChatPage() {
 
   const loadChannels = async () => {
     try {
-      const response = await channelsAPI.list()
-      setChannels(response.data)
-      if (response.data.length > 0) {
-        setSelectedChannel(response.data[0])
+      // The sidebar only lists joined channels; public ones are browsed on demand.
+      // The listing is paginated; follow next_cursor until every page is loaded
+      const loaded: any[] = []
+      let cursor: string | null = null
+      do {
+        const response: any = await channelsAPI.list({ limit: 100, include_public: false, ...(cursor ? { cursor } : {}) })
+        loaded.push(...response.data.channels)
+        cursor = response.data.next_cursor
+      } while (cursor)
+      setChannels(loaded)
+      if (loaded.length > 0) {
+        setSelectedChannel(loaded[0])
       }
     } catch (error: any) {
       console.error('Failed to load channels:', error)
@@ -73,6 +84,20 @@ export default function ChatPage() {
     }
   }
 
+  const loadPublicChannels = async () => {
+    // One discovery page per request, continuing from the last one
+    try {
+      const response: any = await channelsAPI.list({ limit: 50, ...(publicCursor ? { cursor: publicCursor } : {}) })
+      const discovered = response.data.channels.filter((channel: any) => !channel.is_member)
+      setPublicChannels((prev) => [...prev, ...discovered])
+      setPublicCursor(response.data.next_cursor)
+      setBrowsed(true)
+    } catch (error: any) {
+      console.error('Failed to load public channels:', error)
+      toast.error('Failed to load public channels')
+    }
+  }
+
   const loadMessages = async (channelId: string) => {
     try {
       const response = await messagesAPI.list(channelId)
@@ -117,6 +142,9 @@ export default function ChatPage() {
     <div className="flex h-screen bg-gray-100">
       <ChannelList
         channels={channels}
+        publicChannels={publicChannels}
+        canBrowse={!browsed || publicCursor !== null}
+        onBrowse={loadPublicChannels}
         selectedChannel={selectedChannel}
         onSelectChannel={setSelectedChannel}
         onCreateChannel={loadChannels}
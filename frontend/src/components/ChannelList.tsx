@@ -7,6 +7,9 @@ import { PlusIcon, HashtagIcon } from '@heroicons/react/24/outline'
 
 interface ChannelListProps {
   channels: any[]
+  publicChannels: any[]
+  canBrowse: boolean
+  onBrowse: () => void
   selectedChannel: any
   onSelectChannel: (channel: any) => void
   onCreateChannel: () => void
@@ -14,6 +17,9 @@ interface ChannelListProps {
 
 export default function ChannelList({
   channels,
+  publicChannels,
+  canBrowse,
+  onBrowse,
   selectedChannel,
   onSelectChannel,
   onCreateChannel,
@@ -80,6 +86,31 @@ export default function ChannelList({
               ))}
             </div>
           </div>
+          <div className="p-4 border-t border-gray-700">
+            <h2 className="text-sm font-semibold text-gray-400 mb-2">DISCOVER</h2>
+            <div className="space-y-1">
+              {publicChannels.map((channel) => (
+                <button
+                  key={channel.id}
+                  onClick={() => onSelectChannel(channel)}
+                  className={`w-full flex items-center px-2 py-2 rounded hover:bg-gray-700 transition text-gray-300 ${
+                    selectedChannel?.id === channel.id ? 'bg-gray-700' : ''
+                  }`}
+                >
+                  <HashtagIcon className="w-5 h-5 mr-2" />
+                  <span className="truncate">{channel.name}</span>
+                </button>
+              ))}
+            </div>
+            {canBrowse && (
+              <button
+                onClick={onBrowse}
+                className="w-full mt-2 px-2 py-2 text-sm text-gray-400 hover:text-white rounded hover:bg-gray-700 transition"
+              >
+                {publicChannels.length > 0 ? 'Show more public channels' : 'Browse public channels'}
+              </button>
+            )}
+          </div>
         </div>
       </div>
 
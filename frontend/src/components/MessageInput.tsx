@@ -28,7 +28,7 @@ export default function MessageInput({ onSend }: MessageInputProps) {
     setUploading(true)
     try {
       const response = await filesAPI.upload(file)
-      const fileUrl = response.data.url
+      const fileUrl = response.data.download_url
       onSend(`📎 File uploaded: ${file.name}\n${fileUrl}`)
       toast.success('File uploaded!')
     } catch (error) {
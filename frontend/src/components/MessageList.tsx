@@ -47,12 +47,12 @@ export default function MessageList({ messages }: MessageListProps) {
               )}
               {message.reactions && Object.keys(message.reactions).length > 0 && (
                 <div className="flex gap-2 mt-2">
-                  {Object.entries(message.reactions).map(([emoji, users]: any) => (
+                  {Object.entries(message.reactions).map(([emoji, count]: any) => (
                     <span
                       key={emoji}
                       className="bg-gray-100 px-2 py-1 rounded-full text-sm"
                     >
-                      {emoji} {users.length}
+                      {emoji} {count}
                     </span>
                   ))}
                 </div>